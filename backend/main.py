@@ -1,22 +1,56 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from typing import Dict, Any, Iterator, List, Optional, Union
+from datetime import datetime
 
 # Import models
+from models import records
 from models.schemas import (
     Control, Resource, SimulationRequest, SimulationResult, 
-    ControlStatus, ControlSeverity
+    ControlStatus, ControlSeverity, BatchAnalysisRequest, SimulationSweepRequest
 )
 
 # Import services
-from services import metrics_engine, ai_reasoning, mock_data, bigquery_service
-from services.gcp_auth_helper import ensure_credentials
+from services import metrics_engine, incremental_metrics, columnar_metrics, ai_reasoning, mock_data, bigquery_service, executors
+from services import control_query, batch_analysis, simulation_engine, simulation_jobs, narratives, telemetry, emission_factors
+from services import metrics_history, materialized
 
-# Run early credential detection/placement
-ensure_credentials()
+# Aggregation engine: "batch" (default) recomputes per request, "incremental" applies snapshot deltas,
+# "columnar" recomputes with vectorized NumPy kernels
+METRICS_ENGINES = {
+    "batch": metrics_engine,
+    "incremental": incremental_metrics,
+    "columnar": columnar_metrics,
+}
+engine = telemetry.InstrumentedModule(
+    METRICS_ENGINES.get(os.getenv("ORBYTE_METRICS_ENGINE", "batch"), metrics_engine), "metrics"
+)
+columnar_engine = telemetry.InstrumentedModule(columnar_metrics, "metrics")
+
+class TimedJSONResponse(JSONResponse):
+    # JSON encoding of response bodies shows up as the "serialize.json" stage
+    def render(self, content: Any) -> bytes:
+        with telemetry.span("serialize.json"):
+            return super().render(content)
+
+class RecordJSONResponse(TimedJSONResponse):
+    # For content holding internal records: rendered straight with json.dumps,
+    # skipping jsonable_encoder (return it from the endpoint to bypass FastAPI's encoding)
+    def render(self, content: Any) -> bytes:
+        with telemetry.span("serialize.json"):
+            return json.dumps(
+                content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=records.json_default
+            ).encode("utf-8")
 
-app = FastAPI(title="Orbyte Backend")
+app = FastAPI(title="Orbyte Backend", default_response_class=TimedJSONResponse)
 
 # CORS configuration
 origins = [
@@ -30,44 +64,302 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Data-Fallback"],
 )
 
+# --- Data loading ---
+# When BigQuery is unavailable, endpoints fall back (to row-level data, then
+# mock data). Fallbacks are counted per data set for /api/cache/stats, flagged
+# on the response in X-Data-Fallback, and logged at most once a minute each.
+
+FALLBACK_LOG_INTERVAL_SECONDS = 60
+_fallback_counts: Dict[str, int] = {}
+_fallback_logged_at: Dict[str, float] = {}
+_request_fallbacks: contextvars.ContextVar[Optional[set]] = contextvars.ContextVar("request_fallbacks", default=None)
+
+def _fallback(source: str, error: Exception):
+    _fallback_counts[source] = _fallback_counts.get(source, 0) + 1
+    flags = _request_fallbacks.get()
+    if flags is not None:
+        flags.add(source)
+    now = time.monotonic()
+    last = _fallback_logged_at.get(source)
+    if last is None or now - last >= FALLBACK_LOG_INTERVAL_SECONDS:
+        _fallback_logged_at[source] = now
+        print(f"[Orbyte] BigQuery {source} unavailable, using fallback: {error}")
+
+@app.middleware("http")
+async def flag_fallbacks(request, call_next):
+    # Only fallbacks taken before the response starts can be flagged (not mid-stream ones)
+    flags: set = set()
+    token = _request_fallbacks.set(flags)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_fallbacks.reset(token)
+    if flags:
+        response.headers["X-Data-Fallback"] = ",".join(sorted(flags))
+    return response
+
+# --- Telemetry ---
+# Per-route latency and per-stage spans (BigQuery query, row mapping, metrics
+# engine functions, model calls, JSON serialization) are exported as Prometheus
+# histograms on /metrics; slow requests are also logged with their breakdown.
+# Streaming responses are timed until their first byte.
+
+@app.middleware("http")
+async def record_latency(request, call_next):
+    token = telemetry.start_request()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        telemetry.finish_request(
+            token,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            request.url.path,
+            status,
+            time.perf_counter() - started,
+        )
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+async def _fetch_sustainability_metrics(include_idle: bool = True) -> Dict[str, Any]:
+    """
+    Sustainability metrics from BigQuery aggregates when enabled, then from
+    BigQuery resource rows, then from mock data.
+    """
+    if bigquery_service.AGGREGATE_MODE:
+        try:
+            summary = await bigquery_service.fetch_sustainability_summary(include_idle)
+            if summary:
+                return summary
+        except Exception as e:
+            _fallback("aggregates", e)
+
+    try:
+        resources = await bigquery_service.fetch_resources()
+        if not resources:
+            raise Exception("Empty BigQuery result")
+    except Exception as e:
+        _fallback("resources", e)
+        resources = mock_data.get_mock_resources()
+    if isinstance(resources, columnar_metrics.ResourceColumns):
+        # Arrow fetches arrive as columns, which only the columnar engine takes
+        return columnar_engine.compute_sustainability_metrics(resources)
+    return engine.compute_sustainability_metrics(resources)
+
+def _control_evidence(control: Control) -> List[Dict[str, str]]:
+    # Mock evidence (in real app, fetch from BQ evidence table)
+    return [
+        {"type": "iam_policy", "detail": "enforce_ssl=true on 80% of resources"},
+        {"type": "log_sample", "detail": "No failed login attempts in last 24h"}
+    ]
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Disable proxy buffering so the first chunk reaches the browser immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- Endpoints ---
 
 @app.get("/")
 def read_root():
     return {"message": "Orbyte Backend is running"}
 
-@app.get("/api/overview")
-async def get_overview():
+# --- Startup and health ---
+# Clients are created lazily; warm-up creates them in the background right after
+# startup so the first real request does not pay for it. /healthz is liveness
+# (the process serves requests), /readyz is readiness (clients resolved).
+
+WARMUP_ENABLED = os.getenv("ORBYTE_WARMUP", "true").lower() == "true"
+_started_at = time.monotonic()
+_warmup_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_seconds: Optional[float] = None
+
+def _warm_up():
+    global _warmup_seconds
+    started = time.monotonic()
+    bigquery_service.get_client()
+    ai_reasoning.get_model()
+    _warmup_seconds = round(time.monotonic() - started, 3)
+    print(f"[Orbyte] Warm-up finished in {_warmup_seconds}s")
+
+def _start_warmup():
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm_up, name="orbyte-warmup", daemon=True)
+            _warmup_thread.start()
+
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP_ENABLED:
+        _start_warmup()
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok", "uptime_seconds": round(time.monotonic() - _started_at, 3)}
+
+@app.get("/readyz")
+def readyz(response: Response):
+    # Unavailable clients still count as ready: requests fall back to mock data
+    components = {
+        "bigquery": bigquery_service.client_status(),
+        "vertex": ai_reasoning.model_status(),
+    }
+    ready = all(c["status"] != "pending" for c in components.values())
+    if not ready:
+        _start_warmup()
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "degraded": any(c["status"] == "unavailable" for c in components.values()),
+        "warmup_seconds": _warmup_seconds,
+        "components": components,
+    }
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    executors.bigquery.shutdown()
+    executors.vertex.shutdown()
+    simulation_jobs.queue.shutdown()
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    # Snapshot and AI statement cache hit/miss/staleness counters for scraping
+    return {
+        **bigquery_service.get_cache_stats(),
+        "ai_statements": ai_reasoning.statement_cache.stats(),
+        "ai_narratives": {
+            **ai_reasoning.narrative_cache.stats(),
+            **narratives.scenario_narratives.stats(),
+        },
+        "simulation_jobs": simulation_jobs.queue.stats(),
+        "emission_factors": emission_factors.registry.stats(),
+        "metrics_history": metrics_history.history.stats(),
+        "overview": overview_document.stats(),
+        "fallbacks": dict(_fallback_counts),
+    }
+
+async def _fetch_controls() -> List[Control]:
     # Try BigQuery first, fall back to mock if empty/failed
     try:
-        controls = bigquery_service.get_controls_from_bq()
-        resources = bigquery_service.get_resources_from_bq()
-        if not controls or not resources:
+        controls = await bigquery_service.fetch_controls()
+        if not controls:
             raise Exception("Empty BigQuery result")
     except Exception as e:
-        print(f"[Orbyte] BigQuery failed or empty, using mock data: {e}")
+        _fallback("controls", e)
         controls = mock_data.get_mock_controls()
-        resources = mock_data.get_mock_resources()
-    
+    return controls
+
+async def _fetch_control(control_id: str) -> Optional[Control]:
+    # Indexed snapshot lookup, or a single-row query when the cache is cold; a
+    # missing row is a 404 without a table scan. Only when BigQuery is
+    # unavailable (or disabled by mock mode) is the id resolved against
+    # _fetch_controls, so controls listed from the fallback are found too
+    try:
+        return await bigquery_service.fetch_control(control_id)
+    except Exception as e:
+        _fallback("controls", e)
+    return control_query.index_for(await _fetch_controls()).get(control_id)
+
+# Metric history: a snapshot of the headline metrics is appended every
+# HISTORY_INTERVAL_SECONDS and the overview trends are read from its daily rollups
+TREND_DAYS = float(os.getenv("ORBYTE_TREND_DAYS", "90"))
+_history_task: Optional[asyncio.Task] = None
+
+def _history_values(controls: List[Control], sust_metrics: Dict[str, Any]) -> Dict[str, float]:
+    values = {
+        "compliance.overall": engine.compute_overall_compliance_score(controls),
+        "emissions.total": sust_metrics["total_monthly_emissions_kg"],
+        "sustainability.score": sust_metrics["sustainability_score"],
+    }
+    for framework, score in engine.compute_framework_compliance(controls).items():
+        values[f"compliance.framework.{framework}"] = score
+    for row in sust_metrics["emissions_by_region"]:
+        values[f"emissions.region.{row['region']}"] = row["emissions_kg"]
+    return values
+
+# Series computed from each data set; when it fell back to mock data during an outage they are
+# not recorded, since fake points would stay in the trends for good (with ORBYTE_USE_MOCK_DATA
+# mock data is the configured source and is recorded)
+_HISTORY_SOURCES = {"controls": ("compliance.",), "resources": ("emissions.", "sustainability.")}
+
+async def _record_history() -> int:
+    fallbacks: set = set()
+    token = _request_fallbacks.set(fallbacks)
+    try:
+        controls_task = asyncio.ensure_future(_fetch_controls())
+        sust_metrics = await _fetch_sustainability_metrics(include_idle=False)
+        controls = await controls_task
+    finally:
+        _request_fallbacks.reset(token)
+    values = _history_values(controls, sust_metrics)
+    skipped = () if bigquery_service.USE_MOCK_DATA else tuple(
+        prefix for source in fallbacks for prefix in _HISTORY_SOURCES.get(source, ())
+    )
+    if skipped:
+        print(f"[Orbyte] Metric history: not recording {', '.join(skipped)} series served from fallback data")
+        values = {name: value for name, value in values.items() if not name.startswith(skipped)}
+    if not values:
+        return 0
+    with telemetry.span("history.record"):
+        return metrics_history.history.append(values)
+
+async def _history_loop(interval: float):
+    while True:
+        # With several workers sharing the store, only the first one due records
+        last = metrics_history.history.last_timestamp("compliance.overall")
+        if last is None or time.time() - last >= interval / 2:
+            try:
+                await _record_history()
+                metrics_history.history.purge_expired()
+            except Exception as e:
+                print(f"[Orbyte] Metric history snapshot failed: {e}")
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_history():
+    global _history_task
+    if metrics_history.HISTORY_INTERVAL_SECONDS > 0:
+        _history_task = asyncio.create_task(_history_loop(metrics_history.HISTORY_INTERVAL_SECONDS))
+
+@app.on_event("shutdown")
+async def stop_history():
+    if _history_task is not None:
+        _history_task.cancel()
+
+def _trend(series: str, key: str, current: float) -> List[Dict[str, Any]]:
+    """Daily averages of a history series; just the current value while there is no history yet."""
+    points = metrics_history.history.query(series, time.time() - TREND_DAYS * 86400, resolution="day")
+    if not points:
+        return [{"timestamp": datetime.now().isoformat(), key: current}]
+    return [{"timestamp": datetime.fromtimestamp(p["timestamp"]).isoformat(), key: p["value"]} for p in points]
+
+def _build_overview(controls: List[Control], sust_metrics: Dict[str, Any]) -> Dict[str, Any]:
     # Compute metrics
-    framework_scores = metrics_engine.compute_framework_compliance(controls)
-    compliance_score = metrics_engine.compute_overall_compliance_score(controls)
-    sust_metrics = metrics_engine.compute_sustainability_metrics(resources)
-    open_risks = metrics_engine.get_open_risks(controls)
+    framework_scores = engine.compute_framework_compliance(controls)
+    compliance_score = engine.compute_overall_compliance_score(controls)
+    open_risks = engine.get_open_risks(controls)
     
-    # Mock trends (could be fetched from BQ in future)
     today = datetime.now()
-    compliance_trend = [
-        {"timestamp": (today - timedelta(days=i*5)).isoformat(), "score": max(60, compliance_score - i*2)}
-        for i in range(6)
-    ][::-1]
-    
-    emissions_trend = [
-        {"timestamp": (today - timedelta(days=i*5)).isoformat(), "emissions_kg": max(100, sust_metrics["total_monthly_emissions_kg"] + i*50)}
-        for i in range(6)
-    ][::-1]
+    compliance_trend = _trend("compliance.overall", "score", compliance_score)
+    emissions_trend = _trend("emissions.total", "emissions_kg", sust_metrics["total_monthly_emissions_kg"])
     
     top_issues = []
     for c in controls:
@@ -90,58 +382,206 @@ async def get_overview():
         "top_issues": top_issues[:5]
     }
 
-@app.get("/api/compliance/controls", response_model=List[Control])
-async def get_controls():
+# The overview is materialized as JSON bytes and only rebuilt when its inputs
+# change. A background task refreshes it every OVERVIEW_REFRESH_SECONDS (which
+# also keeps the snapshot caches revalidating); requests refresh it inline
+# when the task is not running.
+OVERVIEW_REFRESH_SECONDS = float(os.getenv("ORBYTE_OVERVIEW_REFRESH_SECONDS", "5"))  # 0 checks inputs on every request
+overview_document = materialized.MaterializedDocument("overview")
+_overview_task: Optional[asyncio.Task] = None
+
+async def _refresh_overview() -> materialized.Document:
+    controls_task = asyncio.ensure_future(_fetch_controls())
+    sust_metrics = await _fetch_sustainability_metrics(include_idle=False)
+    controls = await controls_task
+    # Snapshots are immutable lists, so identity stands for their content. New
+    # history points change the trends.
+    key = (
+        id(controls),
+        sust_metrics["sustainability_score"],
+        sust_metrics["total_monthly_emissions_kg"],
+        emission_factors.current().version,
+        metrics_history.history.last_timestamp("compliance.overall"),
+    )
+
+    def refresh() -> materialized.Document:
+        with telemetry.span("overview.refresh"):
+            return overview_document.refresh(key, lambda: _build_overview(controls, sust_metrics), pin=controls)
+
+    # Building and serializing the overview is CPU work; keep it off the event loop
+    return await asyncio.to_thread(refresh)
+
+async def _overview_loop(interval: float):
+    while True:
+        try:
+            await _refresh_overview()
+        except Exception as e:
+            print(f"[Orbyte] Overview refresh failed: {e}")
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_overview_refresher():
+    global _overview_task
+    if OVERVIEW_REFRESH_SECONDS > 0:
+        _overview_task = asyncio.create_task(_overview_loop(OVERVIEW_REFRESH_SECONDS))
+
+@app.on_event("shutdown")
+async def stop_overview_refresher():
+    if _overview_task is not None:
+        _overview_task.cancel()
+
+@app.get("/api/overview")
+async def get_overview(request: Request):
+    document = overview_document.current()
+    if document is None or _overview_task is None or _overview_task.done():
+        document = await _refresh_overview()
+    headers = {"ETag": document.etag, "X-Overview-Version": str(document.version), "Cache-Control": "no-cache"}
+    if document.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(document.body, media_type="application/json", headers=headers)
+
+@app.get("/api/history")
+def get_history(
+    series: str,
+    days: float = Query(30, gt=0),
+    resolution: str = Query("day", description="raw, hour or day"),
+):
     try:
-        controls = bigquery_service.get_controls_from_bq()
-        if not controls:
-            raise Exception("Empty BigQuery result")
+        points = metrics_history.history.query(series, time.time() - days * 86400, resolution=resolution)
+    except metrics_history.InvalidHistoryQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"series": series, "resolution": resolution, "points": points}
+
+@app.get("/api/history/series")
+def list_history_series(prefix: str = ""):
+    return {"series": metrics_history.history.series(prefix)}
+
+@app.get("/api/compliance/controls")
+async def get_controls(
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated Control fields to return"),
+    limit: Optional[int] = Query(None, ge=1, le=control_query.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+):
+    controls = await _fetch_controls()
+
+    try:
+        selected = control_query.parse_fields(fields)
+        page, next_cursor = control_query.select_page(controls, framework, severity, status, cursor, limit)
+    except control_query.InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return RecordJSONResponse([control_query.project(c, selected) for c in page], headers=headers)
+
+def _stream_control_rows(framework: Optional[str], severity: Optional[ControlSeverity], status: Optional[ControlStatus]) -> Iterator[Control]:
+    # Serve from the cached snapshot when warm, otherwise straight from the BigQuery row iterator
+    controls = bigquery_service.controls_cache.get(block=False)
+    if controls:
+        yield from control_query.filter_indexed(controls, framework, severity, status)
+        return
+
+    streamed = 0
+    try:
+        for c in bigquery_service.iter_controls_from_bq(framework, severity, status):
+            streamed += 1
+            yield c
     except Exception as e:
-        print(f"[Orbyte] BigQuery controls fallback: {e}")
-        controls = mock_data.get_mock_controls()
-    return controls
+        if streamed:
+            print(f"[Orbyte] BigQuery controls stream failed after {streamed} rows: {e}")
+        else:
+            _fallback("controls", e)
+    if not streamed:
+        yield from control_query.filter_controls(mock_data.get_mock_controls(), framework, severity, status)
+
+@app.get("/api/compliance/controls/stream")
+def stream_controls(
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated Control fields to return"),
+):
+    # NDJSON, one control per line, serialized as rows arrive
+    try:
+        selected = control_query.parse_fields(fields)
+    except control_query.InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = _stream_control_rows(framework, severity, status)
+    return StreamingResponse(control_query.to_ndjson(rows, selected), media_type="application/x-ndjson")
 
 @app.post("/api/compliance/controls/{control_id}/analysis")
 async def analyze_control(control_id: str):
-    # Fetch control details
-    try:
-        controls = bigquery_service.get_controls_from_bq()
-        if not controls:
-            raise Exception("Empty BigQuery result")
-    except Exception:
-        controls = mock_data.get_mock_controls()
-        
-    control = next((c for c in controls if c.id == control_id), None)
+    control = await _fetch_control(control_id)
     if not control:
         raise HTTPException(status_code=404, detail="Control not found")
     
-    # Mock evidence (in real app, fetch from BQ evidence table)
-    evidence = [
-        {"type": "iam_policy", "detail": "enforce_ssl=true on 80% of resources"},
-        {"type": "log_sample", "detail": "No failed login attempts in last 24h"}
-    ]
-    
-    result = await ai_reasoning.generate_implementation_statement(control, evidence)
+    result = await ai_reasoning.generate_implementation_statement(control, _control_evidence(control))
     return result
 
-@app.get("/api/sustainability/metrics")
-async def get_sustainability_metrics():
+@app.post("/api/compliance/controls/{control_id}/analysis/stream")
+async def analyze_control_stream(control_id: str):
+    # SSE: statement text as "chunk" events, then "done" with the same payload as /analysis
+    # ("error" instead if the model broke off mid-statement)
+    control = await _fetch_control(control_id)
+    if not control:
+        raise HTTPException(status_code=404, detail="Control not found")
+
+    async def events():
+        async for item in ai_reasoning.stream_implementation_statement(control, _control_evidence(control)):
+            if isinstance(item, str):
+                yield _sse("chunk", {"text": item})
+            elif isinstance(item, ai_reasoning.StreamError):
+                yield _sse("error", {"detail": item.detail})
+            else:
+                yield _sse("done", item)
+
+    return _sse_response(events())
+
+@app.post("/api/compliance/analysis/batch")
+async def analyze_controls_batch(request: BatchAnalysisRequest):
+    # NDJSON: one line per control as its statement completes, then a summary line
+    if not request.framework and not request.control_ids:
+        raise HTTPException(status_code=400, detail="Provide a framework and/or control_ids")
+
     try:
-        resources = bigquery_service.get_resources_from_bq()
-        if not resources:
+        controls = await bigquery_service.fetch_controls()
+        if not controls:
             raise Exception("Empty BigQuery result")
+        index = control_query.index_for(controls)
     except Exception as e:
-        print(f"[Orbyte] BigQuery resources fallback: {e}")
-        resources = mock_data.get_mock_resources()
-    
-    metrics = metrics_engine.compute_sustainability_metrics(resources)
+        _fallback("controls", e)
+        index = control_query.ControlIndex(mock_data.get_mock_controls())
+
+    selected, errors = control_query.select_batch(index, request.framework, request.control_ids)
+    if not selected and not errors:
+        raise HTTPException(status_code=404, detail="No matching controls")
+
+    async def results():
+        for control_id, error in errors.items():
+            yield json.dumps({"control_id": control_id, "ok": False, "error": error}) + "\n"
+        async for item in batch_analysis.run_batch(selected, _control_evidence, request.concurrency):
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.delete("/api/compliance/controls/{control_id}/analysis/cache")
+def invalidate_control_analysis(control_id: str):
+    # Drop cached implementation statements so the next analysis calls the model again
+    removed = ai_reasoning.statement_cache.invalidate(tag=control_id)
+    return {"control_id": control_id, "invalidated": removed}
+
+@app.get("/api/sustainability/metrics")
+async def get_sustainability_metrics():
+    metrics = await _fetch_sustainability_metrics()
     
     # Generate AI insight
     worst_region = None
     if metrics["emissions_by_region"]:
         worst_region = max(metrics["emissions_by_region"], key=lambda x: x["emissions_kg"])["region"]
         
-    insight = ai_reasoning.generate_sustainability_insight(
+    insight = await ai_reasoning.generate_sustainability_insight_async(
         metrics["total_monthly_emissions_kg"],
         metrics["potential_monthly_emissions_savings_kg"],
         len(metrics["idle_resources"]),
@@ -149,55 +589,272 @@ async def get_sustainability_metrics():
     )
     
     metrics["ai_insight"] = insight
-    return metrics
+    return RecordJSONResponse(metrics)
 
-@app.post("/api/simulations/run", response_model=SimulationResult)
-def run_simulation(request: SimulationRequest):
+@app.get("/api/sustainability/factors")
+def get_emission_factors():
+    # Per-region factors and hourly intensity curves of the loaded factors version
+    factors = emission_factors.current()
+    return {
+        "version": factors.version,
+        "pue": factors.pue,
+        "regions": [
+            {
+                "region": region,
+                "grid_intensity": intensity,
+                "price_multiplier": factors.price(region),
+                "hourly_intensity": [factors.intensity_at(region, hour) for hour in range(24)],
+            }
+            for region, intensity in factors.grid_intensity.items()
+        ],
+        "machine_types": len(factors.instance_power_kw),
+    }
+
+@app.post("/api/sustainability/factors/reload")
+def reload_emission_factors():
+    # Re-read the factors file now instead of waiting for the periodic check
+    emission_factors.registry.reload()
+    return emission_factors.registry.stats()
+
+@app.get("/api/sustainability/insight/stream")
+async def stream_sustainability_insight():
+    # SSE: insight text as "chunk" events, then "done" with the full text ("error" if the model broke off)
+    metrics = await _fetch_sustainability_metrics()
+    worst_region = None
+    if metrics["emissions_by_region"]:
+        worst_region = max(metrics["emissions_by_region"], key=lambda x: x["emissions_kg"])["region"]
+
+    async def events():
+        chunks = []
+        async for text in ai_reasoning.stream_sustainability_insight(
+            metrics["total_monthly_emissions_kg"],
+            metrics["potential_monthly_emissions_savings_kg"],
+            len(metrics["idle_resources"]),
+            worst_region
+        ):
+            if isinstance(text, ai_reasoning.StreamError):
+                yield _sse("error", {"detail": text.detail})
+                return
+            chunks.append(text)
+            yield _sse("chunk", {"text": text})
+        yield _sse("done", {"ai_insight": "".join(chunks)})
+
+    return _sse_response(events())
+
+def _simulation_resources() -> Union[List[Resource], columnar_metrics.ResourceColumns]:
     # Use BQ or Mock resources
     try:
-        resources = bigquery_service.get_resources_from_bq()
+        resources = bigquery_service.get_cached_resources()
         if not resources:
             raise Exception("Empty BigQuery result")
-    except Exception:
+    except Exception as e:
+        _fallback("resources", e)
         resources = mock_data.get_mock_resources()
+    return resources
+
+def _simulate(request: SimulationRequest) -> tuple[float, float]:
+    """Returns (monthly emissions reduction kg, monthly cost savings usd) for a scenario."""
+    resources = _simulation_resources()
+    with telemetry.span("simulation.run"):
+        return simulation_engine.simulate(resources, request)
+
+def _validate_simulation(request: SimulationRequest):
+    try:
+        simulation_engine.validate_simulation(request)
+    except simulation_engine.InvalidSimulation as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+NARRATIVE_WAIT_SECONDS = 25  # per long-poll / SSE keepalive interval
+
+@app.post("/api/simulations/run", response_model=SimulationResult)
+async def run_simulation(request: SimulationRequest):
+    _validate_simulation(request)
+    emissions_reduction, cost_savings = await asyncio.to_thread(_simulate, request)
     
-    # Basic simulation logic
-    emissions_reduction = 0.0
-    cost_savings = 0.0
-    
-    if request.simulation_type == "idle_shutdown":
-        metrics = metrics_engine.compute_sustainability_metrics(resources)
-        idle_resources = metrics["idle_resources"]
-        
-        # Apply workload percent
-        count_to_shutdown = int(len(idle_resources) * (request.workload_percent / 100.0))
-        affected = idle_resources[:count_to_shutdown]
-        
-        for r in affected:
-            # Assume 10 hours shutdown per day
-            daily_emissions = metrics_engine.estimate_daily_emissions_kg(r)
-            emissions_reduction += daily_emissions * (10/24) * 30
-            cost_savings += r.daily_cost_usd * (10/24) * 30
-            
-    elif request.simulation_type == "region_migration":
-        # Simplified migration logic
-        # Assume 20% reduction if moving to cleaner region
-        metrics = metrics_engine.compute_sustainability_metrics(resources)
-        total_emissions = metrics["total_monthly_emissions_kg"]
-        emissions_reduction = total_emissions * 0.2 * (request.workload_percent / 100.0)
-        cost_savings = 50.0 # Mock
-        
-    # Get AI narrative
-    narrative = ai_reasoning.generate_scenario_narrative(
+    # The AI narrative is generated in the background; fetch it by narrative_id
+    state = await narratives.scenario_narratives.start(
         request.simulation_type,
         request.dict(),
         emissions_reduction,
         cost_savings
     )
+    narrative = state["narrative"] or {}
     
     return SimulationResult(
         estimated_emissions_reduction_kg=emissions_reduction,
         estimated_cost_savings_usd=cost_savings,
-        risk_summary=narrative["risk_summary"],
-        detail_summary=narrative["detail_summary"]
+        risk_summary=narrative.get("risk_summary"),
+        detail_summary=narrative.get("detail_summary"),
+        narrative_id=state["narrative_id"],
+        narrative_status=state["status"],
+    )
+
+@app.get("/api/simulations/narratives/{narrative_id}")
+async def get_simulation_narrative(narrative_id: str, wait: bool = False):
+    # wait=true long-polls until the narrative is ready (or the wait interval ends)
+    if wait:
+        state = await narratives.scenario_narratives.wait(narrative_id, NARRATIVE_WAIT_SECONDS)
+    else:
+        state = await narratives.scenario_narratives.get(narrative_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Narrative not found")
+    return state
+
+@app.get("/api/simulations/narratives/{narrative_id}/stream")
+async def stream_simulation_narrative(narrative_id: str):
+    # SSE: "pending" keepalives until a single "narrative" event with the result
+    if await narratives.scenario_narratives.get(narrative_id) is None:
+        raise HTTPException(status_code=404, detail="Narrative not found")
+
+    async def events():
+        while True:
+            state = await narratives.scenario_narratives.wait(narrative_id, NARRATIVE_WAIT_SECONDS)
+            if state is None or state["status"] == narratives.FAILED:
+                yield _sse("error", {"detail": "Narrative generation failed"})
+                return
+            if state["status"] == narratives.READY:
+                yield _sse("narrative", state)
+                return
+            yield _sse("pending", state)
+
+    return _sse_response(events())
+
+@app.post("/api/simulations/sweep")
+def run_simulation_sweep(request: SimulationSweepRequest):
+    # Distributions over the whole workload/hours/region grid; no narrative
+    pairs = None
+    if request.region_pairs is not None:
+        pairs = [(p.source_region, p.target_region) for p in request.region_pairs]
+    resources = _simulation_resources()
+    try:
+        with telemetry.span("simulation.sweep"):
+            return simulation_engine.run_sweep(
+                resources,
+                simulation_types=request.simulation_types,
+                workload_percents=request.workload_percents,
+                shutdown_hours=request.shutdown_hours,
+                region_pairs=pairs,
+                samples=request.samples,
+                hours_uncertainty=request.hours_uncertainty,
+                cpu_uncertainty=request.cpu_uncertainty,
+                seed=request.seed,
+                percentiles=request.percentiles,
+                include_samples=request.include_samples,
+            )
+    except simulation_engine.InvalidSweep as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- Simulation jobs ---
+# Submit returns immediately with a job id; poll GET /api/simulations/jobs/{id}
+# for the result. The numbers are computed in a worker process.
+
+def _job_resources() -> tuple[columnar_metrics.ResourceColumns, str]:
+    """
+    The resources a job computes on, detached for the worker pool, and their
+    data version: jobs only deduplicate while resources and emission factors
+    are unchanged.
+    """
+    columns = columnar_metrics.resource_columns(_simulation_resources())
+    return columns.detached(), f"{columns.fingerprint()}:{emission_factors.current().version}"
+
+def _job_response(job: Dict[str, Any], deduplicated: bool) -> Response:
+    return Response(
+        content=json.dumps({**job, "deduplicated": deduplicated}, default=str),
+        media_type="application/json",
+        status_code=200 if job["status"] == simulation_jobs.SUCCEEDED else 202,
     )
+
+@app.post("/api/simulations/jobs")
+async def submit_simulation_job(request: SimulationRequest):
+    _validate_simulation(request)
+    resources, data_version = await asyncio.to_thread(_job_resources)
+
+    async def run():
+        emissions_reduction, cost_savings = await simulation_jobs.queue.compute(
+            simulation_engine.simulate, resources, request
+        )
+        narrative = await ai_reasoning.generate_scenario_narrative_async(
+            request.simulation_type, request.dict(), emissions_reduction, cost_savings
+        )
+        return SimulationResult(
+            estimated_emissions_reduction_kg=emissions_reduction,
+            estimated_cost_savings_usd=cost_savings,
+            risk_summary=narrative["risk_summary"],
+            detail_summary=narrative["detail_summary"]
+        ).dict()
+
+    job, deduplicated = simulation_jobs.queue.submit("run", request.dict(), run, data_version)
+    return _job_response(job, deduplicated)
+
+@app.post("/api/simulations/sweep/jobs")
+async def submit_simulation_sweep_job(request: SimulationSweepRequest):
+    pairs = None
+    if request.region_pairs is not None:
+        pairs = [(p.source_region, p.target_region) for p in request.region_pairs]
+    resources, data_version = await asyncio.to_thread(_job_resources)
+    # Rejected here rather than as a failed job
+    try:
+        pairs = simulation_engine.validate_sweep(
+            resources, request.simulation_types, request.workload_percents, request.shutdown_hours, pairs,
+            request.samples, request.hours_uncertainty, request.cpu_uncertainty, request.percentiles,
+        )
+    except simulation_engine.InvalidSweep as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def run():
+        return await simulation_jobs.queue.compute(
+            simulation_engine.run_sweep, resources, request.simulation_types,
+            request.workload_percents, request.shutdown_hours, pairs, request.samples,
+            request.hours_uncertainty, request.cpu_uncertainty, request.seed,
+            request.percentiles, request.include_samples,
+        )
+
+    job, deduplicated = simulation_jobs.queue.submit("sweep", request.dict(), run, data_version)
+    return _job_response(job, deduplicated)
+
+@app.get("/api/simulations/jobs/{job_id}")
+def get_simulation_job(job_id: str):
+    job = simulation_jobs.queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/api/simulations/jobs/{job_id}")
+def cancel_simulation_job(job_id: str):
+    job = simulation_jobs.queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/simulations/run/stream")
+async def run_simulation_stream(request: SimulationRequest):
+    # SSE: "result" with the numbers first, then narrative "chunk"s, then "done" with the full result
+    # ("error" instead if the model broke off mid-narrative)
+    _validate_simulation(request)
+    emissions_reduction, cost_savings = await asyncio.to_thread(_simulate, request)
+
+    async def events():
+        yield _sse("result", {
+            "estimated_emissions_reduction_kg": emissions_reduction,
+            "estimated_cost_savings_usd": cost_savings,
+        })
+        async for item in ai_reasoning.stream_scenario_narrative(
+            request.simulation_type, request.dict(), emissions_reduction, cost_savings
+        ):
+            if isinstance(item, str):
+                yield _sse("chunk", {"text": item})
+            elif isinstance(item, ai_reasoning.StreamError):
+                yield _sse("error", {"detail": item.detail})
+            else:
+                yield _sse("done", SimulationResult(
+                    estimated_emissions_reduction_kg=emissions_reduction,
+                    estimated_cost_savings_usd=cost_savings,
+                    risk_summary=item["risk_summary"],
+                    detail_summary=item["detail_summary"],
+                    narrative_id=ai_reasoning.scenario_narrative_key(
+                        request.simulation_type, request.dict(), emissions_reduction, cost_savings
+                    ),
+                    narrative_status=narratives.READY,
+                ).dict())
+
+    return _sse_response(events())
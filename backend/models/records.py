@@ -0,0 +1,52 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+from models.schemas import ControlSeverity, ControlStatus
+
+# Internal row types for the fetch -> compute path. They carry the same fields
+# as the Control/Resource API models but skip validation and per-instance
+# dicts, which dominate at 10^5+ rows. Values are expected to be typed
+# already (mappers resolve enums). dict()/json() mirror the model methods used
+# elsewhere in the backend, and json_default lets json.dumps render records
+# directly, which is several times faster than FastAPI's jsonable_encoder.
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, _Record):
+        return value.dict()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class _Record:
+    __slots__ = ()
+
+    def dict(self, include: Optional[Set[str]] = None) -> Dict[str, Any]:
+        # __slots__ holds the field names in declaration order
+        return {name: getattr(self, name) for name in self.__slots__ if include is None or name in include}
+
+    def json(self, include: Optional[Set[str]] = None) -> str:
+        return json.dumps(self.dict(include), separators=(",", ":"), default=json_default)
+
+@dataclass(slots=True)
+class ControlRecord(_Record):
+    id: str
+    name: str
+    framework: str
+    severity: ControlSeverity
+    status: ControlStatus
+    evidence_count: int
+    description: Optional[str] = None
+
+@dataclass(slots=True)
+class ResourceRecord(_Record):
+    id: str
+    name: str
+    type: str
+    region: str
+    instance_type: str
+    avg_cpu_7d: float
+    avg_hours_per_day: float
+    last_active_days_ago: int
+    daily_cost_usd: float
+    last_active_at: Optional[datetime] = None
@@ -40,14 +40,38 @@ class EmissionSample(BaseModel):
     emissions_kg: float
     timestamp: datetime
 
+class BatchAnalysisRequest(BaseModel):
+    framework: Optional[str] = None          # analyze every control in this framework
+    control_ids: Optional[List[str]] = None  # and/or these specific controls
+    concurrency: Optional[int] = None        # capped server-side
+
 class SimulationRequest(BaseModel):
     simulation_type: str  # "idle_shutdown" | "region_migration" | "enable_encryption"
     source_region: Optional[str] = None
     target_region: Optional[str] = None
     workload_percent: int  # 0-100
+    shutdown_hours: float = 10  # idle_shutdown: hours per day switched off
+
+class RegionPair(BaseModel):
+    source_region: str
+    target_region: str
+
+class SimulationSweepRequest(BaseModel):
+    simulation_types: List[str] = ["idle_shutdown", "region_migration"]
+    workload_percents: List[float] = [25, 50, 75, 100]
+    shutdown_hours: List[float] = [10]
+    region_pairs: Optional[List[RegionPair]] = None  # default: every fleet region -> cleanest region
+    samples: int = 0                   # Monte Carlo draws; 0 = deterministic point estimates
+    hours_uncertainty: float = 0.1     # relative std dev of hours/day
+    cpu_uncertainty: float = 0.2       # relative std dev of 7-day CPU
+    seed: Optional[int] = None
+    percentiles: List[float] = [5, 50, 95]
+    include_samples: bool = False
 
 class SimulationResult(BaseModel):
     estimated_emissions_reduction_kg: float
     estimated_cost_savings_usd: float
-    risk_summary: str
-    detail_summary: str
+    risk_summary: Optional[str] = None    # None until the narrative is ready
+    detail_summary: Optional[str] = None
+    narrative_id: Optional[str] = None    # poll /api/simulations/narratives/{id}
+    narrative_status: Optional[str] = None  # "ready" | "pending" | "failed"
@@ -0,0 +1,185 @@
+"""
+Benchmarks the metrics engines, JSON serialization and the main endpoints on
+seeded synthetic fleets, and compares the results with a stored baseline.
+
+    python scripts/benchmark.py                         # run and compare with the baseline
+    python scripts/benchmark.py --sizes 1000,1000000    # other fleet sizes
+    python scripts/benchmark.py --save                  # record a new baseline
+    python scripts/benchmark.py --check                 # exit 1 on a regression
+
+Each case reports its best per-call time over --repeat rounds (fetch cases
+also report rows/s). A case regresses when that exceeds the baseline by more
+than --tolerance (default 1.5x), so baselines are only comparable on the
+machine that recorded them. Endpoints run through TestClient with BigQuery
+and Vertex disabled, so they measure this process only; the fleet is served
+by the mock data fallback.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+
+# Must be set before the services are imported
+os.environ["ORBYTE_USE_MOCK_DATA"] = "true"
+os.environ["ORBYTE_USE_MOCK_AI"] = "true"
+os.environ["ORBYTE_WARMUP"] = "false"
+os.environ["ORBYTE_SLOW_REQUEST_MS"] = "-1"
+os.environ.setdefault("ORBYTE_SIM_JOBS_PATH", "")
+os.environ.setdefault("ORBYTE_HISTORY_PATH", "")
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from services import bigquery_service, columnar_metrics, incremental_metrics, metrics_engine, mock_data, synthetic_data  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,100000"
+CONTROLS_PER_RESOURCE = 0.1  # a fleet of N resources is paired with N/10 controls
+
+RESOURCE_SCHEMA = [
+    ("resource_id", "STRING"), ("name", "STRING"), ("type", "STRING"), ("region", "STRING"),
+    ("instance_type", "STRING"), ("avg_cpu_7d", "FLOAT"), ("avg_hours_per_day", "FLOAT"),
+    ("last_active_days_ago", "INTEGER"), ("daily_cost_usd", "FLOAT"),
+]
+ARROW_BATCH_ROWS = 10000
+
+def fetch_cases(resources) -> Dict[str, Callable[[], object]]:
+    """
+    Client-side decoding of one resources_view result, without the network:
+    REST pages (JSON rows parsed into Row objects by the BigQuery library,
+    then mapped to records) against Storage Read API style Arrow IPC record
+    batches decoded into ResourceColumns.
+    """
+    import pyarrow
+    from google.cloud import bigquery
+    from google.cloud.bigquery import _helpers
+
+    names = [name for name, _ in RESOURCE_SCHEMA]
+    schema = [bigquery.SchemaField(name, kind) for name, kind in RESOURCE_SCHEMA]
+    values = [(r.id, r.name, r.type, r.region, r.instance_type, r.avg_cpu_7d, r.avg_hours_per_day,
+               r.last_active_days_ago, r.daily_cost_usd) for r in resources]
+    json_rows = [{"f": [{"v": str(v)} for v in row]} for row in values]
+    table = pyarrow.table({name: [row[i] for row in values] for i, name in enumerate(names)})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_ROWS):
+            writer.write_batch(batch)
+    stream = sink.getvalue()
+
+    return {
+        "fetch.rest_rows": lambda: bigquery_service._map_resources(_helpers._rows_from_json(json_rows, schema)),
+        "fetch.arrow_batches": lambda: columnar_metrics.ResourceColumns.from_arrow(pyarrow.ipc.open_stream(stream).read_all()),
+    }
+
+def best_seconds(fn: Callable[[], object], repeat: int) -> float:
+    """Per-call time: best of `repeat` rounds, each looping enough calls to last at least 0.2s."""
+    fn()  # warm-up, also fills per-snapshot indexes
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+def cases_for(size: int, client: TestClient) -> Dict[str, Callable[[], object]]:
+    resources = synthetic_data.cached_resources(size)
+    controls = synthetic_data.cached_controls(max(1, int(size * CONTROLS_PER_RESOURCE)))
+
+    def rebuild(rows):
+        aggregator = incremental_metrics.SustainabilityAggregator()
+        aggregator.sync(rows)
+        return aggregator.metrics()
+
+    def get(path: str) -> Callable[[], object]:
+        def request():
+            response = client.get(path)
+            response.raise_for_status()
+        return request
+
+    return {
+        "sustainability.batch": lambda: metrics_engine.compute_sustainability_metrics(resources),
+        "sustainability.columnar": lambda: columnar_metrics.compute_sustainability_metrics(resources),
+        "sustainability.incremental_rebuild": lambda: rebuild(resources),
+        "sustainability.incremental_cached": lambda: incremental_metrics.compute_sustainability_metrics(resources),
+        "compliance.batch": lambda: metrics_engine.compute_framework_compliance(controls),
+        "compliance.columnar": lambda: columnar_metrics.compute_framework_compliance(controls),
+        "compliance.incremental_cached": lambda: incremental_metrics.compute_framework_compliance(controls),
+        "serialize.resources": lambda: main.RecordJSONResponse(resources),
+        "serialize.controls": lambda: main.RecordJSONResponse(controls),
+        "endpoint.overview": get("/api/overview"),
+        "endpoint.sustainability_metrics": get("/api/sustainability/metrics"),
+        "endpoint.controls": get("/api/compliance/controls"),
+        **fetch_cases(resources),
+    }
+
+def run(sizes: List[int], repeat: int) -> Dict[str, Dict[str, float]]:
+    client = TestClient(main.app)
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        mock_data.MOCK_RESOURCE_COUNT = size
+        mock_data.MOCK_CONTROL_COUNT = max(1, int(size * CONTROLS_PER_RESOURCE))
+        started = time.perf_counter()
+        synthetic_data.cached_resources(size)
+        print(f"\nfleet {size:,} resources (generated in {time.perf_counter() - started:.2f}s)")
+        results[str(size)] = {}
+        for name, fn in cases_for(size, client).items():
+            seconds = best_seconds(fn, repeat)
+            results[str(size)][name] = seconds
+            rate = f"  {size / seconds:14,.0f} rows/s" if name.startswith("fetch.") else ""
+            print(f"  {name:<40} {seconds * 1000:10.2f} ms{rate}")
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\ncompared with baseline (regression above {tolerance:.2f}x):")
+    for size, cases in results.items():
+        for name, seconds in cases.items():
+            before = baseline.get(size, {}).get(name)
+            if not before:
+                continue
+            ratio = seconds / before
+            flag = "  REGRESSION" if ratio > tolerance else ""
+            print(f"  {size:>8} {name:<40} {ratio:6.2f}x{flag}")
+            if flag:
+                regressions.append(f"{size}/{name}")
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated fleet sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when a case regresses")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.repeat)
+
+    if args.save:
+        args.baseline.write_text(json.dumps({
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"\nno baseline at {args.baseline}; run with --save to record one")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+    if regressions and args.check:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,53 @@
+"""
+Measures backend cold-start cost in fresh interpreters.
+
+    python scripts/benchmark_startup.py [--runs 5]
+
+"import" is the time to import main (what a container pays before it can
+serve /healthz). "import + clients" also creates the BigQuery client and the
+Vertex model, which is what every import paid when they were created eagerly;
+with lazy clients that part now happens in the background warm-up instead.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+if {init_clients}:
+    main.bigquery_service.get_client()
+    main.ai_reasoning.get_model()
+print(json.dumps({{"import": imported - started, "total": time.perf_counter() - started}}))
+"""
+
+def measure(init_clients: bool) -> dict:
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR), "ORBYTE_WARMUP": "false"}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(init_clients=init_clients)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    lazy = [measure(False)["import"] for _ in range(args.runs)]
+    eager = [measure(True)["total"] for _ in range(args.runs)]
+    print(f"runs: {args.runs}")
+    print(f"import:           median {statistics.median(lazy):.3f}s  min {min(lazy):.3f}s")
+    print(f"import + clients: median {statistics.median(eager):.3f}s  min {min(eager):.3f}s")
+    print(f"deferred to warm-up: {statistics.median(eager) - statistics.median(lazy):.3f}s")
+
+if __name__ == "__main__":
+    main()
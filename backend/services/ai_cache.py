@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Configuration
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[1] / "data" / "ai_cache.sqlite3"
+AI_CACHE_PATH = os.getenv("ORBYTE_AI_CACHE_PATH", str(DEFAULT_CACHE_PATH))  # empty string disables the disk tier
+AI_CACHE_TTL_SECONDS = float(os.getenv("ORBYTE_AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+AI_CACHE_MEMORY_ENTRIES = int(os.getenv("ORBYTE_AI_CACHE_MEMORY_ENTRIES", "512"))
+AI_CACHE_DISK_ENTRIES = int(os.getenv("ORBYTE_AI_CACHE_DISK_ENTRIES", "50000"))
+DISK_EVICT_LOW_WATER = 0.9  # share of disk_entries kept when the disk tier is trimmed
+
+def make_key(*parts: Any) -> str:
+    """Content address for a generation: sha256 over a canonical JSON encoding of its inputs."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class TieredCache:
+    """
+    Two-tier cache for JSON-serializable generation results: an in-memory LRU
+    in front of a SQLite table. Entries expire after `ttl` seconds and each
+    tier evicts least-recently-used entries beyond its size limit. Entries can
+    carry a tag (e.g. a control id) for targeted invalidation. Caches sharing
+    one database file use separate tables.
+
+    The tiers have separate locks, so memory hits never wait on disk I/O, and
+    get_async/put_async run the disk tier on a worker thread for callers on
+    the event loop. Disk entries are counted as they are written; the table
+    is only counted and trimmed when that running count passes the limit.
+    """
+
+    def __init__(self, path: str, ttl: float, memory_entries: int, disk_entries: int, table: str = "entries"):
+        self.ttl = ttl
+        self.table = table
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple[float, str, Any]]" = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        key TEXT PRIMARY KEY,
+                        tag TEXT,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                    """
+                )
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_tag ON {self.table}(tag)")
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_access ON {self.table}(last_access)")
+                (self._disk_count,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            except Exception as e:
+                print(f"AI cache disk tier disabled ({path}): {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._get_disk(key)
+        if value is None:
+            self._count("misses")
+        return value
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """get() for the event loop: memory hits inline, disk lookups on a worker thread."""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._get_disk, key)
+        if value is None:
+            self._count("misses")
+        return value
+
+    def put(self, key: str, value: Any, tag: Optional[str] = None):
+        expires_at = self._put_memory(key, value, tag)
+        if self._db is not None:
+            self._put_disk(key, value, tag, expires_at)
+
+    async def put_async(self, key: str, value: Any, tag: Optional[str] = None):
+        """put() for the event loop: the disk write runs on a worker thread."""
+        expires_at = self._put_memory(key, value, tag)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, value, tag, expires_at)
+
+    def _count(self, counter: str, n: int = 1):
+        with self._lock:
+            self._counters[counter] += n
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, _, value = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self._counters["expired"] += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._db_lock:
+            row = self._db.execute(
+                f"SELECT tag, value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            tag, raw, expires_at = row
+            if expires_at <= now:
+                self._disk_count -= self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+                self._count("expired")
+                return None
+            self._db.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        value = json.loads(raw)
+        with self._lock:
+            self._remember(key, expires_at, tag, value)
+            self._counters["disk_hits"] += 1
+        return value
+
+    def _put_memory(self, key: str, value: Any, tag: Optional[str]) -> float:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, tag, value)
+            self._counters["writes"] += 1
+        return expires_at
+
+    def _put_disk(self, key: str, value: Any, tag: Optional[str], expires_at: float):
+        raw = json.dumps(value, default=str)
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, tag, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, tag, raw, expires_at, time.time()),
+            )
+            # Counts replacements too; _evict_disk corrects it with a real count
+            self._disk_count += 1
+            if self._disk_count > self.disk_entries:
+                self._evict_disk()
+
+    def _remember(self, key: str, expires_at: float, tag: Optional[str], value: Any):
+        self._memory[key] = (expires_at, tag, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self):
+        # Trims to DISK_EVICT_LOW_WATER of the limit, so the table is counted
+        # and trimmed about once per that share of disk_entries writes
+        (count,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.disk_entries:
+            excess = count - int(self.disk_entries * DISK_EVICT_LOW_WATER)
+            removed = self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)", (excess,)
+            ).rowcount
+            count -= removed
+            self._count("evictions", removed)
+        self._disk_count = count
+
+    def invalidate(self, key: Optional[str] = None, tag: Optional[str] = None) -> int:
+        """
+        Drops one key, every entry with `tag`, or (with neither) everything.
+        Returns the number of disk/memory entries removed.
+        """
+        with self._lock:
+            if key is not None:
+                keys = [key] if key in self._memory else []
+            elif tag is not None:
+                keys = [k for k, (_, t, _) in self._memory.items() if t == tag]
+            else:
+                keys = list(self._memory)
+            for k in keys:
+                del self._memory[k]
+            removed = len(keys)
+
+        if self._db is not None:
+            with self._db_lock:
+                if key is not None:
+                    cursor = self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                elif tag is not None:
+                    cursor = self._db.execute(f"DELETE FROM {self.table} WHERE tag = ?", (tag,))
+                else:
+                    cursor = self._db.execute(f"DELETE FROM {self.table}")
+                self._disk_count -= cursor.rowcount
+                removed = max(removed, cursor.rowcount)
+        return removed
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (expires_at, _, _) in self._memory.items() if expires_at <= now]
+            for k in expired:
+                del self._memory[k]
+        removed = len(expired)
+        if self._db is not None:
+            with self._db_lock:
+                purged = self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+                self._disk_count -= purged
+            removed += purged
+        self._count("expired", removed)
+        return removed
+
+    def stats(self) -> Dict:
+        disk_size = 0
+        if self._db is not None:
+            with self._db_lock:
+                (disk_size,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+                "disk_enabled": self._db is not None,
+                "ttl_seconds": self.ttl,
+            }
@@ -1,45 +1,121 @@
 import os
 import asyncio
 import json
-import vertexai
-from vertexai.generative_models import GenerativeModel
+import random
+from typing import AsyncIterator, Callable, Iterator
+import threading
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, TooManyRequests
 from dotenv import load_dotenv
 from models.schemas import Control, ControlStatus
+from services import ai_cache, executors, telemetry
+from services.fake_model import FakeGenerativeModel
 
-load_dotenv()
-
-# Ensure credentials helper runs early so vertexai.init can use ADC or a written key
 from services.gcp_auth_helper import ensure_credentials
-ensure_credentials()
+
+load_dotenv()
 
 # Configuration
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "orbyteprototype")
 LOCATION = os.getenv("GCP_LOCATION", "us-central1")
 MODEL_NAME = os.getenv("VERTEX_MODEL_NAME", "gemini-2.5-flash")
 USE_MOCK_AI = os.getenv("ORBYTE_USE_MOCK_AI", "false").lower() == "true"
+USE_FAKE_AI = os.getenv("ORBYTE_FAKE_AI", "false").lower() == "true"  # local fake model with latency and 429s
+VERTEX_MAX_RETRIES = int(os.getenv("ORBYTE_VERTEX_MAX_RETRIES", "4"))
+VERTEX_BACKOFF_SECONDS = float(os.getenv("ORBYTE_VERTEX_BACKOFF_SECONDS", "1.0"))
 
-# Initialize Vertex AI
-model = None
-if not USE_MOCK_AI:
-    try:
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        model = GenerativeModel(MODEL_NAME)
-        print(f"Vertex AI initialized with project {PROJECT_ID} and model {MODEL_NAME}")
-    except Exception as e:
-        print(f"Error initializing Vertex AI: {e}")
-        print("Falling back to Mock AI mode.")
-        model = None
+if USE_FAKE_AI:
+    MODEL_NAME = "fake"
 
-async def generate_implementation_statement(control: Control, evidence: list[dict[str, str]]) -> dict:
+# The model (and the vertexai import, the slowest part of startup) is created
+# on first use, so importing this module does no network or credential work
+_model_lock = threading.Lock()
+_model = None
+_model_error: str | None = None
+_model_resolved = False
+
+def get_model():
     """
-    Generates a compliance implementation statement using Vertex AI (or simulation).
+    The shared generative model, created on first call. Returns None in mock
+    mode or when Vertex AI cannot be initialized, in which case callers fall
+    back to mock responses; the failure is remembered, not retried.
     """
-    if USE_MOCK_AI or not model:
-        return await _generate_mock_implementation_statement(control, evidence)
+    global _model, _model_error, _model_resolved
+    if _model_resolved:
+        return _model
+    with _model_lock:
+        if not _model_resolved:
+            if USE_FAKE_AI:
+                _model = FakeGenerativeModel()
+                print("Using fake local model (ORBYTE_FAKE_AI=true)")
+            elif not USE_MOCK_AI:
+                ensure_credentials()
+                try:
+                    import vertexai
+                    from vertexai.generative_models import GenerativeModel
+                    vertexai.init(project=PROJECT_ID, location=LOCATION)
+                    _model = GenerativeModel(MODEL_NAME)
+                    print(f"Vertex AI initialized with project {PROJECT_ID} and model {MODEL_NAME}")
+                except Exception as e:
+                    print(f"Error initializing Vertex AI: {e}")
+                    print("Falling back to Mock AI mode.")
+                    _model_error = str(e) or type(e).__name__
+            _model_resolved = True
+    return _model
 
+def model_status() -> dict:
+    if USE_MOCK_AI and not USE_FAKE_AI:
+        return {"status": "mock"}
+    if not _model_resolved:
+        return {"status": "pending"}
+    if _model is None:
+        return {"status": "unavailable", "error": _model_error}
+    return {"status": "ready", "model": MODEL_NAME}
+
+async def resolve_model():
+    """
+    Resolves the model on the Vertex executor. Async code awaits this before
+    anything that calls get_model() or _use_mock() (cache keys included), so a
+    request that arrives before warm-up finished never imports and initializes
+    Vertex AI on the event loop.
+    """
+    if not _model_resolved:
+        await executors.vertex.run(get_model)
+
+def _use_mock() -> bool:
+    # Resolves the model on first call; from async code, await resolve_model() first
+    return USE_MOCK_AI or get_model() is None
+
+async def _generate_content(prompt: str):
+    """
+    model.generate_content on the bounded Vertex executor, rate limited, with
+    exponential backoff and jitter on 429/503 responses.
+    """
+    for attempt in range(VERTEX_MAX_RETRIES + 1):
+        await executors.vertex_rate_limiter.acquire()
+        try:
+            with telemetry.span("vertex.generate"):
+                return await executors.vertex.run(get_model().generate_content, prompt)
+        except (ResourceExhausted, TooManyRequests, ServiceUnavailable) as e:
+            if attempt == VERTEX_MAX_RETRIES:
+                raise
+            delay = VERTEX_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            print(f"Vertex AI throttled ({e}), retry {attempt + 1}/{VERTEX_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+# Bump when the implementation statement prompt changes so cached statements are not reused
+IMPLEMENTATION_PROMPT_VERSION = "1"
+
+statement_cache = ai_cache.TieredCache(
+    ai_cache.AI_CACHE_PATH,
+    ai_cache.AI_CACHE_TTL_SECONDS,
+    ai_cache.AI_CACHE_MEMORY_ENTRIES,
+    ai_cache.AI_CACHE_DISK_ENTRIES,
+)
+
+def _build_implementation_prompt(control: Control, evidence: list[dict[str, str]]) -> str:
     evidence_text = "\n".join([f"- {e.get('type', 'evidence')}: {e.get('detail', '')}" for e in evidence])
     
-    prompt = f"""
+    return f"""
 You are Orbyte, an AI cloud compliance copilot.
 You write short, auditor-ready implementation statements mapping Google Cloud configurations to compliance controls.
 Write in clear, factual, professional English, 2–4 sentences.
@@ -62,23 +138,54 @@ Task:
 2. Clearly indicate any gaps or risks if evidence is incomplete.
 3. Use "we" to refer to the organization.
 """
+
+def implementation_cache_key(control: Control, evidence: list[dict[str, str]]) -> str:
+    model_name = "mock" if _use_mock() else MODEL_NAME
+    return ai_cache.make_key(model_name, IMPLEMENTATION_PROMPT_VERSION, control.dict(), evidence)
+
+async def generate_implementation_statement(control: Control, evidence: list[dict[str, str]], fallback: bool = True) -> dict:
+    """
+    Generates a compliance implementation statement using Vertex AI (or simulation).
+    Results are cached by content, so unchanged controls and evidence skip the model call.
+    With fallback=False, model failures are raised instead of answered from the template.
+    """
+    await resolve_model()
+    key = implementation_cache_key(control, evidence)
+    cached = await statement_cache.get_async(key)
+    if cached is not None:
+        return cached
+
+    if _use_mock():
+        result = await _generate_mock_implementation_statement(control, evidence)
+        await statement_cache.put_async(key, result, tag=control.id)
+        return result
+
+    prompt = _build_implementation_prompt(control, evidence)
     try:
-        # Run in a thread to avoid blocking event loop if synchronous
-        response = await asyncio.to_thread(model.generate_content, prompt)
+        # Run on the bounded Vertex executor to avoid blocking the event loop
+        response = await _generate_content(prompt)
         statement = response.text
         confidence = 0.95 
-        return {
+        result = {
             "control_id": control.id,
             "status": control.status,
             "implementation_statement": statement,
             "analysis_confidence": confidence
         }
+        await statement_cache.put_async(key, result, tag=control.id)
+        return result
     except Exception as e:
         print(f"Vertex AI call failed: {e}")
+        if not fallback:
+            raise
+        # Fallback statements are not cached so the next click retries the model
         return await _generate_mock_implementation_statement(control, evidence)
 
 async def _generate_mock_implementation_statement(control: Control, evidence: list[dict[str, str]]) -> dict:
     await asyncio.sleep(1.2)
+    return _mock_implementation_result(control, evidence)
+
+def _mock_implementation_result(control: Control, evidence: list[dict[str, str]]) -> dict:
     if control.status == ControlStatus.PASS:
         statement = (
             f"For control {control.id} ({control.name}), analysis of configuration and "
@@ -98,14 +205,8 @@ async def _generate_mock_implementation_statement(control: Control, evidence: li
         "analysis_confidence": confidence
     }
 
-def generate_sustainability_insight(total_emissions_kg: float, potential_savings_kg: float, idle_count: int, worst_region: str | None) -> str:
-    """
-    Generates a sustainability insight.
-    """
-    if USE_MOCK_AI or not model:
-        return _generate_mock_sustainability_insight(total_emissions_kg, potential_savings_kg, idle_count, worst_region)
-
-    prompt = f"""
+def _build_sustainability_prompt(total_emissions_kg: float, potential_savings_kg: float, idle_count: int, worst_region: str | None) -> str:
+    return f"""
 You are Orbyte, an AI sustainability analyst for cloud environments.
 You generate concise, actionable insights about emissions, idle resources, and potential savings.
 Your tone is factual and data-driven.
@@ -120,8 +221,19 @@ Task:
 Write 1–2 sentences summarizing the most impactful action this team can take in the next month to reduce emissions and cost.
 Be specific (e.g., "Schedule off-hours shutdown for 12 idle dev VMs in us-central1").
 """
+
+async def generate_sustainability_insight_async(total_emissions_kg: float, potential_savings_kg: float, idle_count: int, worst_region: str | None) -> str:
+    """
+    Generates a sustainability insight through the rate-limited Vertex
+    executor with 429 retries, falling back to a template.
+    """
+    await resolve_model()
+    if _use_mock():
+        return _generate_mock_sustainability_insight(total_emissions_kg, potential_savings_kg, idle_count, worst_region)
+
+    prompt = _build_sustainability_prompt(total_emissions_kg, potential_savings_kg, idle_count, worst_region)
     try:
-        response = model.generate_content(prompt)
+        response = await _generate_content(prompt)
         return response.text
     except Exception as e:
         print(f"Vertex AI call failed: {e}")
@@ -141,14 +253,38 @@ def _generate_mock_sustainability_insight(total_emissions_kg: float, potential_s
     else:
         return "Emissions are relatively balanced across regions. Continue monitoring for optimization opportunities."
 
-def generate_scenario_narrative(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> dict:
+# Bump when the scenario prompt changes so cached narratives are not reused
+SCENARIO_PROMPT_VERSION = "1"
+
+narrative_cache = ai_cache.TieredCache(
+    ai_cache.AI_CACHE_PATH,
+    ai_cache.AI_CACHE_TTL_SECONDS,
+    ai_cache.AI_CACHE_MEMORY_ENTRIES,
+    ai_cache.AI_CACHE_DISK_ENTRIES,
+    table="scenario_narratives",
+)
+
+def bucket_result(value: float) -> float:
+    """Rounds a simulated figure to two significant digits, the precision a narrative quotes."""
+    return float(f"{value:.2g}")
+
+def scenario_narrative_inputs(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> tuple:
     """
-    Generates a narrative for a simulation result.
+    Normalized narrative inputs: results are bucketed and the workload
+    percent (already reflected in the results) is dropped, so equivalent
+    scenarios share one narrative.
     """
-    if USE_MOCK_AI or not model:
-        return _generate_mock_scenario_narrative(simulation_type, emissions_reduction_kg, cost_savings_usd)
+    params = {k: v for k, v in params.items() if k != "workload_percent"}
+    return simulation_type, params, bucket_result(emissions_reduction_kg), bucket_result(cost_savings_usd)
+
+def scenario_narrative_key(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> str:
+    return ai_cache.make_key(
+        "scenario_narrative", SCENARIO_PROMPT_VERSION, MODEL_NAME, _use_mock(),
+        *scenario_narrative_inputs(simulation_type, params, emissions_reduction_kg, cost_savings_usd),
+    )
 
-    prompt = f"""
+def _build_scenario_prompt(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> str:
+    return f"""
 You are Orbyte, an AI assistant that explains simulated changes to cloud infrastructure.
 You take numeric simulation results and translate them into clear, executive-ready summaries.
 
@@ -164,28 +300,54 @@ Task:
 2. Write 1 short sentence on potential risks or caveats.
 Return the response as a JSON object with keys "detail_summary" and "risk_summary".
 """
+
+def parse_scenario_narrative(text: str) -> dict:
+    """
+    Extracts detail/risk summaries from the model's (possibly fenced) JSON answer.
+    """
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        try:
-            data = json.loads(text)
-            return {
-                "detail_summary": data.get("detail_summary", text),
-                "risk_summary": data.get("risk_summary", "Review operational impact before applying.")
-            }
-        except:
-            return {
-                "detail_summary": text,
-                "risk_summary": "Review operational impact before applying."
-            }
+        data = json.loads(text)
+        return {
+            "detail_summary": data.get("detail_summary", text),
+            "risk_summary": data.get("risk_summary", "Review operational impact before applying.")
+        }
+    except:
+        return {
+            "detail_summary": text,
+            "risk_summary": "Review operational impact before applying."
+        }
+
+async def generate_scenario_narrative_async(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> dict:
+    """
+    Generates a narrative for a simulation result through the rate-limited
+    Vertex executor with 429 retries. Fallback narratives are returned but
+    not cached.
+    """
+    await resolve_model()
+    key = scenario_narrative_key(simulation_type, params, emissions_reduction_kg, cost_savings_usd)
+    cached = await narrative_cache.get_async(key)
+    if cached is not None:
+        return cached
+
+    inputs = scenario_narrative_inputs(simulation_type, params, emissions_reduction_kg, cost_savings_usd)
+    if _use_mock():
+        narrative = _generate_mock_scenario_narrative(inputs[0], inputs[2], inputs[3])
+        await narrative_cache.put_async(key, narrative, tag=simulation_type)
+        return narrative
+
+    try:
+        response = await _generate_content(_build_scenario_prompt(*inputs))
+        narrative = parse_scenario_narrative(response.text)
     except Exception as e:
         print(f"Vertex AI call failed: {e}")
-        return _generate_mock_scenario_narrative(simulation_type, emissions_reduction_kg, cost_savings_usd)
+        return _generate_mock_scenario_narrative(inputs[0], inputs[2], inputs[3])
+    await narrative_cache.put_async(key, narrative, tag=simulation_type)
+    return narrative
 
 def _generate_mock_scenario_narrative(simulation_type: str, emissions_reduction_kg: float, cost_savings_usd: float) -> dict:
     return {
@@ -195,3 +357,159 @@ def _generate_mock_scenario_narrative(simulation_type: str, emissions_reduction_
         ),
         "risk_summary": "Low risk: impact limited to non-production resources."
     }
+
+# --- Streaming ---
+
+MOCK_STREAM_CHUNK_DELAY_SECONDS = float(os.getenv("ORBYTE_MOCK_STREAM_CHUNK_DELAY_SECONDS", "0.03"))
+
+async def _mock_chunks(text: str) -> AsyncIterator[str]:
+    # Word-sized chunks so the mock path exercises the same streaming code as the model
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(MOCK_STREAM_CHUNK_DELAY_SECONDS)
+        yield word if i == 0 else " " + word
+
+def _iter_model_text(prompt: str) -> Iterator[str]:
+    # Covers the whole stream, including time the consumer spends between chunks
+    with telemetry.span("vertex.stream"):
+        for chunk in get_model().generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text (e.g. safety metadata only)
+                continue
+            if text:
+                yield text
+
+class StreamError:
+    """
+    Last item of a stream whose model output broke off after some text was
+    produced: the chunks so far are incomplete and nothing was cached.
+    """
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+async def _stream_model_text(prompt: str, fallback_text: Callable[[], str]) -> AsyncIterator[str | StreamError]:
+    """
+    Streams model output chunks. If the model fails before producing anything
+    the fallback text is streamed instead; a failure mid-stream ends the
+    stream with a StreamError.
+    """
+    produced = False
+    try:
+        await executors.vertex_rate_limiter.acquire()
+        async for text in executors.vertex.stream(_iter_model_text, prompt):
+            produced = True
+            yield text
+    except Exception as e:
+        print(f"Vertex AI streaming call failed: {e}")
+        if produced:
+            yield StreamError(f"Model output was interrupted: {e}")
+            return
+        async for text in _mock_chunks(fallback_text()):
+            yield text
+
+async def stream_implementation_statement(control: Control, evidence: list[dict[str, str]]) -> AsyncIterator[str | dict | StreamError]:
+    """
+    Streams the implementation statement as text chunks, then yields the
+    complete result dict (same shape as generate_implementation_statement),
+    or a StreamError if the model broke off mid-stream.
+    """
+    await resolve_model()
+    key = implementation_cache_key(control, evidence)
+    cached = await statement_cache.get_async(key)
+    if cached is not None:
+        yield cached["implementation_statement"]
+        yield cached
+        return
+
+    if _use_mock():
+        result = _mock_implementation_result(control, evidence)
+        async for text in _mock_chunks(result["implementation_statement"]):
+            yield text
+        await statement_cache.put_async(key, result, tag=control.id)
+        yield result
+        return
+
+    chunks: list[str] = []
+    failed = False
+
+    def fallback() -> str:
+        nonlocal failed
+        failed = True
+        return _mock_implementation_result(control, evidence)["implementation_statement"]
+
+    async for text in _stream_model_text(_build_implementation_prompt(control, evidence), fallback):
+        if isinstance(text, StreamError):
+            yield text
+            return
+        chunks.append(text)
+        yield text
+
+    result = {
+        "control_id": control.id,
+        "status": control.status,
+        "implementation_statement": "".join(chunks),
+        "analysis_confidence": 0.85 if failed else 0.95
+    }
+    if not failed:
+        await statement_cache.put_async(key, result, tag=control.id)
+    yield result
+
+async def stream_sustainability_insight(total_emissions_kg: float, potential_savings_kg: float, idle_count: int, worst_region: str | None) -> AsyncIterator[str | StreamError]:
+    await resolve_model()
+    fallback = lambda: _generate_mock_sustainability_insight(total_emissions_kg, potential_savings_kg, idle_count, worst_region)
+    if _use_mock():
+        async for text in _mock_chunks(fallback()):
+            yield text
+        return
+
+    prompt = _build_sustainability_prompt(total_emissions_kg, potential_savings_kg, idle_count, worst_region)
+    async for text in _stream_model_text(prompt, fallback):
+        yield text
+
+async def stream_scenario_narrative(simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> AsyncIterator[str | dict | StreamError]:
+    """
+    Streams the raw narrative text as chunks, then yields the parsed
+    {"detail_summary", "risk_summary"} dict, or a StreamError if the model
+    broke off mid-stream.
+    """
+    await resolve_model()
+    key = scenario_narrative_key(simulation_type, params, emissions_reduction_kg, cost_savings_usd)
+    cached = await narrative_cache.get_async(key)
+    if cached is not None:
+        yield cached["detail_summary"]
+        yield cached
+        return
+
+    inputs = scenario_narrative_inputs(simulation_type, params, emissions_reduction_kg, cost_savings_usd)
+    if _use_mock():
+        narrative = _generate_mock_scenario_narrative(inputs[0], inputs[2], inputs[3])
+        async for text in _mock_chunks(narrative["detail_summary"]):
+            yield text
+        await narrative_cache.put_async(key, narrative, tag=simulation_type)
+        yield narrative
+        return
+
+    chunks: list[str] = []
+    fallback_narrative = None
+
+    def fallback() -> str:
+        nonlocal fallback_narrative
+        fallback_narrative = _generate_mock_scenario_narrative(inputs[0], inputs[2], inputs[3])
+        return fallback_narrative["detail_summary"]
+
+    async for text in _stream_model_text(_build_scenario_prompt(*inputs), fallback):
+        if isinstance(text, StreamError):
+            yield text
+            return
+        chunks.append(text)
+        yield text
+    if fallback_narrative is not None:
+        yield fallback_narrative
+        return
+    narrative = parse_scenario_narrative("".join(chunks))
+    await narrative_cache.put_async(key, narrative, tag=simulation_type)
+    yield narrative
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Callable, Dict, List
+from models.schemas import Control
+from services import ai_reasoning
+
+# Upper bound on concurrent model calls a single batch may request
+BATCH_MAX_CONCURRENCY = int(os.getenv("ORBYTE_BATCH_MAX_CONCURRENCY", "8"))
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("ORBYTE_BATCH_DEFAULT_CONCURRENCY", "4"))
+
+async def run_batch(
+    controls: List[Control],
+    evidence_for: Callable[[Control], list[dict[str, str]]],
+    concurrency: int | None = None,
+) -> AsyncIterator[Dict]:
+    """
+    Generates implementation statements for `controls` with at most
+    `concurrency` in flight, yielding one item per control as soon as it
+    finishes (completion order, not input order) and a final summary item.
+    Model calls go through ai_reasoning, which applies rate limiting and
+    retries 429s with backoff; controls that still fail are reported as
+    errors rather than answered from the template. Closing the iterator early
+    (e.g. the client disconnects) cancels the remaining work.
+    """
+    limit = max(1, min(concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+    started = time.monotonic()
+
+    async def analyze(control: Control) -> Dict:
+        async with semaphore:
+            try:
+                result = await ai_reasoning.generate_implementation_statement(
+                    control, evidence_for(control), fallback=False
+                )
+                return {"control_id": control.id, "ok": True, "result": result}
+            except Exception as e:
+                return {"control_id": control.id, "ok": False, "error": str(e) or type(e).__name__}
+
+    tasks = [asyncio.create_task(analyze(c)) for c in controls]
+    succeeded = failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["ok"]:
+                succeeded += 1
+            else:
+                failed += 1
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "done": True,
+        "total": len(controls),
+        "succeeded": succeeded,
+        "failed": failed,
+        "concurrency": limit,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
@@ -1,64 +1,392 @@
-from google.cloud import bigquery
-from models.schemas import Control, Resource, ControlSeverity, ControlStatus
-from typing import List
+from models.schemas import ControlSeverity, ControlStatus
+from models.records import ControlRecord, ResourceRecord
+from collections import deque
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List, Literal, Optional, Set, Tuple, Union
+import dataclasses
+import functools
 import os
+import re
+import threading
+import time
 
-# Ensure credentials helper runs early
 from services.gcp_auth_helper import ensure_credentials
-ensure_credentials()
+from services import circuit_breaker, control_query, emission_factors, executors, metrics_engine, telemetry
+from services.columnar_metrics import ResourceColumns
+
+if TYPE_CHECKING:
+    from google.cloud import bigquery
 
 # Configuration
 PROJECT_ID = os.getenv("GCP_PROJECT_ID", "orbyteprototype")
 DATASET_ID = os.getenv("BQ_DATASET_ID", "orbyte")
 
-# Initialize Client
-try:
-    client = bigquery.Client(project=PROJECT_ID)
-    print(f"BigQuery client initialized for project: {PROJECT_ID}")
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    client = None
+# Projects/datasets to read the views from, comma-separated as [name=]project.dataset[@timeout_seconds],
+# e.g. "prod=acme-prod.orbyte,acme-dev.orbyte@10". Empty reads only PROJECT_ID.DATASET_ID.
+SOURCES_SPEC = os.getenv("ORBYTE_BQ_SOURCES", "")
+SOURCE_TIMEOUT_SECONDS = float(os.getenv("ORBYTE_BQ_SOURCE_TIMEOUT_SECONDS", str(executors.BQ_TIMEOUT_SECONDS)))
+SOURCE_CONCURRENCY = int(os.getenv("ORBYTE_BQ_SOURCE_CONCURRENCY", "4"))  # source loads running at once
+
+# Snapshot cache configuration (seconds)
+SNAPSHOT_TTL_SECONDS = float(os.getenv("ORBYTE_SNAPSHOT_TTL_SECONDS", "60"))
+SNAPSHOT_MAX_STALE_SECONDS = float(os.getenv("ORBYTE_SNAPSHOT_MAX_STALE_SECONDS", "600"))
+SNAPSHOT_NEGATIVE_TTL_SECONDS = float(os.getenv("ORBYTE_SNAPSHOT_NEGATIVE_TTL_SECONDS", "5"))
+
+# Skip BigQuery entirely and serve mock data (local development, benchmarks)
+USE_MOCK_DATA = os.getenv("ORBYTE_USE_MOCK_DATA", "false").lower() == "true"
+
+# Fetch resource rows as Arrow record batches (Storage Read API when installed) straight into
+# columns instead of paging Row objects; 0 streams lets BigQuery choose the parallelism
+ARROW_MODE = os.getenv("ORBYTE_BQ_ARROW", "false").lower() == "true"
+ARROW_MAX_STREAMS = int(os.getenv("ORBYTE_BQ_ARROW_MAX_STREAMS", "0"))
+
+# Use the offline fake client (services/fake_bigquery.py) instead of BigQuery
+USE_FAKE_BQ = os.getenv("ORBYTE_FAKE_BQ", "false").lower() == "true"
+
+# Keep local replicas of the views and fetch only rows changed since the last sync.
+# The views need an updated_at column and deletes must be recorded in tombstone tables.
+SYNC_MODE = os.getenv("ORBYTE_BQ_SYNC", "false").lower() == "true"
+SYNC_LOOKBACK_SECONDS = float(os.getenv("ORBYTE_BQ_SYNC_LOOKBACK_SECONDS", "300"))  # re-read window for late commits
+SYNC_FULL_SECONDS = float(os.getenv("ORBYTE_BQ_SYNC_FULL_SECONDS", "21600"))  # full reload interval
+CONTROLS_TOMBSTONES = os.getenv("ORBYTE_BQ_CONTROLS_TOMBSTONES", "controls_deleted")
+RESOURCES_TOMBSTONES = os.getenv("ORBYTE_BQ_RESOURCES_TOMBSTONES", "resources_deleted")
+
+# Aggregate sustainability totals inside BigQuery instead of pulling every resource row.
+# A synced replica already holds every row, so aggregates are computed locally then.
+AGGREGATE_MODE = os.getenv("ORBYTE_BQ_AGGREGATE", "true").lower() == "true" and not SYNC_MODE
+
+class Source:
+    """One project/dataset holding the views, with its own query timeout and circuit breaker."""
+
+    def __init__(self, name: str, project: str, dataset: str, timeout: float, breaker: circuit_breaker.CircuitBreaker):
+        self.name = name
+        self.project = project
+        self.dataset = dataset
+        self.timeout = timeout
+        self.breaker = breaker
+
+    def table(self, view: str) -> str:
+        return f"`{self.project}.{self.dataset}.{view}`"
+
+    def describe(self) -> Dict:
+        return {
+            "name": self.name,
+            "project": self.project,
+            "dataset": self.dataset,
+            "timeout_seconds": self.timeout,
+            "circuit_breaker": self.breaker.state,
+        }
+
+def parse_sources(spec: str) -> List[Source]:
+    """
+    Sources from ORBYTE_BQ_SOURCES. The first keeps the shared "bigquery"
+    circuit breaker; each other source gets its own, so one failing project
+    does not cut off the rest.
+    """
+    entries = [entry.strip() for entry in spec.split(",") if entry.strip()] or [f"{PROJECT_ID}.{DATASET_ID}"]
+    sources: List[Source] = []
+    for entry in entries:
+        name, _, target = entry.rpartition("=")
+        target, _, timeout = target.partition("@")
+        project, _, dataset = target.rpartition(".")
+        if not project or not dataset:
+            raise ValueError(f"Invalid BigQuery source {entry!r}, expected [name=]project.dataset[@timeout_seconds]")
+        name = name or (project if dataset == DATASET_ID else f"{project}.{dataset}")
+        if any(source.name == name for source in sources):
+            raise ValueError(f"Duplicate BigQuery source name {name!r}")
+        breaker = circuit_breaker.bigquery if not sources else circuit_breaker.CircuitBreaker(
+            f"bigquery:{name}", circuit_breaker.BQ_BREAKER_FAILURE_THRESHOLD,
+            circuit_breaker.BQ_BREAKER_RESET_SECONDS, circuit_breaker.BQ_BREAKER_MAX_RESET_SECONDS,
+        )
+        sources.append(Source(name, project, dataset, float(timeout) if timeout else SOURCE_TIMEOUT_SECONDS, breaker))
+    return sources
+
+SOURCES = parse_sources(SOURCES_SPEC)
+MULTI_SOURCE = len(SOURCES) > 1
+
+# The client (and the google.cloud.bigquery import) is created on first use,
+# so importing this module does no network or credential work
+_client_lock = threading.Lock()
+_client: Optional["bigquery.Client"] = None
+_client_error: Optional[str] = None
+_client_resolved = False
+
+def get_client() -> Optional["bigquery.Client"]:
+    """
+    The shared BigQuery client, created on first call. Returns None when it
+    cannot be created; the failure is remembered rather than retried on
+    every request, as with the old import-time client.
+    """
+    global _client, _client_error, _client_resolved
+    if _client_resolved:
+        return _client
+    with _client_lock:
+        if not _client_resolved and USE_MOCK_DATA:
+            _client_error = "disabled by ORBYTE_USE_MOCK_DATA"
+            _client_resolved = True
+        if not _client_resolved and USE_FAKE_BQ:
+            from services.fake_bigquery import FakeBigQueryClient
+            _client = FakeBigQueryClient()
+            print("Using fake local BigQuery client (ORBYTE_FAKE_BQ=true)")
+            _client_resolved = True
+        if not _client_resolved:
+            ensure_credentials()
+            try:
+                from google.cloud import bigquery
+                _client = bigquery.Client(project=PROJECT_ID)
+                print(f"BigQuery client initialized for project: {PROJECT_ID}")
+            except Exception as e:
+                print(f"Error initializing BigQuery client: {e}")
+                _client_error = str(e) or type(e).__name__
+            _client_resolved = True
+    return _client
+
+_bqstorage_client = None
+_bqstorage_resolved = False
+
+def get_bqstorage_client():
+    """
+    BigQuery Storage Read API client for Arrow downloads, created on first
+    call. None when google-cloud-bigquery-storage is not installed or the
+    client is the fake; Arrow results are then paged over REST.
+    """
+    global _bqstorage_client, _bqstorage_resolved
+    if _bqstorage_resolved:
+        return _bqstorage_client
+    with _client_lock:
+        if not _bqstorage_resolved:
+            if not USE_FAKE_BQ:
+                try:
+                    from google.cloud import bigquery_storage
+                    _bqstorage_client = bigquery_storage.BigQueryReadClient()
+                except Exception as e:
+                    print(f"[Orbyte] BigQuery Storage Read API unavailable, Arrow results use REST paging: {e}")
+            _bqstorage_resolved = True
+    return _bqstorage_client
+
+def client_status() -> Dict:
+    if not _client_resolved:
+        return {"status": "pending"}
+    if _client is None:
+        return {"status": "unavailable", "error": _client_error}
+    return {"status": "ready", "project": PROJECT_ID}
+
+def _string_param(name: str, value: str) -> "bigquery.ScalarQueryParameter":
+    from google.cloud import bigquery
+    return bigquery.ScalarQueryParameter(name, "STRING", value)
+
+def _job_config(query_parameters: Optional[list] = None, timeout: Optional[float] = None) -> "bigquery.QueryJobConfig":
+    from google.cloud import bigquery
+    # Let BigQuery cancel the job server-side once the caller has given up on it
+    return bigquery.QueryJobConfig(
+        job_timeout_ms=int((timeout or executors.BQ_TIMEOUT_SECONDS) * 1000),
+        query_parameters=query_parameters or [],
+    )
+
+def _timestamp_param(name: str, value) -> "bigquery.ScalarQueryParameter":
+    from google.cloud import bigquery
+    return bigquery.ScalarQueryParameter(name, "TIMESTAMP", value)
+
+def _sql_dialect(client) -> "SqlDialect":
+    # The fake client runs queries on SQLite
+    return getattr(client, "dialect", "bigquery")
+
+def _run_query_job(client: "bigquery.Client", query: str, query_parameters: Optional[list] = None,
+                   source: Optional[Source] = None) -> Tuple[list, int]:
+    """All result rows and the bytes billed for them, through the source's circuit breaker."""
+    source = source or SOURCES[0]
+
+    def run():
+        job = client.query(query, job_config=_job_config(query_parameters, source.timeout))
+        rows = list(job.result(timeout=source.timeout))
+        return rows, job.total_bytes_billed or 0
+    with telemetry.span("bigquery.query"):
+        return source.breaker.call(run)
+
+def _run_query(client: "bigquery.Client", query: str, query_parameters: Optional[list] = None,
+               source: Optional[Source] = None) -> list:
+    """All result rows, through the circuit breaker so an outage fails fast instead of timing out."""
+    return _run_query_job(client, query, query_parameters, source)[0]
+
+# Bulk row mappers: enum values are resolved through lookup tables rather than
+# per-row try/except, and rows become slotted records instead of validated
+# Pydantic models. Unknown severities map to low, unknown statuses to at_risk.
+# Records skip validation, so values are coerced to the declared types here:
+# NUMERIC columns arrive as Decimal, and NULL numbers become 0 and NULL
+# strings "".
+_SEVERITY_BY_VALUE = {s.value: s for s in ControlSeverity}
+_STATUS_BY_VALUE = {s.value: s for s in ControlStatus}
 
-def get_controls_from_bq() -> List[Control]:
+def _float(value) -> float:
+    return float(value) if value is not None else 0.0
+
+def _int(value) -> int:
+    return int(value) if value is not None else 0
+
+def _map_controls(rows) -> List[ControlRecord]:
+    severity_of = _SEVERITY_BY_VALUE.get
+    status_of = _STATUS_BY_VALUE.get
+    return [
+        ControlRecord(
+            row.control_id,
+            row.name or "",
+            row.framework or "",
+            severity_of((row.severity or "").lower(), ControlSeverity.LOW),
+            status_of((row.status or "").lower(), ControlStatus.AT_RISK),
+            _int(row.evidence_count),
+            row.description,
+        )
+        for row in rows
+    ]
+
+def _map_resources(rows) -> List[ResourceRecord]:
+    return [
+        ResourceRecord(
+            row.resource_id,
+            row.name or "",
+            row.type or "",
+            row.region or "",
+            row.instance_type or "",
+            _float(row.avg_cpu_7d),
+            _float(row.avg_hours_per_day),
+            _int(row.last_active_days_ago),
+            _float(row.daily_cost_usd),
+        )
+        for row in rows
+    ]
+
+def _qualified(source: Source, records: list) -> list:
+    # With several sources, ids carry their source so rows from different projects never collide
+    prefix = f"{source.name}/"
+    return [dataclasses.replace(record, id=prefix + record.id) for record in records]
+
+def get_controls_from_bq(source: Optional[Source] = None) -> List[ControlRecord]:
+    source = source or SOURCES[0]
+    client = get_client()
     if not client:
         return []
     
     query = f"""
     SELECT 
         control_id, name, framework, severity, status, evidence_count, description
-    FROM `{PROJECT_ID}.{DATASET_ID}.controls_view`
+    FROM {source.table("controls_view")}
     """
     
     try:
-        query_job = client.query(query)
-        results = []
-        for row in query_job:
-            # Map string values to Enums safely
-            try:
-                severity = ControlSeverity(row.severity.lower())
-            except ValueError:
-                severity = ControlSeverity.LOW
-                
-            try:
-                status = ControlStatus(row.status.lower())
-            except ValueError:
-                status = ControlStatus.AT_RISK
-
-            results.append(Control(
-                id=row.control_id,
-                name=row.name,
-                framework=row.framework,
-                severity=severity,
-                status=status,
-                evidence_count=row.evidence_count,
-                description=row.description
-            ))
-        return results
+        rows = _run_query(client, query, source=source)
+        with telemetry.span("bigquery.map_controls"):
+            return _map_controls(rows)
+    except circuit_breaker.CircuitOpenError:
+        return []
     except Exception as e:
-        print(f"BigQuery error fetching controls: {e}")
+        print(f"BigQuery error fetching controls from {source.name}: {e}")
         return []
 
-def get_resources_from_bq() -> List[Resource]:
+def get_control_from_bq(control_id: str) -> Optional[ControlRecord]:
+    """
+    Single-row lookup by id. Returns None when the control does not exist and
+    raises when BigQuery is unavailable, so callers can tell the two apart.
+    With several sources the id is qualified as "<source>/<control id>".
+    """
+    client = get_client()
+    if not client:
+        raise RuntimeError("BigQuery client is not initialized")
+
+    source = SOURCES[0]
+    if MULTI_SOURCE:
+        source_name, _, control_id = control_id.partition("/")
+        source = next((s for s in SOURCES if s.name == source_name), None)
+        if source is None or not control_id:
+            return None
+
+    query = f"""
+    SELECT
+        control_id, name, framework, severity, status, evidence_count, description
+    FROM {source.table("controls_view")}
+    WHERE control_id = @control_id
+    LIMIT 1
+    """
+    params = [_string_param("control_id", control_id)]
+    rows = _run_query(client, query, params, source)
+    if not rows:
+        return None
+    controls = _map_controls(rows[:1])
+    return _qualified(source, controls)[0] if MULTI_SOURCE else controls[0]
+
+def iter_controls_from_bq(
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+) -> Iterator[ControlRecord]:
+    """
+    Yields controls as pages arrive from the BigQuery row iterator, with the
+    filters applied in SQL. Rows whose severity/status are not recognised only
+    match when no filter is given for that field. Several sources are read
+    one after another; a failing source is skipped unless all of them fail.
+    """
+    if not MULTI_SOURCE:
+        yield from _iter_source_controls(SOURCES[0], framework, severity, status)
+        return
+    errors = []
+    for source in SOURCES:
+        try:
+            for page in _iter_source_pages(source, framework, severity, status):
+                yield from _qualified(source, page)
+        except Exception as e:
+            print(f"[Orbyte] BigQuery controls stream from {source.name} failed: {e}")
+            errors.append(e)
+    if len(errors) == len(SOURCES):
+        raise errors[-1]
+
+def _iter_source_controls(source: Source, framework: Optional[str], severity: Optional[ControlSeverity],
+                          status: Optional[ControlStatus]) -> Iterator[ControlRecord]:
+    for page in _iter_source_pages(source, framework, severity, status):
+        yield from page
+
+def _iter_source_pages(source: Source, framework: Optional[str], severity: Optional[ControlSeverity],
+                       status: Optional[ControlStatus]) -> Iterator[List[ControlRecord]]:
+    client = get_client()
+    if not client:
+        return
+
+    conditions = []
+    params = []
+    if framework:
+        conditions.append("framework = @framework")
+        params.append(_string_param("framework", framework))
+    if severity:
+        conditions.append("LOWER(severity) = @severity")
+        params.append(_string_param("severity", severity.value))
+    if status:
+        conditions.append("LOWER(status) = @status")
+        params.append(_string_param("status", status.value))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"""
+    SELECT
+        control_id, name, framework, severity, status, evidence_count, description
+    FROM {source.table("controls_view")}
+    {where}
+    """
+    breaker = source.breaker
+    if not breaker.allow():
+        raise circuit_breaker.CircuitOpenError(f"{breaker.name} circuit is open")
+    try:
+        rows = client.query(query, job_config=_job_config(params, source.timeout)).result(page_size=1000)
+        for page in rows.pages:
+            yield _map_controls(page)
+    except GeneratorExit:
+        # Consumer stopped early; the query itself worked
+        breaker.record_success()
+        raise
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    breaker.record_success()
+
+def get_resources_from_bq(source: Optional[Source] = None) -> List[ResourceRecord]:
+    source = source or SOURCES[0]
+    client = get_client()
     if not client:
         return []
 
@@ -66,25 +394,747 @@ def get_resources_from_bq() -> List[Resource]:
     SELECT
         resource_id, name, type, region, instance_type, 
         avg_cpu_7d, avg_hours_per_day, last_active_days_ago, daily_cost_usd
-    FROM `{PROJECT_ID}.{DATASET_ID}.resources_view`
+    FROM {source.table("resources_view")}
     """
     
     try:
-        query_job = client.query(query)
-        results = []
-        for row in query_job:
-            results.append(Resource(
-                id=row.resource_id,
-                name=row.name,
-                type=row.type,
-                region=row.region,
-                instance_type=row.instance_type,
-                avg_cpu_7d=row.avg_cpu_7d,
-                avg_hours_per_day=row.avg_hours_per_day,
-                last_active_days_ago=row.last_active_days_ago,
-                daily_cost_usd=row.daily_cost_usd
-            ))
-        return results
+        rows = _run_query(client, query, source=source)
+        with telemetry.span("bigquery.map_resources"):
+            return _map_resources(rows)
+    except circuit_breaker.CircuitOpenError:
+        return []
     except Exception as e:
-        print(f"BigQuery error fetching resources: {e}")
+        print(f"BigQuery error fetching resources from {source.name}: {e}")
+        return []
+
+def get_resource_columns_from_bq(source: Optional[Source] = None) -> Union[ResourceColumns, list]:
+    """
+    resources_view downloaded as Arrow record batches, over parallel Storage
+    Read API streams when available, and decoded straight into NumPy columns
+    without building a Python object per row. Raises on query errors.
+    """
+    source = source or SOURCES[0]
+    client = get_client()
+    if not client:
+        return []
+
+    query = f"""
+    SELECT
+        resource_id, name, type, region, instance_type,
+        avg_cpu_7d, avg_hours_per_day, last_active_days_ago, daily_cost_usd
+    FROM {source.table("resources_view")}
+    """
+
+    def run():
+        rows = client.query(query, job_config=_job_config(timeout=source.timeout)).result(timeout=source.timeout)
+        return list(rows.to_arrow_iterable(
+            bqstorage_client=get_bqstorage_client(), max_stream_count=ARROW_MAX_STREAMS or None
+        ))
+
+    with telemetry.span("bigquery.query"):
+        batches = source.breaker.call(run)
+    if not batches:
+        return []
+    import pyarrow
+    with telemetry.span("bigquery.map_resources"):
+        return ResourceColumns.from_arrow(pyarrow.Table.from_batches(batches))
+
+# --- Aggregation pushdown ---
+
+SqlDialect = Literal["bigquery", "sqlite", "duckdb"]
+
+_SAFE_KEY = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+def _sql_literal(value) -> str:
+    # Quoting rules differ between dialects, so only plain identifiers (machine types, regions) are inlined
+    if isinstance(value, str):
+        if not _SAFE_KEY.match(value):
+            raise ValueError(f"Unsafe lookup key for SQL: {value!r}")
+        return f"'{value}'"
+    return repr(float(value))
+
+def _lookup_cte(name: str, key: str, value: str, table: Dict[str, float], dialect: SqlDialect) -> str:
+    """Inline lookup table built from one of the emission factor dicts."""
+    if dialect == "bigquery":
+        rows = ", ".join(
+            f"STRUCT({_sql_literal(k)} AS {key}, {_sql_literal(v)} AS {value})" for k, v in table.items()
+        )
+        return f"{name} AS (SELECT * FROM UNNEST([{rows}]))"
+    rows = ", ".join(f"({_sql_literal(k)}, {_sql_literal(v)})" for k, v in table.items())
+    return f"{name}({key}, {value}) AS (VALUES {rows})"
+
+def build_region_totals_sql(table: str, dialect: SqlDialect = "bigquery") -> str:
+    """
+    Per-region monthly emissions, idle counts and idle savings, using the same
+    formula, factors and idle rule as metrics_engine.compute_sustainability_metrics.
+    Rows are ordered by region name, not by first appearance in the view.
+    """
+    factors = emission_factors.current()
+    return f"""
+    WITH {_lookup_cte("power", "instance_type", "power_kw", factors.instance_power_kw, dialect)},
+    {_lookup_cte("intensity", "region", "grid_intensity", factors.grid_intensity, dialect)},
+    emissions AS (
+        SELECT
+            r.region,
+            r.avg_hours_per_day * COALESCE(p.power_kw, {_sql_literal(factors.default_power_kw)}) * COALESCE(g.grid_intensity, {_sql_literal(factors.default_intensity)}) * {_sql_literal(factors.pue)} * 30 AS monthly_emissions_kg,
+            (r.avg_cpu_7d < 0.05 AND r.last_active_days_ago > 3) AS is_idle,
+            r.daily_cost_usd
+        FROM {table} r
+        LEFT JOIN power p ON p.instance_type = r.instance_type
+        LEFT JOIN intensity g ON g.region = r.region
+    )
+    SELECT
+        region,
+        COUNT(*) AS resource_count,
+        SUM(monthly_emissions_kg) AS monthly_emissions_kg,
+        SUM(CASE WHEN is_idle THEN 1 ELSE 0 END) AS idle_count,
+        SUM(CASE WHEN is_idle THEN monthly_emissions_kg ELSE 0 END) AS idle_monthly_emissions_kg,
+        SUM(CASE WHEN is_idle THEN daily_cost_usd * 30 ELSE 0 END) AS idle_monthly_cost_usd
+    FROM emissions
+    GROUP BY region
+    ORDER BY region
+    """
+
+def build_idle_resources_sql(table: str) -> str:
+    return f"""
+    SELECT
+        resource_id, name, type, region, instance_type,
+        avg_cpu_7d, avg_hours_per_day, last_active_days_ago, daily_cost_usd
+    FROM {table}
+    WHERE avg_cpu_7d < 0.05 AND last_active_days_ago > 3
+    """
+
+def get_region_totals_from_bq(source: Optional[Source] = None) -> List[Dict]:
+    """
+    Per-region totals aggregated server-side. Raises on query errors so the
+    snapshot cache can tell a failure from an empty fleet.
+    """
+    source = source or SOURCES[0]
+    client = get_client()
+    if not client:
         return []
+    sql = build_region_totals_sql(source.table("resources_view"), _sql_dialect(client))
+    rows = _run_query(client, sql, source=source)
+    with telemetry.span("bigquery.map_region_totals"):
+        return [
+            {
+                "region": row.region,
+                "resource_count": row.resource_count,
+                "monthly_emissions_kg": row.monthly_emissions_kg or 0.0,
+                "idle_count": row.idle_count,
+                "idle_monthly_emissions_kg": row.idle_monthly_emissions_kg or 0.0,
+                "idle_monthly_cost_usd": row.idle_monthly_cost_usd or 0.0,
+            }
+            for row in rows
+        ]
+
+def get_idle_resources_from_bq(source: Optional[Source] = None) -> List[ResourceRecord]:
+    """Only the rows matching the idle rule. Raises on query errors."""
+    source = source or SOURCES[0]
+    client = get_client()
+    if not client:
+        return []
+    rows = _run_query(client, build_idle_resources_sql(source.table("resources_view")), source=source)
+    with telemetry.span("bigquery.map_idle_resources"):
+        return _map_resources(rows)
+
+# --- Incremental sync ---
+
+class TableReplica:
+    """
+    Local copy of one BigQuery view, kept current by watermark queries.
+
+    The first sync (and one every `full_every` seconds, which also drops rows
+    deleted without a tombstone) reads the whole view. Later syncs read only
+    rows with `updated_at` past the watermark, plus ids from the tombstone
+    table with `deleted_at` past it, so bytes billed scale with churn when
+    both are partitioned or clustered on those columns. The window starts
+    `lookback` seconds before the watermark to catch rows committed late;
+    changes are applied in timestamp order and anything older than what the
+    replica already has for an id is ignored, so re-read rows are harmless.
+    sync() returns the same list object while nothing changed, so
+    identity-keyed caches downstream keep hitting.
+    """
+
+    def __init__(self, name: str, view: str, tombstones: str, key: str, columns: str,
+                 mapper: Callable[[list], list], lookback: float, full_every: float, source: Source):
+        self.name = name
+        self.source = source
+        self.view = view
+        self.tombstones = tombstones
+        self.key = key
+        self.columns = columns
+        self.lookback = lookback
+        self.full_every = full_every
+        self._mapper = mapper
+        self._lock = threading.Lock()
+        self._rows: Dict[str, object] = {}
+        self._updated_at: Dict[str, object] = {}  # per id, including deleted ids
+        self._snapshot: list = []
+        self._watermark = None
+        self._next_full = 0.0
+        self._counters = {
+            "full_syncs": 0,
+            "delta_syncs": 0,
+            "unchanged_syncs": 0,
+            "rows_upserted": 0,
+            "rows_deleted": 0,
+            "bytes_billed": 0,
+            "last_bytes_billed": 0,
+        }
+
+    def sync(self) -> list:
+        """The current rows. Raises on query errors, leaving the replica as it was."""
+        client = get_client()
+        if not client:
+            return []
+        with self._lock:
+            if self._watermark is None or time.monotonic() >= self._next_full:
+                billed = self._full(client)
+            else:
+                billed = self._delta(client)
+            self._counters["bytes_billed"] += billed
+            self._counters["last_bytes_billed"] = billed
+            return self._snapshot
+
+    def _full(self, client) -> int:
+        rows, billed = _run_query_job(
+            client, f"SELECT {self.columns}, updated_at FROM {self.source.table(self.view)}", source=self.source
+        )
+        with telemetry.span(f"bigquery.map_{self.name}"):
+            records = self._mapper(rows)
+        self._rows = {record.id: record for record in records}
+        self._updated_at = {record.id: row.updated_at for record, row in zip(records, rows)}
+        self._snapshot = list(self._rows.values())
+        self._watermark = max((t for t in self._updated_at.values() if t is not None), default=None)
+        self._next_full = time.monotonic() + self.full_every
+        self._counters["full_syncs"] += 1
+        return billed
+
+    def _delta(self, client) -> int:
+        params = [_timestamp_param("since", self._watermark - timedelta(seconds=self.lookback))]
+        changed, changed_billed = _run_query_job(
+            client, f"SELECT {self.columns}, updated_at FROM {self.source.table(self.view)} WHERE updated_at > @since", params,
+            self.source,
+        )
+        deleted, deleted_billed = _run_query_job(
+            client,
+            f"SELECT {self.key} AS id, deleted_at FROM {self.source.table(self.tombstones)} WHERE deleted_at > @since",
+            params, self.source,
+        )
+        # (time, 0 = delete / 1 = upsert, payload); an upsert wins a tie with a delete
+        events = [(row.updated_at, 1, record) for row, record in zip(changed, self._mapper(changed))]
+        events += [(row.deleted_at, 0, row.id) for row in deleted]
+        events.sort(key=lambda event: event[:2])
+
+        upserted = removed = 0
+        for at, is_upsert, payload in events:
+            row_id = payload.id if is_upsert else payload
+            known = self._updated_at.get(row_id)
+            if known is not None and at < known:
+                continue
+            self._updated_at[row_id] = at
+            if is_upsert:
+                if self._rows.get(row_id) != payload:
+                    self._rows[row_id] = payload
+                    upserted += 1
+            elif self._rows.pop(row_id, None) is not None:
+                removed += 1
+            if at > self._watermark:
+                self._watermark = at
+
+        if upserted or removed:
+            self._snapshot = list(self._rows.values())
+        else:
+            self._counters["unchanged_syncs"] += 1
+        self._counters["delta_syncs"] += 1
+        self._counters["rows_upserted"] += upserted
+        self._counters["rows_deleted"] += removed
+        return changed_billed + deleted_billed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "size": len(self._snapshot),
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+            }
+
+# One pair of replicas per source
+controls_replicas = {
+    source.name: TableReplica(
+        "controls", "controls_view", CONTROLS_TOMBSTONES, "control_id",
+        "control_id, name, framework, severity, status, evidence_count, description",
+        _map_controls, SYNC_LOOKBACK_SECONDS, SYNC_FULL_SECONDS, source,
+    )
+    for source in SOURCES
+}
+resources_replicas = {
+    source.name: TableReplica(
+        "resources", "resources_view", RESOURCES_TOMBSTONES, "resource_id",
+        "resource_id, name, type, region, instance_type, avg_cpu_7d, avg_hours_per_day, last_active_days_ago, daily_cost_usd",
+        _map_resources, SYNC_LOOKBACK_SECONDS, SYNC_FULL_SECONDS, source,
+    )
+    for source in SOURCES
+}
+
+# --- Snapshot cache ---
+
+class _Flight:
+    """A single in-flight load that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: list = []
+
+class SnapshotCache:
+    """
+    Process-wide cache for one BigQuery result set.
+
+    Snapshots younger than `ttl` are served as-is. Older snapshots are still
+    served for up to `max_stale` more seconds while a background thread
+    refreshes them (stale-while-revalidate). Past that, or when nothing is
+    cached yet, callers block on the load, and concurrent callers share the
+    same in-flight query. Empty results are not cached unless `cache_empty` is
+    set (for loaders that raise on failure). A failed or empty load is
+    negatively cached instead: for `negative_ttl` seconds callers with no
+    usable snapshot get [] at once rather than each retrying the query.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], list], ttl: float, max_stale: float, cache_empty: bool = False,
+                 negative_ttl: float = SNAPSHOT_NEGATIVE_TTL_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.cache_empty = cache_empty
+        self.negative_ttl = negative_ttl
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value: Optional[list] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._flight: Optional[_Flight] = None
+        self._negative_until = 0.0
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "empty_loads": 0,
+            "load_errors": 0,
+        }
+
+    def get(self, block: bool = True) -> Optional[list]:
+        """
+        Returns the current snapshot. With block=False, returns None instead of
+        waiting when a synchronous load would be needed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._value is not None:
+                age = now - self._loaded_at
+                if age < self.ttl:
+                    self._counters["hits"] += 1
+                    return self._value
+                if age < self.ttl + self.max_stale:
+                    self._counters["stale_hits"] += 1
+                    if self._flight is None and now >= self._negative_until:
+                        flight = self._flight = _Flight()
+                        threading.Thread(
+                            target=self._load, args=(flight,),
+                            name=f"snapshot-refresh-{self.name}", daemon=True
+                        ).start()
+                    return self._value
+
+            if now < self._negative_until:
+                self._counters["negative_hits"] += 1
+                return []
+            if not block:
+                return None
+            self._counters["misses"] += 1
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+
+        if leader:
+            self._load(flight)
+        else:
+            flight.done.wait()
+        return flight.result
+
+    def _load(self, flight: _Flight):
+        try:
+            result = self._loader()
+        except circuit_breaker.CircuitOpenError:
+            result = []
+            error = True
+        except Exception as e:
+            print(f"Snapshot load failed for {self.name}: {e}")
+            result = []
+            error = True
+        else:
+            error = False
+
+        with self._lock:
+            self._counters["refreshes"] += 1
+            if error:
+                self._counters["load_errors"] += 1
+            if result or (self.cache_empty and not error):
+                self._value = result
+                self._loaded_at = time.monotonic()
+                self._version += 1
+                self._negative_until = 0.0
+            else:
+                self._negative_until = time.monotonic() + self.negative_ttl
+            if not result:
+                self._counters["empty_loads"] += 1
+            # Followers of a failed background refresh still get the stale snapshot
+            flight.result = self._value if self._value is not None else result
+            self._flight = None
+        flight.done.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._loaded_at = 0.0
+            self._negative_until = 0.0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def stats(self) -> Dict:
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._value is not None else None
+            return {
+                **self._counters,
+                "version": self._version,
+                "size": len(self._value) if self._value is not None else 0,
+                "age_seconds": age,
+                "is_stale": age is not None and age >= self.ttl,
+                "refresh_in_flight": self._flight is not None,
+                "negative_cached": time.monotonic() < self._negative_until,
+            }
+
+class _SourceLoad:
+    """One scheduled load of a source's snapshot cache."""
+
+    def __init__(self, source: Source, cache: "SnapshotCache"):
+        self.source = source
+        self.cache = cache
+        self.started: Optional[float] = None
+        self.done = threading.Event()
+        self.result: Optional[list] = None
+        self.timed_out = False
+
+    @property
+    def deadline(self) -> Optional[float]:
+        return self.started + self.source.timeout if self.started is not None else None
+
+class SourceScheduler:
+    """
+    Runs source loads on their own threads, at most `limit` at a time, in
+    submission order. A running load holds its slot until it finishes or
+    outlives its source's timeout; past that it keeps running but no longer
+    counts, so hung projects cannot keep the queued ones from starting.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._queue: Deque[_SourceLoad] = deque()
+        self._running: Set[_SourceLoad] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._counters = {"started": 0, "overran": 0}
+
+    def submit(self, load: _SourceLoad):
+        with self._lock:
+            self._queue.append(load)
+            self._dispatch()
+
+    def _dispatch(self):
+        # Called with the lock held
+        now = time.monotonic()
+        for load in [load for load in self._running if load.deadline <= now]:
+            self._running.discard(load)
+            self._counters["overran"] += 1
+        while self._queue and len(self._running) < self.limit:
+            load = self._queue.popleft()
+            load.started = now
+            self._running.add(load)
+            self._counters["started"] += 1
+            threading.Thread(target=self._run, args=(load,), name=f"bq-source-{load.source.name}", daemon=True).start()
+        if self._queue and self._timer is None:
+            # Free the slot of the first load to overrun even if nothing else happens meanwhile
+            self._timer = threading.Timer(max(0.0, min(load.deadline for load in self._running) - now), self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _run(self, load: _SourceLoad):
+        try:
+            load.result = load.cache.get()
+        finally:
+            with self._lock:
+                self._running.discard(load)
+                self._dispatch()
+            load.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, "limit": self.limit, "queued": len(self._queue), "running": len(self._running)}
+
+source_scheduler = SourceScheduler(SOURCE_CONCURRENCY)
+
+class MultiSourceSnapshot:
+    """
+    One snapshot merged from a SnapshotCache per source, with the same get /
+    invalidate / stats interface.
+
+    Cold sources are loaded through source_scheduler, each at most once at a
+    time however many callers ask, and callers wait for a load until its
+    source's timeout, counted from when the load started, but no longer than
+    the timeout from when they started waiting. A source that is still queued
+    or loading then, or that failed, is left out until its snapshot is ready,
+    so a slow or broken project never holds up the others. Rows are qualified
+    with their source (see _qualified). The merge is cached on the identity
+    of the parts, so while no source changed the same object is returned and
+    identity-keyed caches downstream keep hitting.
+    """
+
+    def __init__(self, name: str, caches: List[Tuple[Source, "SnapshotCache"]], merge: Callable[[list], Any]):
+        self.name = name
+        self._caches = caches
+        self._merge = merge
+        self._lock = threading.Lock()
+        self._loads: Dict[str, _SourceLoad] = {}
+        self._merged_parts: Optional[list] = None
+        self._merged = None
+        self._status: Dict[str, str] = {}
+        self._counters = {"merges": 0, "partial_results": 0}
+
+    def get(self, block: bool = True):
+        parts: Dict[str, Any] = {}
+        cold = []
+        for source, cache in self._caches:
+            part = cache.get(block=False)
+            if part is None:
+                cold.append((source, cache))
+            else:
+                parts[source.name] = part
+        if cold and not block:
+            return None
+
+        status: Dict[str, str] = {}
+        if cold:
+            loads = []
+            with self._lock:
+                for source, cache in cold:
+                    load = self._loads.get(source.name)
+                    if load is None or load.done.is_set():
+                        load = self._loads[source.name] = _SourceLoad(source, cache)
+                        source_scheduler.submit(load)
+                    loads.append(load)
+            waiting_since = time.monotonic()
+            for load in loads:
+                limit = waiting_since + load.source.timeout
+                deadline = load.deadline
+                if load.done.wait(max(0.0, min(limit, deadline if deadline is not None else limit) - time.monotonic())):
+                    parts[load.source.name] = load.result
+                elif load.started is None:
+                    status[load.source.name] = "queued"
+                elif time.monotonic() >= load.deadline:
+                    status[load.source.name] = "timed_out"
+                    if not load.timed_out:
+                        load.timed_out = True
+                        print(f"[Orbyte] BigQuery source {load.source.name} timed out loading {self.name} after {load.source.timeout}s")
+                else:
+                    status[load.source.name] = "loading"
+
+        available = []
+        for source, _ in self._caches:
+            part = parts.get(source.name)
+            if part is None:
+                continue
+            status[source.name] = "ok" if len(part) else "no_data"
+            if len(part):
+                available.append((source, part))
+        with self._lock:
+            self._status.update(status)
+            if not available:
+                return []
+            if len(available) < len(self._caches):
+                self._counters["partial_results"] += 1
+            if self._merged_parts is None or len(available) != len(self._merged_parts) or any(
+                a[0] is not b[0] or a[1] is not b[1] for a, b in zip(available, self._merged_parts)
+            ):
+                self._merged = self._merge(available)
+                self._merged_parts = available
+                self._counters["merges"] += 1
+            return self._merged
+
+    def invalidate(self):
+        for _, cache in self._caches:
+            cache.invalidate()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            merged = self._merged
+            status = dict(self._status)
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "size": len(merged) if merged is not None else 0,
+            "sources": {
+                source.name: {**cache.stats(), "status": status.get(source.name)}
+                for source, cache in self._caches
+            },
+        }
+
+# Merges of per-source parts, each a list of (source, snapshot) in source order
+
+def _merge_records(parts: list) -> list:
+    merged = []
+    for source, records in parts:
+        merged.extend(_qualified(source, records))
+    return merged
+
+def _merge_columns(parts: list) -> ResourceColumns:
+    import pyarrow
+    import pyarrow.compute
+    tables = []
+    for source, columns in parts:
+        table = columns.arrow
+        ids = pyarrow.compute.binary_join_element_wise(f"{source.name}/", table.column("resource_id"), "")
+        tables.append(table.set_column(table.schema.get_field_index("resource_id"), "resource_id", ids))
+    return ResourceColumns.from_arrow(pyarrow.concat_tables(tables))
+
+def _merge_region_totals(parts: list) -> List[Dict]:
+    by_region: Dict[str, Dict] = {}
+    for _, rows in parts:
+        for row in rows:
+            total = by_region.get(row["region"])
+            if total is None:
+                by_region[row["region"]] = dict(row)
+            else:
+                for key, value in row.items():
+                    if key != "region":
+                        total[key] += value
+    # Keep the per-source ORDER BY region across sources
+    return [by_region[region] for region in sorted(by_region)]
+
+def _snapshot(name: str, loader: Callable[[Source], Callable[[], Any]], merge: Callable[[list], Any], **kwargs):
+    """A SnapshotCache for a single source, or a MultiSourceSnapshot over one cache per source."""
+    if not MULTI_SOURCE:
+        return SnapshotCache(name, loader(SOURCES[0]), SNAPSHOT_TTL_SECONDS, SNAPSHOT_MAX_STALE_SECONDS, **kwargs)
+    return MultiSourceSnapshot(name, [
+        (source, SnapshotCache(f"{name}@{source.name}", loader(source), SNAPSHOT_TTL_SECONDS, SNAPSHOT_MAX_STALE_SECONDS, **kwargs))
+        for source in SOURCES
+    ], merge)
+
+def _resources_loader(source: Source) -> Callable[[], Any]:
+    if SYNC_MODE:
+        return resources_replicas[source.name].sync
+    # In Arrow mode the resources snapshot is a ResourceColumns rather than a list of records
+    return functools.partial(get_resource_columns_from_bq if ARROW_MODE else get_resources_from_bq, source)
+
+controls_cache = _snapshot(
+    "controls",
+    lambda source: controls_replicas[source.name].sync if SYNC_MODE else functools.partial(get_controls_from_bq, source),
+    _merge_records,
+)
+resources_cache = _snapshot("resources", _resources_loader, _merge_columns if ARROW_MODE and not SYNC_MODE else _merge_records)
+region_totals_cache = _snapshot(
+    "region_totals", lambda source: functools.partial(get_region_totals_from_bq, source), _merge_region_totals
+)
+idle_resources_cache = _snapshot(
+    "idle_resources", lambda source: functools.partial(get_idle_resources_from_bq, source), _merge_records,
+    cache_empty=True,
+)
+
+# Region totals are aggregated in SQL with the factors inlined, so new factors invalidate them
+emission_factors.registry.on_reload(lambda _: region_totals_cache.invalidate())
+
+def get_cached_controls() -> List[ControlRecord]:
+    return controls_cache.get()
+
+def get_cached_resources() -> Union[List[ResourceRecord], ResourceColumns]:
+    return resources_cache.get()
+
+async def fetch_controls() -> List[ControlRecord]:
+    """Event-loop friendly variant of get_cached_controls."""
+    controls = controls_cache.get(block=False)
+    if controls is not None:
+        return controls
+    return await executors.bigquery.run(controls_cache.get)
+
+async def fetch_control(control_id: str) -> Optional[ControlRecord]:
+    """
+    Looks a control up in the cached snapshot's index, or with a single-row
+    query when the cache is cold. Raises when BigQuery is unavailable.
+    """
+    controls = controls_cache.get(block=False)
+    if controls:
+        return control_query.index_for(controls).get(control_id)
+    return await executors.bigquery.run(get_control_from_bq, control_id)
+
+async def fetch_resources() -> Union[List[ResourceRecord], ResourceColumns]:
+    """Event-loop friendly variant of get_cached_resources."""
+    resources = resources_cache.get(block=False)
+    if resources is not None:
+        return resources
+    return await executors.bigquery.run(resources_cache.get)
+
+def get_sustainability_summary(include_idle: bool = True) -> Optional[Dict]:
+    """
+    Sustainability metrics from server-side aggregates, or None when BigQuery
+    returned nothing (the caller falls back to row-level data).
+    """
+    region_totals = region_totals_cache.get()
+    if not region_totals:
+        return None
+    idle_resources = idle_resources_cache.get() if include_idle else []
+    return metrics_engine.compute_sustainability_metrics_from_region_totals(region_totals, idle_resources)
+
+async def fetch_sustainability_summary(include_idle: bool = True) -> Optional[Dict]:
+    """Event-loop friendly variant of get_sustainability_summary."""
+    region_totals = region_totals_cache.get(block=False)
+    idle_resources = idle_resources_cache.get(block=False) if include_idle else []
+    if region_totals is not None and idle_resources is not None:
+        if not region_totals:
+            return None
+        return metrics_engine.compute_sustainability_metrics_from_region_totals(region_totals, idle_resources)
+    return await executors.bigquery.run(get_sustainability_summary, include_idle)
+
+def _replica_stats(replicas: Dict[str, TableReplica]) -> Dict:
+    if not MULTI_SOURCE:
+        return replicas[SOURCES[0].name].stats()
+    return {name: replica.stats() for name, replica in replicas.items()}
+
+def get_cache_stats() -> Dict[str, Dict]:
+    return {
+        "ttl_seconds": SNAPSHOT_TTL_SECONDS,
+        "max_stale_seconds": SNAPSHOT_MAX_STALE_SECONDS,
+        "negative_ttl_seconds": SNAPSHOT_NEGATIVE_TTL_SECONDS,
+        "circuit_breakers": {source.breaker.name: source.breaker.stats() for source in SOURCES},
+        "sources": [source.describe() for source in SOURCES],
+        "source_loads": source_scheduler.stats(),
+        "controls": controls_cache.stats(),
+        "resources": resources_cache.stats(),
+        "region_totals": region_totals_cache.stats(),
+        "idle_resources": idle_resources_cache.stats(),
+        "sync": {
+            "enabled": SYNC_MODE,
+            "controls": _replica_stats(controls_replicas),
+            "resources": _replica_stats(resources_replicas),
+        },
+    }
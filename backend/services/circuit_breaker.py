@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Configuration
+BQ_BREAKER_FAILURE_THRESHOLD = int(os.getenv("ORBYTE_BQ_BREAKER_FAILURES", "3"))
+BQ_BREAKER_RESET_SECONDS = float(os.getenv("ORBYTE_BQ_BREAKER_RESET_SECONDS", "5"))
+BQ_BREAKER_MAX_RESET_SECONDS = float(os.getenv("ORBYTE_BQ_BREAKER_MAX_RESET_SECONDS", "300"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a dependency is down.
+
+    Closed: calls go through; `failure_threshold` consecutive failures open
+    the circuit. Open: calls are rejected with CircuitOpenError without
+    touching the dependency. After `reset_timeout` seconds one trial call is
+    let through (half-open); success closes the circuit, failure re-opens it
+    with the timeout doubled, up to `max_reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, max_reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._current_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error: Optional[str] = None
+        self._counters = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now. A True in half-open state reserves the single trial call."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self._current_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._counters["calls"] += 1
+            if self._state != CLOSED:
+                print(f"[Orbyte] Circuit {self.name} closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._current_timeout = self.reset_timeout
+            self._probe_in_flight = False
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["failures"] += 1
+            self._last_error = str(error) or type(error).__name__
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._current_timeout = min(self._current_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._counters["opened"] += 1
+        print(f"[Orbyte] Circuit {self.name} open for {self._current_timeout:.0f}s: {self._last_error}")
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self._state == OPEN:
+                retry_in = max(0.0, self._current_timeout - (time.monotonic() - self._opened_at))
+            return {
+                **self._counters,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self._last_error,
+            }
+
+bigquery = CircuitBreaker(
+    "bigquery", BQ_BREAKER_FAILURE_THRESHOLD, BQ_BREAKER_RESET_SECONDS, BQ_BREAKER_MAX_RESET_SECONDS
+)
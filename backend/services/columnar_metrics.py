@@ -0,0 +1,272 @@
+import hashlib
+import json
+import sys
+import threading
+from typing import Dict, List, Optional, Union
+import numpy as np
+from models.schemas import Control, Resource, ControlSeverity, ControlStatus
+from models.records import ResourceRecord
+from services import emission_factors
+from services.metrics_engine import WEIGHT_BY_SEVERITY, compute_sustainability_score
+
+# Vectorized counterparts of the batch functions in metrics_engine.
+#
+# Rows are held as NumPy columns with string fields (region, instance_type,
+# framework) dictionary-encoded to integer codes, so per-row lookups become
+# array indexing and group-bys become np.bincount. Codes are assigned in
+# order of first appearance, which keeps emissions_by_region in the same order
+# as the batch function. Per-row emissions, counts, compliance scores and the
+# idle rows are identical to the batch functions'. Sums use NumPy's pairwise
+# summation rather than a left-to-right loop, so float totals agree with the
+# batch functions to a relative tolerance of len(rows) * machine epsilon
+# (sum_tolerance), the bound on the batch loop's own rounding error
+# (see tests/test_columnar_metrics.py).
+
+SEVERITY_ORDER = [ControlSeverity.CRITICAL, ControlSeverity.HIGH, ControlSeverity.MEDIUM, ControlSeverity.LOW]
+_SEVERITY_CODE = {s: i for i, s in enumerate(SEVERITY_ORDER)}
+_SEVERITY_WEIGHTS = np.array([WEIGHT_BY_SEVERITY[s] for s in SEVERITY_ORDER], dtype=np.int64)
+
+def sum_tolerance(rows: int) -> float:
+    """Relative tolerance between columnar and batch float totals over `rows` rows."""
+    return max(rows, 1) * sys.float_info.epsilon
+
+def _encode(values) -> tuple[np.ndarray, List[str]]:
+    codes: Dict[str, int] = {}
+    encoded = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int32)
+    return encoded, list(codes)
+
+def _arrow_encode(column) -> tuple[np.ndarray, List[str]]:
+    encoded = column.combine_chunks().dictionary_encode()
+    return encoded.indices.to_numpy(zero_copy_only=False).astype(np.int32), encoded.dictionary.to_pylist()
+
+def _arrow_numeric(column, dtype) -> np.ndarray:
+    # Same coercion as bigquery_service's row mappers: NULL -> 0, NUMERIC (Decimal) -> dtype
+    return column.fill_null(0).to_numpy().astype(dtype, copy=False)
+
+class ResourceColumns:
+    def __init__(self, region_codes: np.ndarray, regions: List[str], instance_codes: np.ndarray, instance_types: List[str],
+                 avg_cpu_7d: np.ndarray, avg_hours_per_day: np.ndarray, last_active_days_ago: np.ndarray,
+                 daily_cost_usd: np.ndarray, rows: Union[List[Resource], "pyarrow.Table"]):
+        self.region_codes = region_codes
+        self.regions = regions
+        self.instance_codes = instance_codes
+        self.instance_types = instance_types
+        self.avg_cpu_7d = avg_cpu_7d
+        self.avg_hours_per_day = avg_hours_per_day
+        self.last_active_days_ago = last_active_days_ago
+        self.daily_cost_usd = daily_cost_usd
+        # Source rows, used only to materialize the (usually small) idle subset
+        self._rows = rows
+        self._fingerprint: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.avg_hours_per_day)
+
+    @classmethod
+    def from_resources(cls, resources: List[Resource]) -> "ResourceColumns":
+        region_codes, regions = _encode(r.region for r in resources)
+        instance_codes, instance_types = _encode(r.instance_type for r in resources)
+        n = len(resources)
+        return cls(
+            region_codes, regions, instance_codes, instance_types,
+            np.fromiter((r.avg_cpu_7d for r in resources), dtype=np.float64, count=n),
+            np.fromiter((r.avg_hours_per_day for r in resources), dtype=np.float64, count=n),
+            np.fromiter((r.last_active_days_ago for r in resources), dtype=np.int64, count=n),
+            np.fromiter((r.daily_cost_usd for r in resources), dtype=np.float64, count=n),
+            resources,
+        )
+
+    @classmethod
+    def from_arrow(cls, table) -> "ResourceColumns":
+        """Builds columns from a BigQuery `to_arrow()` result of resources_view."""
+        region_codes, regions = _arrow_encode(table.column("region"))
+        instance_codes, instance_types = _arrow_encode(table.column("instance_type"))
+        return cls(
+            region_codes, regions, instance_codes, instance_types,
+            _arrow_numeric(table.column("avg_cpu_7d"), np.float64),
+            _arrow_numeric(table.column("avg_hours_per_day"), np.float64),
+            _arrow_numeric(table.column("last_active_days_ago"), np.int64),
+            _arrow_numeric(table.column("daily_cost_usd"), np.float64),
+            table,
+        )
+
+    @property
+    def arrow(self):
+        """The source pyarrow.Table when built with from_arrow, else None."""
+        return None if isinstance(self._rows, list) else self._rows
+
+    def detached(self) -> "ResourceColumns":
+        """The numeric columns without the source rows, e.g. to pickle for a worker process."""
+        return ResourceColumns(
+            self.region_codes, self.regions, self.instance_codes, self.instance_types, self.avg_cpu_7d,
+            self.avg_hours_per_day, self.last_active_days_ago, self.daily_cost_usd, [],
+        )
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the numeric columns, the same in every process for the same
+        data, e.g. to key results computed from it. Computed once per instance.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(json.dumps([self.regions, self.instance_types]).encode(), digest_size=16)
+            for column in (self.region_codes, self.instance_codes, self.avg_cpu_7d, self.avg_hours_per_day,
+                           self.last_active_days_ago, self.daily_cost_usd):
+                digest.update(np.ascontiguousarray(column).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def take(self, indices: np.ndarray) -> List[Resource]:
+        if isinstance(self._rows, list):
+            return [self._rows[i] for i in indices]
+        return [
+            ResourceRecord(
+                id=row["resource_id"],
+                name=row["name"],
+                type=row["type"],
+                region=row["region"],
+                instance_type=row["instance_type"],
+                avg_cpu_7d=row["avg_cpu_7d"],
+                avg_hours_per_day=row["avg_hours_per_day"],
+                last_active_days_ago=row["last_active_days_ago"],
+                daily_cost_usd=row["daily_cost_usd"],
+            )
+            for row in self._rows.take(indices).to_pylist()
+        ]
+
+class ControlColumns:
+    def __init__(self, framework_codes: np.ndarray, frameworks: List[str], severity_codes: np.ndarray, passing: np.ndarray):
+        self.framework_codes = framework_codes
+        self.frameworks = frameworks
+        self.severity_codes = severity_codes
+        self.passing = passing
+
+    def __len__(self) -> int:
+        return len(self.severity_codes)
+
+    @classmethod
+    def from_controls(cls, controls: List[Control]) -> "ControlColumns":
+        framework_codes, frameworks = _encode(c.framework for c in controls)
+        n = len(controls)
+        return cls(
+            framework_codes, frameworks,
+            np.fromiter((_SEVERITY_CODE[c.severity] for c in controls), dtype=np.int8, count=n),
+            np.fromiter((c.status == ControlStatus.PASS for c in controls), dtype=bool, count=n),
+        )
+
+    @classmethod
+    def from_arrow(cls, table) -> "ControlColumns":
+        """Builds columns from a BigQuery `to_arrow()` result of controls_view."""
+        framework_codes, frameworks = _arrow_encode(table.column("framework"))
+        # Same defaults as bigquery_service: unknown severity -> low, unknown status -> at_risk
+        severity_lookup = {s.value: code for s, code in _SEVERITY_CODE.items()}
+        low = _SEVERITY_CODE[ControlSeverity.LOW]
+        severity_codes, severities = _arrow_encode(table.column("severity"))
+        severity_map = np.array([severity_lookup.get((s or "").lower(), low) for s in severities], dtype=np.int8)
+        status_codes, statuses = _arrow_encode(table.column("status"))
+        passing_map = np.array([(s or "").lower() == ControlStatus.PASS.value for s in statuses], dtype=bool)
+        return cls(framework_codes, frameworks, severity_map[severity_codes], passing_map[status_codes])
+
+# Columns are cached per input list so repeated calls on the same snapshot only convert once
+_cache_lock = threading.Lock()
+_cached_resources: tuple[Optional[list], Optional[ResourceColumns]] = (None, None)
+_cached_controls: tuple[Optional[list], Optional[ControlColumns]] = (None, None)
+
+def resource_columns(resources: Union[List[Resource], ResourceColumns]) -> ResourceColumns:
+    global _cached_resources
+    if isinstance(resources, ResourceColumns):
+        return resources
+    with _cache_lock:
+        source, columns = _cached_resources
+        if source is not resources:
+            columns = ResourceColumns.from_resources(resources)
+            _cached_resources = (resources, columns)
+        return columns
+
+def control_columns(controls: Union[List[Control], ControlColumns]) -> ControlColumns:
+    global _cached_controls
+    if isinstance(controls, ControlColumns):
+        return controls
+    with _cache_lock:
+        source, columns = _cached_controls
+        if source is not controls:
+            columns = ControlColumns.from_controls(controls)
+            _cached_controls = (controls, columns)
+        return columns
+
+def compute_framework_compliance(controls: Union[List[Control], ControlColumns]) -> Dict[str, float]:
+    cols = control_columns(controls)
+    n = len(cols.frameworks)
+    weights = _SEVERITY_WEIGHTS[cols.severity_codes]
+    total = np.bincount(cols.framework_codes, weights=weights, minlength=n)
+    passing = np.bincount(cols.framework_codes, weights=weights * cols.passing, minlength=n)
+    return {
+        fw: (float(passing[i]) / float(total[i])) * 100.0 if total[i] else 100.0
+        for i, fw in enumerate(cols.frameworks)
+    }
+
+def compute_overall_compliance_score(controls: Union[List[Control], ControlColumns]) -> float:
+    cols = control_columns(controls)
+    weights = _SEVERITY_WEIGHTS[cols.severity_codes]
+    total_weight = int(weights.sum())
+    if total_weight == 0:
+        return 100.0
+    passing_weight = int(weights[cols.passing].sum())
+    return (passing_weight / total_weight) * 100.0
+
+def get_open_risks(controls: Union[List[Control], ControlColumns]) -> Dict[str, int]:
+    cols = control_columns(controls)
+    counts = np.bincount(cols.severity_codes[~cols.passing], minlength=len(SEVERITY_ORDER))
+    return {s.value: int(counts[i]) for i, s in enumerate(SEVERITY_ORDER)}
+
+def _factor_column(cols: ResourceColumns, kind: str, factors: Optional[emission_factors.FactorTable]) -> np.ndarray:
+    # One lookup per distinct name, then a gather through the codes
+    names, codes = (cols.instance_types, cols.instance_codes) if kind == "instance_type" else (cols.regions, cols.region_codes)
+    factors = factors or emission_factors.current()
+    values = factors.lookup(names, kind, counts=np.bincount(codes, minlength=len(names)))
+    return np.array(values, dtype=np.float64)[codes]
+
+def row_power_kw(cols: ResourceColumns, factors: Optional[emission_factors.FactorTable] = None) -> np.ndarray:
+    return _factor_column(cols, "instance_type", factors)
+
+def row_grid_intensity(cols: ResourceColumns, factors: Optional[emission_factors.FactorTable] = None) -> np.ndarray:
+    return _factor_column(cols, "region", factors)
+
+def row_kg_per_hour(cols: ResourceColumns, factors: Optional[emission_factors.FactorTable] = None) -> np.ndarray:
+    """
+    Per-row power * intensity * PUE, gathered from a (region, machine type)
+    table of the fleet's distinct pairs; equal to the factor table's
+    precomputed products.
+    """
+    factors = factors or emission_factors.current()
+    power = np.array(factors.lookup(cols.instance_types, "instance_type",
+                                    np.bincount(cols.instance_codes, minlength=len(cols.instance_types))), dtype=np.float64)
+    intensity = np.array(factors.lookup(cols.regions, "region",
+                                        np.bincount(cols.region_codes, minlength=len(cols.regions))), dtype=np.float64)
+    return (np.multiply.outer(intensity, power) * factors.pue)[cols.region_codes, cols.instance_codes]
+
+def compute_monthly_emissions(cols: ResourceColumns) -> np.ndarray:
+    """Per-row monthly emissions, same formula as estimate_daily_emissions_kg * 30."""
+    return cols.avg_hours_per_day * row_kg_per_hour(cols) * 30
+
+def compute_sustainability_metrics(resources: Union[List[Resource], ResourceColumns]) -> Dict:
+    cols = resource_columns(resources)
+    monthly = compute_monthly_emissions(cols)
+    total_monthly_emissions = float(monthly.sum())
+    by_region = np.bincount(cols.region_codes, weights=monthly, minlength=len(cols.regions))
+
+    idle_mask = (cols.avg_cpu_7d < 0.05) & (cols.last_active_days_ago > 3)
+    idle_indices = np.flatnonzero(idle_mask)
+    potential_emissions_savings = float(monthly[idle_mask].sum())
+    potential_cost_savings = float((cols.daily_cost_usd[idle_mask] * 30).sum())
+
+    return {
+        "total_monthly_emissions_kg": total_monthly_emissions,
+        "emissions_by_region": [
+            {"region": region, "emissions_kg": float(by_region[i])}
+            for i, region in enumerate(cols.regions)
+        ],
+        "idle_resources": cols.take(idle_indices),
+        "potential_monthly_emissions_savings_kg": potential_emissions_savings,
+        "potential_monthly_cost_savings_usd": potential_cost_savings,
+        "sustainability_score": compute_sustainability_score(total_monthly_emissions, potential_emissions_savings),
+    }
@@ -0,0 +1,161 @@
+import base64
+import bisect
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from models.schemas import Control, ControlSeverity, ControlStatus
+
+# Indexed lookup, filtering, keyset pagination and field projection for the
+# controls API.
+# Pages are ordered by control id and the cursor is the (opaque) id of the
+# last control on the previous page, so pages stay stable while the snapshot
+# underneath is refreshed.
+
+CONTROL_FIELDS = tuple(Control.model_fields)
+MAX_PAGE_SIZE = 1000
+
+class InvalidQuery(ValueError):
+    pass
+
+def parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    selected = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = selected.difference(CONTROL_FIELDS)
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+def encode_cursor(control_id: str) -> str:
+    return base64.urlsafe_b64encode(control_id.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except Exception:
+        raise InvalidQuery("Invalid cursor")
+
+class ControlIndex:
+    """
+    In-memory indexes over one controls snapshot: primary by id, secondary by
+    framework and status (each in snapshot order), plus an id-sorted view for
+    keyset pagination.
+    """
+
+    def __init__(self, controls: List[Control]):
+        self.by_id: Dict[str, Control] = {}
+        self.by_framework: Dict[str, List[Control]] = {}
+        self.by_status: Dict[ControlStatus, List[Control]] = {}
+        for c in controls:
+            self.by_id[c.id] = c
+            self.by_framework.setdefault(c.framework, []).append(c)
+            self.by_status.setdefault(c.status, []).append(c)
+        self.controls = controls
+        self.sorted = sorted(controls, key=lambda c: c.id)
+        self.sorted_ids = [c.id for c in self.sorted]
+
+    def get(self, control_id: str) -> Optional[Control]:
+        return self.by_id.get(control_id)
+
+    def candidates(self, framework: Optional[str] = None, status: Optional[ControlStatus] = None) -> List[Control]:
+        """Smallest indexed list that can contain every match, in snapshot order."""
+        options = [self.controls]
+        if framework:
+            options.append(self.by_framework.get(framework, []))
+        if status:
+            options.append(self.by_status.get(status, []))
+        return min(options, key=len)
+
+# Index of the last snapshot, rebuilt only when the snapshot changes
+_index_lock = threading.Lock()
+_index: Optional[ControlIndex] = None
+
+def index_for(controls: List[Control]) -> ControlIndex:
+    global _index
+    with _index_lock:
+        if _index is None or _index.controls is not controls:
+            _index = ControlIndex(controls)
+        return _index
+
+def select_batch(
+    index: ControlIndex,
+    framework: Optional[str] = None,
+    control_ids: Optional[List[str]] = None,
+) -> Tuple[List[Control], Dict[str, str]]:
+    """
+    Controls for a batch analysis: those of `framework`, narrowed to
+    `control_ids` when given. Also returns an error per requested id that
+    cannot be analyzed (unknown, or in another framework), in request order.
+    """
+    selected = index.by_framework.get(framework, []) if framework else index.controls
+    if not control_ids:
+        return selected, {}
+    errors: Dict[str, str] = {}
+    for control_id in control_ids:
+        control = index.get(control_id)
+        if control is None:
+            errors[control_id] = "Control not found"
+        elif framework and control.framework != framework:
+            errors[control_id] = f"Control belongs to framework {control.framework}, not {framework}"
+    wanted = set(control_ids)
+    return [c for c in selected if c.id in wanted], errors
+
+def filter_controls(
+    controls: Iterable[Control],
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+) -> Iterator[Control]:
+    for c in controls:
+        if framework and c.framework != framework:
+            continue
+        if severity and c.severity != severity:
+            continue
+        if status and c.status != status:
+            continue
+        yield c
+
+def filter_indexed(
+    controls: List[Control],
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+) -> Iterator[Control]:
+    """filter_controls over a snapshot, narrowed first through its secondary indexes."""
+    candidates = index_for(controls).candidates(framework, status)
+    return filter_controls(candidates, framework, severity, status)
+
+def select_page(
+    controls: List[Control],
+    framework: Optional[str] = None,
+    severity: Optional[ControlSeverity] = None,
+    status: Optional[ControlStatus] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[List[Control], Optional[str]]:
+    """
+    Returns one page of matching controls and the cursor for the next page
+    (None on the last page). Without a cursor or limit every match is
+    returned in snapshot order.
+    """
+    if cursor is None and limit is None:
+        return list(filter_indexed(controls, framework, severity, status)), None
+
+    index = index_for(controls)
+    ordered, ids = index.sorted, index.sorted_ids
+    start = bisect.bisect_right(ids, decode_cursor(cursor)) if cursor else 0
+    limit = limit or MAX_PAGE_SIZE
+
+    page: List[Control] = []
+    remaining = (ordered[i] for i in range(start, len(ordered)))
+    for c in filter_controls(remaining, framework, severity, status):
+        if len(page) == limit:
+            return page, encode_cursor(page[-1].id)
+        page.append(c)
+    return page, None
+
+def project(control: Control, fields: Optional[Set[str]]):
+    return control if fields is None else control.dict(include=fields)
+
+def to_ndjson(controls: Iterable[Control], fields: Optional[Set[str]] = None) -> Iterator[bytes]:
+    for c in controls:
+        yield c.json(include=fields).encode("utf-8") + b"\n"
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Emission, power and price factors, loaded from a versioned JSON file instead
+# of being hard-coded. Each load builds an immutable FactorTable with the
+# (region, machine type) -> kg CO2e per running hour product precomputed, so
+# the per-resource estimate is one dict lookup. The file is re-read when it
+# changes (checked at most every FACTORS_RELOAD_SECONDS) or on demand, and
+# lookups that fall back to a default are counted per unknown name.
+
+DEFAULT_FACTORS_PATH = Path(__file__).resolve().parents[1] / "data" / "emission_factors.json"
+FACTORS_PATH = os.getenv("ORBYTE_EMISSION_FACTORS_PATH", str(DEFAULT_FACTORS_PATH))
+FACTORS_RELOAD_SECONDS = float(os.getenv("ORBYTE_EMISSION_FACTORS_RELOAD_SECONDS", "30"))  # 0 disables file checks
+
+class InvalidFactors(ValueError):
+    pass
+
+# {"instance_type" | "region": {name: lookups}}; kept across reloads
+_fallback_lock = threading.Lock()
+_fallbacks: Dict[str, Dict[str, int]] = {"instance_type": {}, "region": {}}
+
+def record_fallback(kind: str, name: str, hits: int = 1):
+    with _fallback_lock:
+        counts = _fallbacks[kind]
+        counts[name] = counts.get(name, 0) + hits
+
+def _positive(value, what: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise InvalidFactors(f"{what} must be a non-negative number, got {value!r}")
+    return float(value)
+
+class FactorTable:
+    """One loaded version of the factors file. Never mutated after construction."""
+
+    def __init__(self, version: str, pue: float, default_power_kw: float, default_intensity: float,
+                 default_price_multiplier: float, grid_intensity: Dict[str, float], price_multiplier: Dict[str, float],
+                 instance_power_kw: Dict[str, float], hourly_profiles: Dict[str, List[float]]):
+        self.version = version
+        self.pue = pue
+        self.default_power_kw = default_power_kw
+        self.default_intensity = default_intensity
+        self.default_price_multiplier = default_price_multiplier
+        self.grid_intensity = grid_intensity
+        self.price_multiplier = price_multiplier
+        self.instance_power_kw = instance_power_kw
+        self.hourly_profiles = hourly_profiles
+        self.kg_per_hour: Dict[Tuple[str, str], float] = {
+            (region, instance_type): power * intensity * pue
+            for region, intensity in grid_intensity.items()
+            for instance_type, power in instance_power_kw.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "FactorTable":
+        try:
+            version = str(data["version"])
+            defaults = data["defaults"]
+            regions = data["regions"]
+            machine_types = data["machine_types"]
+            pue = _positive(data["pue"], "pue")
+        except (KeyError, TypeError) as e:
+            raise InvalidFactors(f"Missing or malformed section: {e}")
+        if not regions or not machine_types:
+            raise InvalidFactors("regions and machine_types must not be empty")
+
+        grid_intensity: Dict[str, float] = {}
+        price_multiplier: Dict[str, float] = {}
+        hourly_profiles: Dict[str, List[float]] = {}
+        for region, factors in regions.items():
+            grid_intensity[region] = _positive(factors.get("grid_intensity"), f"{region} grid_intensity")
+            price_multiplier[region] = _positive(factors.get("price_multiplier", 1.0), f"{region} price_multiplier")
+            profile = factors.get("hourly_profile")
+            if profile is not None:
+                if len(profile) != 24:
+                    raise InvalidFactors(f"{region} hourly_profile must have 24 values")
+                hourly_profiles[region] = [_positive(v, f"{region} hourly_profile") for v in profile]
+        return cls(
+            version, pue,
+            _positive(defaults.get("power_kw"), "defaults.power_kw"),
+            _positive(defaults.get("grid_intensity"), "defaults.grid_intensity"),
+            _positive(defaults.get("price_multiplier", 1.0), "defaults.price_multiplier"),
+            grid_intensity, price_multiplier,
+            {name: _positive(kw, f"{name} power") for name, kw in machine_types.items()},
+            hourly_profiles,
+        )
+
+    def power_kw(self, instance_type: str) -> float:
+        power = self.instance_power_kw.get(instance_type)
+        if power is None:
+            record_fallback("instance_type", instance_type)
+            return self.default_power_kw
+        return power
+
+    def intensity(self, region: str) -> float:
+        intensity = self.grid_intensity.get(region)
+        if intensity is None:
+            record_fallback("region", region)
+            return self.default_intensity
+        return intensity
+
+    def price(self, region: str) -> float:
+        return self.price_multiplier.get(region, self.default_price_multiplier)
+
+    def emissions_kg_per_hour(self, region: str, instance_type: str) -> float:
+        """power_kw * grid intensity * PUE, from the precomputed table when both names are known."""
+        value = self.kg_per_hour.get((region, instance_type))
+        if value is None:
+            value = self.power_kw(instance_type) * self.intensity(region) * self.pue
+        return value
+
+    def intensity_at(self, region: str, hour: int) -> float:
+        """Grid intensity at a local hour of day; flat when the region has no hourly profile."""
+        profile = self.hourly_profiles.get(region)
+        return self.intensity(region) * (profile[hour % 24] if profile else 1.0)
+
+    def window_share(self, region: str, end_hour: int, hours: float) -> float:
+        """
+        Share of a day's emissions, for a load running evenly around the
+        clock, that falls in the `hours` ending at local `end_hour`. Equal to
+        hours / 24 when the region has no hourly profile.
+        """
+        profile = self.hourly_profiles.get(region)
+        if not profile or not sum(profile):
+            return hours / 24
+        whole = int(hours)
+        weight = sum(profile[(end_hour - 1 - i) % 24] for i in range(whole))
+        if hours > whole:
+            weight += (hours - whole) * profile[(end_hour - 1 - whole) % 24]
+        return weight / sum(profile)
+
+    def lookup(self, names: Sequence[str], kind: str, counts: Optional[Sequence[int]] = None) -> List[float]:
+        """
+        Factors for a list of distinct names (power for "instance_type",
+        intensity for "region"). `counts` are the rows behind each name, so
+        fallbacks are counted per row rather than per distinct name.
+        """
+        table, default = (
+            (self.instance_power_kw, self.default_power_kw) if kind == "instance_type"
+            else (self.grid_intensity, self.default_intensity)
+        )
+        values = []
+        for i, name in enumerate(names):
+            value = table.get(name)
+            if value is None:
+                record_fallback(kind, name, int(counts[i]) if counts is not None else 1)
+                value = default
+            values.append(value)
+        return values
+
+    def cleanest_region(self) -> str:
+        return min(self.grid_intensity, key=self.grid_intensity.get)
+
+class FactorRegistry:
+    """
+    Holds the current FactorTable. `current()` re-reads the file when its
+    modification time changed, at most every `reload_interval` seconds; a
+    file that fails to load or validate is logged and the previous table is
+    kept. Listeners are called after every successful reload.
+    """
+
+    def __init__(self, path: str, reload_interval: float):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[["FactorTable"], None]] = []
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._loaded_at: Optional[float] = None
+        self._counters = {"reloads": 0, "reload_errors": 0}
+        self._last_error: Optional[str] = None
+        self._table = self._read()
+        self._next_check = time.monotonic() + reload_interval
+
+    def _read(self) -> FactorTable:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            table = FactorTable.from_dict(json.load(f))
+        self._mtime = mtime
+        self._loaded_at = time.time()
+        return table
+
+    def current(self) -> FactorTable:
+        if self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self.reload(force=False)
+        return self._table
+
+    def reload(self, force: bool = True) -> FactorTable:
+        with self._lock:
+            self._next_check = time.monotonic() + self.reload_interval
+            try:
+                if not force and os.stat(self.path).st_mtime == self._mtime:
+                    return self._table
+                table = self._read()
+            except (OSError, ValueError) as e:
+                self._counters["reload_errors"] += 1
+                self._last_error = str(e)
+                print(f"[Orbyte] Emission factors reload failed, keeping version {self._table.version}: {e}")
+                return self._table
+            self._table = table
+            self._counters["reloads"] += 1
+            self._last_error = None
+            listeners = list(self._listeners)
+        print(f"[Orbyte] Emission factors version {table.version} loaded from {self.path}")
+        for listener in listeners:
+            listener(table)
+        return table
+
+    def on_reload(self, listener: Callable[["FactorTable"], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def stats(self) -> Dict:
+        table = self._table
+        with _fallback_lock:
+            fallbacks = {kind: dict(counts) for kind, counts in _fallbacks.items()}
+        return {
+            **self._counters,
+            "version": table.version,
+            "path": self.path,
+            "loaded_at": self._loaded_at,
+            "regions": len(table.grid_intensity),
+            "machine_types": len(table.instance_power_kw),
+            "last_error": self._last_error,
+            "fallbacks": fallbacks,
+        }
+
+registry = FactorRegistry(FACTORS_PATH, FACTORS_RELOAD_SECONDS)
+
+def current() -> FactorTable:
+    return registry.current()
@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+
+# Per-backend concurrency limits and timeouts (seconds)
+BQ_MAX_CONCURRENCY = int(os.getenv("ORBYTE_BQ_MAX_CONCURRENCY", "8"))
+BQ_TIMEOUT_SECONDS = float(os.getenv("ORBYTE_BQ_TIMEOUT_SECONDS", "30"))
+VERTEX_MAX_CONCURRENCY = int(os.getenv("ORBYTE_VERTEX_MAX_CONCURRENCY", "4"))
+VERTEX_TIMEOUT_SECONDS = float(os.getenv("ORBYTE_VERTEX_TIMEOUT_SECONDS", "60"))
+VERTEX_REQUESTS_PER_SECOND = float(os.getenv("ORBYTE_VERTEX_RPS", "5"))  # 0 disables rate limiting
+
+class BoundedExecutor:
+    """
+    Runs blocking client calls off the event loop on a dedicated thread pool.
+
+    At most `max_concurrency` calls run at once; further callers wait on a
+    semaphore without occupying a thread, so cancelling them is free. A call
+    that exceeds `timeout` raises asyncio.TimeoutError to the caller. Work that
+    has not started yet is dropped; work already running on a thread finishes
+    in the background, so clients should also pass their own server-side
+    timeouts where they support one. Calls run in a copy of the caller's
+    context, so per-request state such as telemetry spans follows them.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"orbyte-{name}")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float | None = None, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(self._pool, lambda: context.run(fn, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(future, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                print(f"[Orbyte] {self.name} call {getattr(fn, '__name__', fn)} timed out after {timeout or self.timeout}s")
+                raise
+
+    async def stream(self, fn: Callable[..., Iterator[Any]], *args, timeout: float | None = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Runs `fn`, which returns a blocking iterator, on the pool and yields its
+        items as they are produced. `timeout` bounds the wait for each item.
+        Closing the generator stops the producer at its next item.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def put(item, error=None):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+            except RuntimeError:
+                # Event loop already closed; nobody is listening any more
+                stop.set()
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    if stop.is_set():
+                        return
+                    put(item)
+            except Exception as e:
+                put(None, e)
+            finally:
+                put(end)
+
+        async with self._semaphore:
+            loop.run_in_executor(self._pool, contextvars.copy_context().run, produce)
+            try:
+                while True:
+                    item, error = await asyncio.wait_for(queue.get(), timeout or self.timeout)
+                    if error is not None:
+                        raise error
+                    if item is end:
+                        return
+                    yield item
+            finally:
+                stop.set()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+class RateLimiter:
+    """
+    Async token bucket allowing `rate` acquisitions per second, with bursts of
+    up to `burst`. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+bigquery = BoundedExecutor("bigquery", BQ_MAX_CONCURRENCY, BQ_TIMEOUT_SECONDS)
+vertex = BoundedExecutor("vertex", VERTEX_MAX_CONCURRENCY, VERTEX_TIMEOUT_SECONDS)
+vertex_rate_limiter = RateLimiter(VERTEX_REQUESTS_PER_SECOND)
@@ -0,0 +1,212 @@
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from models.records import ControlRecord, ResourceRecord
+from services import synthetic_data
+
+# Configuration for the local stand-in client (ORBYTE_FAKE_BQ=true)
+FAKE_BQ_RESOURCE_COUNT = int(os.getenv("ORBYTE_FAKE_BQ_RESOURCE_COUNT", "1000"))
+FAKE_BQ_CONTROL_COUNT = int(os.getenv("ORBYTE_FAKE_BQ_CONTROL_COUNT", "100"))
+FAKE_BQ_LATENCY_SECONDS = float(os.getenv("ORBYTE_FAKE_BQ_LATENCY_SECONDS", "0.05"))
+FAKE_BQ_SEED = int(os.getenv("ORBYTE_FAKE_BQ_SEED", "0"))
+
+# Nominal stored row width used to estimate bytes billed
+ROW_BYTES = 128
+
+_TABLE_REF = re.compile(r"`(?:[\w-]+\.)*(\w+)`")
+_PARAM = re.compile(r"@(\w+)")
+_TIMESTAMP_COLUMNS = {"updated_at", "deleted_at"}
+# Filters on these columns prune scanning, as on a table clustered by them
+_PRUNED_FILTER = re.compile(r"\b(updated_at|deleted_at)\s*>")
+
+SCHEMA = """
+CREATE TABLE controls_view (
+    control_id TEXT PRIMARY KEY, name TEXT, framework TEXT, severity TEXT, status TEXT,
+    evidence_count INTEGER, description TEXT, updated_at REAL NOT NULL
+);
+CREATE TABLE controls_deleted (control_id TEXT NOT NULL, deleted_at REAL NOT NULL);
+CREATE TABLE resources_view (
+    resource_id TEXT PRIMARY KEY, name TEXT, type TEXT, region TEXT, instance_type TEXT,
+    avg_cpu_7d REAL, avg_hours_per_day REAL, last_active_days_ago INTEGER, daily_cost_usd REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE resources_deleted (resource_id TEXT NOT NULL, deleted_at REAL NOT NULL);
+"""
+
+class FakeRowIterator:
+    def __init__(self, rows: list, page_size: Optional[int]):
+        self._rows = rows
+        self._page_size = page_size or max(len(rows), 1)
+        self.total_rows = len(rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    @property
+    def pages(self):
+        for start in range(0, len(self._rows), self._page_size):
+            yield self._rows[start:start + self._page_size]
+
+    def to_arrow_iterable(self, bqstorage_client=None, max_queue_size=None, max_stream_count=None, timeout=None):
+        import pyarrow
+        for page in self.pages:
+            yield pyarrow.RecordBatch.from_pylist([row._asdict() for row in page])
+
+class FakeQueryJob:
+    def __init__(self, query: str, rows: list, total_bytes_billed: int):
+        self.query = query
+        self._rows = rows
+        self.total_bytes_billed = total_bytes_billed
+
+    def result(self, page_size: Optional[int] = None, timeout: Optional[float] = None) -> FakeRowIterator:
+        return FakeRowIterator(self._rows, page_size)
+
+    def __iter__(self):
+        return iter(self.result())
+
+class FakeBigQueryClient:
+    """
+    Offline stand-in for google.cloud.bigquery.Client. The controls and
+    resources views live in an in-memory SQLite database seeded from
+    synthetic_data, alongside `controls_deleted` / `resources_deleted`
+    tombstone tables, and queries run there after table references and
+    @parameters are rewritten. Aggregation SQL should be built for the
+    "sqlite" dialect (see `dialect`). Bytes billed are estimated at ROW_BYTES
+    per scanned row, where a filter on updated_at/deleted_at scans only the
+    matching rows. upsert/delete/churn change the data between queries.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, resources: int = FAKE_BQ_RESOURCE_COUNT, controls: int = FAKE_BQ_CONTROL_COUNT,
+                 latency: float = FAKE_BQ_LATENCY_SECONDS, seed: int = FAKE_BQ_SEED):
+        self.project = "fake"
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._row_types: Dict[tuple, type] = {}
+        self.queries: List[str] = []
+        self._db = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self._db.executescript(SCHEMA)
+        # Seeded rows were last updated at some point in the previous 30 days
+        now = time.time()
+        self.upsert_resources(synthetic_data.generate_resources(resources, seed), now)
+        self.upsert_controls(synthetic_data.generate_controls(controls, seed), now)
+        for table, key in (("resources_view", "resource_id"), ("controls_view", "control_id")):
+            ids = [row[0] for row in self._db.execute(f"SELECT {key} FROM {table}")]
+            self._db.executemany(
+                f"UPDATE {table} SET updated_at = ? WHERE {key} = ?",
+                [(now - self._random.uniform(0, 30 * 86400), i) for i in ids],
+            )
+
+    # --- Client API ---
+
+    def query(self, query: str, job_config=None) -> FakeQueryJob:
+        params = {}
+        for param in getattr(job_config, "query_parameters", None) or []:
+            value = param.value
+            params[param.name] = value.timestamp() if isinstance(value, datetime) else value
+        sql = _PARAM.sub(r":\1", _TABLE_REF.sub(r"\1", query))
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.queries.append(query)
+            cursor = self._db.execute(sql, params)
+            columns = tuple(d[0] for d in cursor.description)
+            row_type = self._row_type(columns)
+            converters = [_to_datetime if name in _TIMESTAMP_COLUMNS else None for name in columns]
+            rows = [
+                row_type(*(convert(v) if convert and v is not None else v for convert, v in zip(converters, values)))
+                for values in cursor.fetchall()
+            ]
+            scanned = len(rows) if _PRUNED_FILTER.search(sql) else self._table_rows(sql)
+        return FakeQueryJob(query, rows, scanned * ROW_BYTES)
+
+    def _row_type(self, columns: tuple) -> type:
+        row_type = self._row_types.get(columns)
+        if row_type is None:
+            row_type = self._row_types[columns] = namedtuple("Row", columns, rename=True)
+        return row_type
+
+    def _table_rows(self, sql: str) -> int:
+        return sum(
+            self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("controls_view", "resources_view", "controls_deleted", "resources_deleted")
+            if re.search(rf"\b{table}\b", sql)
+        )
+
+    # --- Test helpers ---
+
+    def upsert_controls(self, controls: Iterable[ControlRecord], at: Optional[float] = None):
+        at = at if at is not None else time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO controls_view VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (c.id, c.name, c.framework, c.severity.value, c.status.value, c.evidence_count, c.description, at)
+                    for c in controls
+                ],
+            )
+
+    def upsert_resources(self, resources: Iterable[ResourceRecord], at: Optional[float] = None):
+        at = at if at is not None else time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO resources_view VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r.id, r.name, r.type, r.region, r.instance_type, r.avg_cpu_7d, r.avg_hours_per_day,
+                     r.last_active_days_ago, r.daily_cost_usd, at)
+                    for r in resources
+                ],
+            )
+
+    def delete_controls(self, ids: Iterable[str], at: Optional[float] = None):
+        self._delete("controls", "control_id", ids, at)
+
+    def delete_resources(self, ids: Iterable[str], at: Optional[float] = None):
+        self._delete("resources", "resource_id", ids, at)
+
+    def _delete(self, name: str, key: str, ids: Iterable[str], at: Optional[float]):
+        at = at if at is not None else time.time()
+        ids = list(ids)
+        with self._lock:
+            self._db.executemany(f"DELETE FROM {name}_view WHERE {key} = ?", [(i,) for i in ids])
+            self._db.executemany(f"INSERT INTO {name}_deleted VALUES (?, ?)", [(i, at) for i in ids])
+
+    def churn(self, fraction: float, at: Optional[float] = None) -> Dict[str, int]:
+        """
+        Changes `fraction` of the resources: most get new utilisation and
+        cost, a few are deleted and the same number of new ones is added.
+        """
+        at = at if at is not None else time.time()
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM resources_view").fetchall()
+        changed = self._random.sample(rows, min(len(rows), int(len(rows) * fraction)))
+        removed = changed[: len(changed) // 10]
+        updated = changed[len(removed):]
+        self.delete_resources([row[0] for row in removed], at)
+        self.upsert_resources(
+            [
+                ResourceRecord(*row[:5], round(self._random.random(), 4), row[6], self._random.randint(0, 10),
+                               round(row[8] * self._random.uniform(0.8, 1.2), 2))
+                for row in updated
+            ],
+            at,
+        )
+        serial = int(at * 1000)
+        added = [
+            ResourceRecord(f"res-new-{serial}-{i}", *row[1:5], round(self._random.random(), 4), *row[6:9])
+            for i, row in enumerate(removed)
+        ]
+        self.upsert_resources(added, at)
+        return {"updated": len(updated), "deleted": len(removed), "added": len(added)}
+
+def _to_datetime(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
@@ -0,0 +1,70 @@
+import os
+import random
+import threading
+import time
+from google.api_core.exceptions import ResourceExhausted
+
+# Configuration for the local stand-in model (ORBYTE_FAKE_AI=true)
+FAKE_AI_LATENCY_SECONDS = float(os.getenv("ORBYTE_FAKE_AI_LATENCY_SECONDS", "0.5"))
+FAKE_AI_JITTER_SECONDS = float(os.getenv("ORBYTE_FAKE_AI_JITTER_SECONDS", "0.3"))
+FAKE_AI_RATE_LIMIT_PROBABILITY = float(os.getenv("ORBYTE_FAKE_AI_429_RATE", "0.1"))
+FAKE_AI_SEED = os.getenv("ORBYTE_FAKE_AI_SEED")
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for vertexai's GenerativeModel. It sleeps to simulate
+    latency and randomly raises ResourceExhausted (HTTP 429) the way Vertex
+    does under quota pressure, so retry, backoff and fan-out code paths can be
+    exercised without credentials.
+    """
+
+    def __init__(self, latency: float = FAKE_AI_LATENCY_SECONDS, jitter: float = FAKE_AI_JITTER_SECONDS,
+                 rate_limit_probability: float = FAKE_AI_RATE_LIMIT_PROBABILITY, seed: int | None = None):
+        self.model_name = "fake"
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self._random = random.Random(seed if seed is not None else (int(FAKE_AI_SEED) if FAKE_AI_SEED else None))
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _roll(self) -> tuple[float, bool]:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.random() * self.jitter
+            limited = self._random.random() < self.rate_limit_probability
+            return delay, limited
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        delay, limited = self._roll()
+        if limited:
+            time.sleep(delay / 4)
+            raise ResourceExhausted("Quota exceeded (fake model)")
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        return FakeResponse(text)
+
+    def _stream(self, text: str, delay: float):
+        # Spread the latency over word-sized chunks, like a token stream
+        words = text.split(" ")
+        step = delay / max(len(words), 1)
+        for i, word in enumerate(words):
+            time.sleep(step)
+            yield FakeResponse(word if i == 0 else " " + word)
+
+    def _answer(self, prompt: str) -> str:
+        if "JSON object" in prompt:
+            return (
+                '{"detail_summary": "This change reduces emissions and spend on the affected workloads.", '
+                '"risk_summary": "Validate workload schedules before applying."}'
+            )
+        return (
+            "We implement this control through configuration reviewed against the supplied evidence. "
+            "Gaps noted in the evidence should be remediated and re-verified."
+        )
@@ -1,6 +1,11 @@
 import os
+import threading
 from pathlib import Path
 
+_lock = threading.Lock()
+_resolved = False
+_result = None
+
 def ensure_credentials():
     """Ensure GOOGLE_APPLICATION_CREDENTIALS is set. If raw JSON is provided
     in `GOOGLE_APPLICATION_CREDENTIALS_JSON`, write it to a local file under
@@ -8,7 +13,17 @@ def ensure_credentials():
 
     This avoids committing keys but allows CI or local dev to provide the
     credential JSON via an environment variable if needed.
+
+    Resolution runs once per process; later calls return the first result.
     """
+    global _resolved, _result
+    with _lock:
+        if not _resolved:
+            _result = _resolve_credentials()
+            _resolved = True
+        return _result
+
+def _resolve_credentials():
     creds_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     creds_json = os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
 
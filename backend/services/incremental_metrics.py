@@ -0,0 +1,322 @@
+import math
+import threading
+from typing import Dict, List, Optional
+from models.schemas import Control, Resource, ControlStatus
+from services import emission_factors
+from services.metrics_engine import WEIGHT_BY_SEVERITY, estimate_daily_emissions_kg, compute_sustainability_score
+
+# Incremental counterparts of the batch functions in metrics_engine.
+#
+# Each aggregator keeps running totals and applies insert/update/delete
+# deltas, so refreshing after a change costs O(changed rows) in emissions and
+# weight lookups instead of a full pass. Results are the batch functions'
+# results: orderings (emissions_by_region, idle_resources, framework scores)
+# follow the current snapshot, and a duplicated id counts once per row, as it
+# does in the batch loops. Float totals are kept as exact sums (ExactSum), so
+# they never drift however many deltas were applied; they are the correctly
+# rounded sum of the rows, which can differ from the batch functions'
+# left-to-right sums in the last bits (see tests/test_incremental_metrics.py).
+
+class ExactSum:
+    """
+    Running float sum without rounding error, using Shewchuk's partials (the
+    algorithm behind math.fsum). Adding -x exactly cancels an earlier x, so
+    value() is the correctly rounded sum of the values currently added,
+    independent of the order of additions and removals.
+    """
+
+    __slots__ = ("_partials",)
+
+    def __init__(self):
+        self._partials: List[float] = []
+
+    def add(self, x: float):
+        partials = self._partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                partials[i] = lo
+                i += 1
+            x = hi
+        partials[i:] = [x]
+
+    def value(self) -> float:
+        return math.fsum(self._partials)
+
+def _is_idle(r: Resource) -> bool:
+    # Same rule as compute_sustainability_metrics
+    return r.avg_cpu_7d < 0.05 and r.last_active_days_ago > 3
+
+class _SnapshotAggregator:
+    """
+    The rows of the current snapshot by id, with subclasses applying each
+    row's contribution to their totals (_apply with sign +1/-1). Ids are
+    kept in order of first appearance, which is the snapshot's order while
+    ids are unique; rows repeating an id are kept aside in _extra, and then
+    the snapshot's order is kept in _sequence as well. Orderings are derived
+    from the snapshot on first read after a change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source: Optional[list] = None
+        self._rows: Dict[str, object] = {}
+        self._extra: Dict[str, list] = {}
+        self._sequence: Optional[list] = None
+        self._ordered = None
+        self._reset()
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _apply(self, row, sign: int):
+        raise NotImplementedError
+
+    def _prepare(self):
+        pass
+
+    def _snapshot(self):
+        return self._sequence if self._sequence is not None else self._rows.values()
+
+    def _remove(self, row_id: str):
+        self._apply(self._rows[row_id], -1)
+        for row in self._extra.pop(row_id, ()):
+            self._apply(row, -1)
+
+    def _upsert(self, row):
+        if row.id in self._rows:
+            self._remove(row.id)
+            if self._sequence is not None:
+                # Replaces the id's first row in place and drops its duplicates
+                placed = False
+                sequence = []
+                for x in self._sequence:
+                    if x.id != row.id:
+                        sequence.append(x)
+                    elif not placed:
+                        sequence.append(row)
+                        placed = True
+                self._sequence = sequence if self._extra else None
+        elif self._sequence is not None:
+            self._sequence.append(row)
+        # Assigning an existing key keeps its position
+        self._rows[row.id] = row
+        self._apply(row, 1)
+        self._source = None
+        self._ordered = None
+
+    def _delete(self, row_id: str):
+        if row_id in self._rows:
+            self._remove(row_id)
+            del self._rows[row_id]
+            if self._sequence is not None:
+                self._sequence = [x for x in self._sequence if x.id != row_id] if self._extra else None
+            self._ordered = None
+        self._source = None
+
+    def _sync(self, rows: list):
+        if rows is self._source:
+            return
+        by_id = {row.id: row for row in rows}
+        extra: Dict[str, list] = {}
+        if len(by_id) != len(rows):
+            # Repeated ids: keep the first row of each id in place and the rest aside
+            by_id = {}
+            for row in rows:
+                if row.id in by_id:
+                    extra.setdefault(row.id, []).append(row)
+                else:
+                    by_id[row.id] = row
+        old_rows, old_extra = self._rows, self._extra
+        duplicates = bool(extra or old_extra)
+        for row_id, row in by_id.items():
+            old = old_rows.get(row_id)
+            if old is not None:
+                if (old is row or old == row) and (not duplicates or old_extra.get(row_id) == extra.get(row_id)):
+                    continue
+                self._remove(row_id)
+            self._apply(row, 1)
+            for duplicate in extra.get(row_id, ()):
+                self._apply(duplicate, 1)
+        for row_id in old_rows.keys() - by_id.keys():
+            self._remove(row_id)
+        self._rows = by_id
+        self._extra = extra
+        self._sequence = list(rows) if extra else None
+        self._source = rows
+        self._ordered = None
+
+    def _first_seen(self, field: str, count: int) -> list:
+        # Distinct values of `field` in order of first appearance; stops once all `count` were seen
+        seen: Dict[str, None] = {}
+        for row in self._snapshot():
+            if len(seen) == count:
+                break
+            seen.setdefault(getattr(row, field))
+        return list(seen)
+
+    def _rebuild(self):
+        self._reset()
+        for row in self._snapshot():
+            self._apply(row, 1)
+        self._ordered = None
+
+class SustainabilityAggregator(_SnapshotAggregator):
+    def __init__(self):
+        self._factors: Optional[emission_factors.FactorTable] = None
+        super().__init__()
+
+    def _reset(self):
+        self._total = ExactSum()
+        self._region_emissions: Dict[str, ExactSum] = {}
+        self._region_counts: Dict[str, int] = {}
+        self._idle_emissions = ExactSum()
+        self._idle_cost = ExactSum()
+
+    def _prepare(self):
+        # New emission factors change every resource's emissions, so rebuild from scratch
+        factors = emission_factors.current()
+        if factors is not self._factors:
+            self._factors = factors
+            self._rebuild()
+
+    def _apply(self, r: Resource, sign: int):
+        # Recomputed on removal too: same row and factors give the same value, so it cancels exactly
+        monthly = estimate_daily_emissions_kg(r, self._factors) * 30 * sign
+        self._total.add(monthly)
+        count = self._region_counts.get(r.region, 0) + sign
+        if count:
+            self._region_counts[r.region] = count
+            self._region_emissions.setdefault(r.region, ExactSum()).add(monthly)
+        else:
+            del self._region_counts[r.region]
+            del self._region_emissions[r.region]
+        if _is_idle(r):
+            self._idle_emissions.add(monthly)
+            self._idle_cost.add(r.daily_cost_usd * 30 * sign)
+
+    def upsert(self, r: Resource):
+        with self._lock:
+            self._prepare()
+            self._upsert(r)
+
+    def delete(self, resource_id: str):
+        with self._lock:
+            self._prepare()
+            self._delete(resource_id)
+
+    def sync(self, resources: List[Resource]):
+        """
+        Brings the aggregate in line with a full snapshot by applying only the
+        differences. Syncing the same list object again is a no-op.
+        """
+        with self._lock:
+            self._prepare()
+            self._sync(resources)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            self._prepare()
+            if self._ordered is None:
+                self._ordered = (self._first_seen("region", len(self._region_counts)), [
+                    # _is_idle, inlined for the full pass
+                    r for r in self._snapshot() if r.avg_cpu_7d < 0.05 and r.last_active_days_ago > 3
+                ])
+            regions, idle = self._ordered
+            total = self._total.value()
+            idle_emissions = self._idle_emissions.value()
+            return {
+                "total_monthly_emissions_kg": total,
+                "emissions_by_region": [
+                    {"region": region, "emissions_kg": self._region_emissions[region].value()}
+                    for region in regions
+                ],
+                "idle_resources": list(idle),
+                "potential_monthly_emissions_savings_kg": idle_emissions,
+                "potential_monthly_cost_savings_usd": self._idle_cost.value(),
+                "sustainability_score": compute_sustainability_score(total, idle_emissions),
+            }
+
+class ComplianceAggregator(_SnapshotAggregator):
+    def _reset(self):
+        self._framework_counts: Dict[str, int] = {}
+        self._framework_weight: Dict[str, int] = {}
+        self._framework_passing: Dict[str, int] = {}
+        self._total_weight = 0
+        self._passing_weight = 0
+        self._open_risks = {"critical": 0, "high": 0, "medium": 0, "low": 0}
+
+    def _apply(self, c: Control, sign: int):
+        weight = WEIGHT_BY_SEVERITY[c.severity] * sign
+        passing = c.status == ControlStatus.PASS
+        self._framework_counts[c.framework] = self._framework_counts.get(c.framework, 0) + sign
+        self._framework_weight[c.framework] = self._framework_weight.get(c.framework, 0) + weight
+        self._framework_passing[c.framework] = self._framework_passing.get(c.framework, 0) + (weight if passing else 0)
+        if self._framework_counts[c.framework] == 0:
+            del self._framework_counts[c.framework]
+            del self._framework_weight[c.framework]
+            del self._framework_passing[c.framework]
+        self._total_weight += weight
+        if passing:
+            self._passing_weight += weight
+        else:
+            self._open_risks[c.severity.value] += sign
+
+    def upsert(self, c: Control):
+        with self._lock:
+            self._upsert(c)
+
+    def delete(self, control_id: str):
+        with self._lock:
+            self._delete(control_id)
+
+    def sync(self, controls: List[Control]):
+        """
+        Brings the aggregate in line with a full snapshot by applying only the
+        differences. Syncing the same list object again is a no-op.
+        """
+        with self._lock:
+            self._sync(controls)
+
+    def framework_scores(self) -> Dict[str, float]:
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = self._first_seen("framework", len(self._framework_counts))
+            return {
+                fw: (self._framework_passing[fw] / total) * 100.0 if total else 100.0
+                for fw, total in ((fw, self._framework_weight[fw]) for fw in self._ordered)
+            }
+
+    def overall_score(self) -> float:
+        with self._lock:
+            if self._total_weight == 0:
+                return 100.0
+            return (self._passing_weight / self._total_weight) * 100.0
+
+    def open_risks(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._open_risks)
+
+# Process-wide aggregators behind the metrics_engine-compatible functions below
+sustainability = SustainabilityAggregator()
+compliance = ComplianceAggregator()
+
+def compute_framework_compliance(controls: List[Control]) -> Dict[str, float]:
+    compliance.sync(controls)
+    return compliance.framework_scores()
+
+def compute_overall_compliance_score(controls: List[Control]) -> float:
+    compliance.sync(controls)
+    return compliance.overall_score()
+
+def get_open_risks(controls: List[Control]) -> Dict[str, int]:
+    compliance.sync(controls)
+    return compliance.open_risks()
+
+def compute_sustainability_metrics(resources: List[Resource]) -> Dict:
+    sustainability.sync(resources)
+    return sustainability.metrics()
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from models import records
+
+# Pre-serialized response documents. A MaterializedDocument holds the JSON
+# bytes of one payload together with the key of the inputs it was built from;
+# refresh() only rebuilds when that key changes, so a request or a background
+# refresher can call it freely and the endpoint serves the stored bytes. The
+# ETag is a hash of the body, so it is stable across workers and restarts.
+
+class Document:
+    __slots__ = ("body", "etag", "version", "built_at")
+
+    def __init__(self, body: bytes, etag: str, version: int, built_at: float):
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self.built_at = built_at
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True when an If-None-Match header names this document (weak or strong)."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+def render_json(content: Any) -> bytes:
+    # Same encoding as the API's JSON responses
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=records.json_default
+    ).encode("utf-8")
+
+class MaterializedDocument:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._document: Optional[Document] = None
+        self._key: Optional[Hashable] = None
+        self._pinned: Any = None
+        self._counters = {"builds": 0, "unchanged": 0, "build_errors": 0}
+
+    def current(self) -> Optional[Document]:
+        return self._document
+
+    def refresh(self, key: Hashable, build: Callable[[], Any], pin: Any = None) -> Document:
+        """
+        Returns the stored document when `key` equals the key it was built
+        from, otherwise calls `build()` and stores its serialized result.
+        `pin` keeps objects alive whose id() is part of the key, so the ids
+        cannot be reused while the document refers to them.
+        """
+        with self._lock:
+            if self._document is not None and key == self._key:
+                self._counters["unchanged"] += 1
+                return self._document
+            try:
+                body = render_json(build())
+            except Exception:
+                self._counters["build_errors"] += 1
+                raise
+            version = self._document.version + 1 if self._document is not None else 1
+            self._document = Document(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', version, time.time())
+            self._key = key
+            self._pinned = pin
+            self._counters["builds"] += 1
+            return self._document
+
+    def stats(self) -> Dict:
+        document = self._document
+        return {
+            **self._counters,
+            "version": document.version if document else 0,
+            "etag": document.etag if document else None,
+            "bytes": len(document.body) if document else 0,
+            "age_seconds": time.time() - document.built_at if document else None,
+        }
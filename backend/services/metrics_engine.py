@@ -1,6 +1,7 @@
-from typing import List, Dict, Literal
+from typing import List, Dict, Literal, Optional
 from datetime import datetime, timezone
 from models.schemas import Control, Resource, ControlSeverity, ControlStatus
+from services import emission_factors
 
 # Constants
 WEIGHT_BY_SEVERITY = {
@@ -10,19 +11,8 @@ WEIGHT_BY_SEVERITY = {
     ControlSeverity.LOW: 1,
 }
 
-GRID_INTENSITY = {
-    "us-central1": 0.45,     # kg CO2e per kWh
-    "europe-west4": 0.18,
-    "us-west1": 0.05,
-}
-
-INSTANCE_POWER_KW = {
-    "n1-standard-1": 0.05,
-    "n1-standard-4": 0.17,
-    "n1-highcpu-32": 1.40,
-}
-
-PUE = 1.1  # constant overhead factor
+# Grid intensity, machine power, PUE and region prices live in
+# data/emission_factors.json; see services/emission_factors.
 
 def compute_framework_compliance(controls: List[Control]) -> Dict[str, float]:
     """
@@ -81,15 +71,23 @@ def get_open_risks(controls: List[Control]) -> Dict[str, int]:
             
     return risks
 
-def estimate_daily_emissions_kg(resource: Resource) -> float:
+def estimate_daily_emissions_kg(resource: Resource, factors: Optional[emission_factors.FactorTable] = None) -> float:
     """
     Estimates daily emissions for a single resource.
     Formula: hours * power_kw * grid_intensity * PUE
     """
-    power_kw = INSTANCE_POWER_KW.get(resource.instance_type, 0.2)
-    intensity = GRID_INTENSITY.get(resource.region, 0.5)
-    hours = resource.avg_hours_per_day
-    return hours * power_kw * intensity * PUE
+    factors = factors or emission_factors.current()
+    return resource.avg_hours_per_day * factors.emissions_kg_per_hour(resource.region, resource.instance_type)
+
+def compute_sustainability_score(total_monthly_emissions: float, potential_emissions_savings: float) -> float:
+    """
+    Sustainability score heuristic (40..95, or 100 with no emissions).
+    """
+    if total_monthly_emissions == 0:
+        return 100.0
+    ratio = potential_emissions_savings / total_monthly_emissions
+    ratio = max(0.0, min(ratio, 0.5))  # clamp 0–0.5
+    return 40.0 + (ratio / 0.5) * 55.0  # 40..95
 
 def compute_sustainability_metrics(resources: List[Resource]) -> Dict:
     """
@@ -100,9 +98,10 @@ def compute_sustainability_metrics(resources: List[Resource]) -> Dict:
     idle_resources: List[Resource] = []
     potential_emissions_savings = 0.0
     potential_cost_savings = 0.0
+    factors = emission_factors.current()
 
     for r in resources:
-        daily_emissions = estimate_daily_emissions_kg(r)
+        daily_emissions = estimate_daily_emissions_kg(r, factors)
         monthly_emissions = daily_emissions * 30
         total_monthly_emissions += monthly_emissions
         emissions_by_region[r.region] = emissions_by_region.get(r.region, 0.0) + monthly_emissions
@@ -114,14 +113,6 @@ def compute_sustainability_metrics(resources: List[Resource]) -> Dict:
             potential_emissions_savings += monthly_emissions
             potential_cost_savings += r.daily_cost_usd * 30
 
-    # sustainability score heuristic
-    if total_monthly_emissions == 0:
-        score = 100.0
-    else:
-        ratio = potential_emissions_savings / total_monthly_emissions
-        ratio = max(0.0, min(ratio, 0.5))  # clamp 0–0.5
-        score = 40.0 + (ratio / 0.5) * 55.0  # 40..95
-
     return {
         "total_monthly_emissions_kg": total_monthly_emissions,
         "emissions_by_region": [
@@ -131,5 +122,28 @@ def compute_sustainability_metrics(resources: List[Resource]) -> Dict:
         "idle_resources": idle_resources,
         "potential_monthly_emissions_savings_kg": potential_emissions_savings,
         "potential_monthly_cost_savings_usd": potential_cost_savings,
-        "sustainability_score": score,
+        "sustainability_score": compute_sustainability_score(total_monthly_emissions, potential_emissions_savings),
+    }
+
+def compute_sustainability_metrics_from_region_totals(region_totals: List[Dict], idle_resources: List[Resource]) -> Dict:
+    """
+    Builds the compute_sustainability_metrics result from per-region totals
+    that were aggregated elsewhere (e.g. in BigQuery). emissions_by_region
+    follows the order of `region_totals`, which for BigQuery is sorted by
+    region rather than in order of first appearance.
+    """
+    total_monthly_emissions = sum(row["monthly_emissions_kg"] for row in region_totals)
+    potential_emissions_savings = sum(row["idle_monthly_emissions_kg"] for row in region_totals)
+    potential_cost_savings = sum(row["idle_monthly_cost_usd"] for row in region_totals)
+
+    return {
+        "total_monthly_emissions_kg": total_monthly_emissions,
+        "emissions_by_region": [
+            {"region": row["region"], "emissions_kg": row["monthly_emissions_kg"]}
+            for row in region_totals
+        ],
+        "idle_resources": idle_resources,
+        "potential_monthly_emissions_savings_kg": potential_emissions_savings,
+        "potential_monthly_cost_savings_usd": potential_cost_savings,
+        "sustainability_score": compute_sustainability_score(total_monthly_emissions, potential_emissions_savings),
     }
@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Configuration
+DEFAULT_HISTORY_PATH = Path(__file__).resolve().parents[1] / "data" / "metrics_history.sqlite3"
+HISTORY_PATH = os.getenv("ORBYTE_HISTORY_PATH", str(DEFAULT_HISTORY_PATH))  # empty string keeps history in memory
+HISTORY_INTERVAL_SECONDS = float(os.getenv("ORBYTE_HISTORY_INTERVAL_SECONDS", "900"))  # 0 disables recording
+HISTORY_RAW_RETENTION_DAYS = float(os.getenv("ORBYTE_HISTORY_RAW_RETENTION_DAYS", "7"))
+HISTORY_HOURLY_RETENTION_DAYS = float(os.getenv("ORBYTE_HISTORY_HOURLY_RETENTION_DAYS", "90"))
+HISTORY_DAILY_RETENTION_DAYS = float(os.getenv("ORBYTE_HISTORY_DAILY_RETENTION_DAYS", "1825"))
+
+# Resolutions in seconds; "raw" is every recorded sample
+RESOLUTIONS = {"raw": 0, "hour": 3600, "day": 86400}
+DAY_SECONDS = 86400
+
+class InvalidHistoryQuery(ValueError):
+    pass
+
+class MetricsHistory:
+    """
+    Append-only time series of metric snapshots in SQLite.
+
+    Series names are interned to integer ids and samples are stored as
+    (series, second, value) in a WITHOUT ROWID table clustered by series and
+    time, so a range query is one index range scan. Every append also
+    updates hourly and daily rollups (count, sum, min, max, last) in the same
+    transaction, so long-range trends read a few rows per day instead of
+    every sample. Raw samples and hourly rollups expire after their
+    retention; daily rollups are kept longest.
+    """
+
+    def __init__(self, path: str, raw_retention_days: float, hourly_retention_days: float, daily_retention_days: float):
+        self.retention = {
+            "raw": raw_retention_days * DAY_SECONDS,
+            "hour": hourly_retention_days * DAY_SECONDS,
+            "day": daily_retention_days * DAY_SECONDS,
+        }
+        self._lock = threading.Lock()
+        self._series_ids: Dict[str, int] = {}
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS series (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS samples (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (series_id, ts)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollups (
+                resolution INTEGER NOT NULL,
+                series_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                sum REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                last REAL NOT NULL,
+                PRIMARY KEY (resolution, series_id, bucket)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._counters = {"appends": 0, "samples": 0}
+
+    def _series_id(self, name: str) -> int:
+        series_id = self._series_ids.get(name)
+        if series_id is None:
+            self._db.execute("INSERT OR IGNORE INTO series (name) VALUES (?)", (name,))
+            series_id = self._db.execute("SELECT id FROM series WHERE name = ?", (name,)).fetchone()[0]
+            self._series_ids[name] = series_id
+        return series_id
+
+    def append(self, values: Dict[str, float], timestamp: Optional[float] = None) -> int:
+        """
+        Records one snapshot of several series at `timestamp` (default now).
+        A series that already has a sample at the same second keeps the
+        first one. Returns the number of samples written.
+        """
+        ts = int(timestamp if timestamp is not None else time.time())
+        written = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for name, value in values.items():
+                    series_id = self._series_id(name)
+                    value = float(value)
+                    inserted = self._db.execute(
+                        "INSERT OR IGNORE INTO samples (series_id, ts, value) VALUES (?, ?, ?)",
+                        (series_id, ts, value),
+                    ).rowcount
+                    if not inserted:
+                        continue
+                    written += 1
+                    for resolution in (RESOLUTIONS["hour"], RESOLUTIONS["day"]):
+                        self._db.execute(
+                            """
+                            INSERT INTO rollups (resolution, series_id, bucket, count, sum, min, max, last)
+                            VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+                            ON CONFLICT (resolution, series_id, bucket) DO UPDATE SET
+                                count = count + 1,
+                                sum = sum + excluded.sum,
+                                min = MIN(min, excluded.min),
+                                max = MAX(max, excluded.max),
+                                last = excluded.last
+                            """,
+                            (resolution, series_id, ts - ts % resolution, value, value, value, value),
+                        )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._counters["appends"] += 1
+            self._counters["samples"] += written
+        return written
+
+    def query(self, series: str, start: float, end: Optional[float] = None, resolution: str = "day") -> List[Dict]:
+        """
+        Points of `series` with start <= timestamp <= end, oldest first.
+        Rollup points are bucket averages with their min, max and count.
+        """
+        if resolution not in RESOLUTIONS:
+            raise InvalidHistoryQuery(f"Unknown resolution: {resolution}")
+        end = end if end is not None else time.time()
+        with self._lock:
+            row = self._db.execute("SELECT id FROM series WHERE name = ?", (series,)).fetchone()
+            if row is None:
+                return []
+            if resolution == "raw":
+                rows = self._db.execute(
+                    "SELECT ts, value FROM samples WHERE series_id = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                    (row[0], int(start), int(end)),
+                ).fetchall()
+                return [{"timestamp": ts, "value": value} for ts, value in rows]
+            seconds = RESOLUTIONS[resolution]
+            rows = self._db.execute(
+                "SELECT bucket, count, sum, min, max FROM rollups "
+                "WHERE resolution = ? AND series_id = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (seconds, row[0], int(start) - int(start) % seconds, int(end)),
+            ).fetchall()
+        return [
+            {"timestamp": bucket, "value": total / count, "min": low, "max": high, "count": count}
+            for bucket, count, total, low, high in rows
+        ]
+
+    def series(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name FROM series WHERE substr(name, 1, ?) = ? ORDER BY name", (len(prefix), prefix)
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def last_timestamp(self, series: str) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MAX(s.ts) FROM samples s JOIN series n ON n.id = s.series_id WHERE n.name = ?", (series,)
+            ).fetchone()
+        return row[0]
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = now if now is not None else time.time()
+        with self._lock:
+            removed = self._db.execute("DELETE FROM samples WHERE ts < ?", (int(now - self.retention["raw"]),)).rowcount
+            for name in ("hour", "day"):
+                removed += self._db.execute(
+                    "DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                    (RESOLUTIONS[name], int(now - self.retention[name])),
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {
+                "series": self._db.execute("SELECT COUNT(*) FROM series").fetchone()[0],
+                "raw_samples": self._db.execute("SELECT COUNT(*) FROM samples").fetchone()[0],
+                "rollup_rows": self._db.execute("SELECT COUNT(*) FROM rollups").fetchone()[0],
+            }
+        return {**self._counters, **counts, "interval_seconds": HISTORY_INTERVAL_SECONDS}
+
+history = MetricsHistory(HISTORY_PATH, HISTORY_RAW_RETENTION_DAYS, HISTORY_HOURLY_RETENTION_DAYS, HISTORY_DAILY_RETENTION_DAYS)
@@ -1,9 +1,27 @@
-from models.schemas import Control, Resource, ControlSeverity, ControlStatus
+from models.schemas import ControlSeverity, ControlStatus
+from models.records import ControlRecord, ResourceRecord
 from datetime import datetime, timedelta
+import functools
+import os
+
+from services import synthetic_data
+
+# Serve a seeded synthetic fleet of this many resources / controls instead of
+# the handful of hand-written rows below (0 keeps the hand-written rows)
+MOCK_RESOURCE_COUNT = int(os.getenv("ORBYTE_MOCK_RESOURCE_COUNT", "0"))
+MOCK_CONTROL_COUNT = int(os.getenv("ORBYTE_MOCK_CONTROL_COUNT", "0"))
+MOCK_SEED = int(os.getenv("ORBYTE_MOCK_SEED", "0"))
 
 def get_mock_controls():
+    if MOCK_CONTROL_COUNT > 0:
+        return synthetic_data.cached_controls(MOCK_CONTROL_COUNT, MOCK_SEED)
+    return _default_controls()
+
+@functools.lru_cache(maxsize=1)
+def _default_controls():
+    # One list for the process, like a cached snapshot, so identity-keyed caches hit
     return [
-        Control(
+        ControlRecord(
             id="AC-2",
             name="Account Management",
             framework="NIST 800-53",
@@ -12,7 +30,7 @@ def get_mock_controls():
             evidence_count=5,
             description="The organization identifies and selects the following types of information system accounts to support organizational missions/business functions."
         ),
-        Control(
+        ControlRecord(
             id="AC-3",
             name="Access Enforcement",
             framework="NIST 800-53",
@@ -21,7 +39,7 @@ def get_mock_controls():
             evidence_count=2,
             description="The information system enforces approved authorizations for logical access to information and system resources in accordance with applicable access control policies."
         ),
-        Control(
+        ControlRecord(
             id="CC-6",
             name="Logical and Physical Access",
             framework="SOC 2",
@@ -30,7 +48,7 @@ def get_mock_controls():
             evidence_count=3,
             description="Logical access to relevant system components is restricted to authorized personnel."
         ),
-        Control(
+        ControlRecord(
             id="CC-7",
             name="System Operations",
             framework="SOC 2",
@@ -42,9 +60,11 @@ def get_mock_controls():
     ]
 
 def get_mock_resources():
+    if MOCK_RESOURCE_COUNT > 0:
+        return synthetic_data.cached_resources(MOCK_RESOURCE_COUNT, MOCK_SEED)
     now = datetime.now()
     return [
-        Resource(
+        ResourceRecord(
             id="vm-1",
             name="prod-web-01",
             type="vm",
@@ -56,7 +76,7 @@ def get_mock_resources():
             last_active_at=now,
             daily_cost_usd=12.50
         ),
-        Resource(
+        ResourceRecord(
             id="vm-2",
             name="dev-test-01",
             type="vm",
@@ -68,7 +88,7 @@ def get_mock_resources():
             last_active_at=now - timedelta(days=5),
             daily_cost_usd=3.20
         ),
-        Resource(
+        ResourceRecord(
             id="vm-3",
             name="staging-db",
             type="db",
@@ -80,7 +100,7 @@ def get_mock_resources():
             last_active_at=now,
             daily_cost_usd=45.00
         ),
-        Resource(
+        ResourceRecord(
             id="vm-4",
             name="old-batch-job",
             type="vm",
@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from services import ai_cache, ai_reasoning
+from services.simulation_jobs import _pid_alive
+
+# Scenario narratives generated in the background, so simulation endpoints can
+# return their numbers without waiting on the model. A narrative's id is its
+# cache key, so equivalent scenarios share one id, one generation and one
+# cached result. Generation state lives in SQLite next to the AI cache, so
+# every API worker process sees the same pending/ready/failed narratives.
+
+NARRATIVE_TTL_SECONDS = float(os.getenv("ORBYTE_NARRATIVE_TTL_SECONDS", "3600"))
+NARRATIVE_POLL_SECONDS = 0.5  # how often waiters re-check a narrative another process is generating
+
+READY = "ready"
+PENDING = "pending"
+FAILED = "failed"
+
+class NarrativeStore:
+    """
+    SQLite table of narrative generations: pending (with the owning process),
+    ready (with the narrative, including fallbacks that are never cached) or
+    failed (with the error). Rows expire `ttl` seconds after the generation
+    started; a pending row whose owner has exited counts as failed.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS narrative_states (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                narrative TEXT,
+                error TEXT,
+                owner_pid INTEGER NOT NULL,
+                started_at REAL NOT NULL
+            )
+            """
+        )
+
+    def get(self, narrative_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, narrative, error, owner_pid, started_at FROM narrative_states WHERE id = ?",
+                (narrative_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, narrative, error, owner_pid, started_at = row
+        if started_at <= time.time() - self.ttl:
+            return None
+        if status == PENDING and not _pid_alive(owner_pid):
+            status, error = FAILED, "Interrupted by a server restart"
+        return {
+            "narrative_id": narrative_id,
+            "status": status,
+            "narrative": json.loads(narrative) if narrative is not None else None,
+            "error": error,
+        }
+
+    def claim(self, narrative_id: str) -> bool:
+        """
+        Marks a narrative pending for this process unless another live process
+        is generating it or it is ready. Returns whether this process owns the
+        generation.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM narrative_states WHERE started_at <= ?", (now - self.ttl,))
+            row = self._db.execute(
+                "SELECT status, owner_pid, started_at FROM narrative_states WHERE id = ?", (narrative_id,)
+            ).fetchone()
+            if row is None:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO narrative_states (id, status, owner_pid, started_at) VALUES (?, ?, ?, ?)",
+                    (narrative_id, PENDING, os.getpid(), now),
+                )
+                return cursor.rowcount > 0
+            status, owner_pid, started_at = row
+            if status == READY or (status == PENDING and _pid_alive(owner_pid)):
+                return False
+            # Retry a failed or orphaned generation, unless another process just did
+            cursor = self._db.execute(
+                "UPDATE narrative_states SET status = ?, narrative = NULL, error = NULL, owner_pid = ?, started_at = ? "
+                "WHERE id = ? AND status = ? AND owner_pid = ? AND started_at = ?",
+                (PENDING, os.getpid(), now, narrative_id, status, owner_pid, started_at),
+            )
+            return cursor.rowcount > 0
+
+    def finish(self, narrative_id: str, narrative: Dict):
+        with self._lock:
+            self._db.execute(
+                "UPDATE narrative_states SET status = ?, narrative = ? WHERE id = ? AND owner_pid = ?",
+                (READY, json.dumps(narrative, default=str), narrative_id, os.getpid()),
+            )
+
+    def fail(self, narrative_id: str, error: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE narrative_states SET status = ?, error = ? WHERE id = ? AND owner_pid = ? AND status = ?",
+                (FAILED, error, narrative_id, os.getpid(), PENDING),
+            )
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM narrative_states WHERE started_at > ? GROUP BY status",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return dict(rows)
+
+class NarrativeTasks:
+    """
+    Single-flight narrative generations across API workers: NarrativeStore
+    decides which process generates a narrative and holds its outcome.
+    Finished narratives are read from ai_reasoning.narrative_cache when
+    cached there, else from the store. Store access runs off the event loop.
+    """
+
+    def __init__(self, store: NarrativeStore):
+        self.store = store
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._counters = {"started": 0, "failed": 0}
+
+    async def start(self, simulation_type: str, params: dict, emissions_reduction_kg: float, cost_savings_usd: float) -> Dict:
+        await ai_reasoning.resolve_model()
+        narrative_id = ai_reasoning.scenario_narrative_key(simulation_type, params, emissions_reduction_kg, cost_savings_usd)
+        current = await self.get(narrative_id)
+        if current is not None and current["status"] != FAILED:
+            return current
+        if not await asyncio.to_thread(self.store.claim, narrative_id):
+            return await self.get(narrative_id) or self._pending(narrative_id)
+
+        async def generate():
+            narrative = await ai_reasoning.generate_scenario_narrative_async(
+                simulation_type, params, emissions_reduction_kg, cost_savings_usd
+            )
+            await asyncio.to_thread(self.store.finish, narrative_id, narrative)
+
+        task = self._tasks[narrative_id] = asyncio.create_task(generate())
+        task.add_done_callback(functools.partial(self._done, narrative_id))
+        self._counters["started"] += 1
+        return self._pending(narrative_id)
+
+    def _done(self, narrative_id: str, task: asyncio.Task):
+        self._tasks.pop(narrative_id, None)
+        if task.cancelled():
+            error = "Cancelled"
+        elif task.exception() is not None:
+            error = str(task.exception()) or type(task.exception()).__name__
+        else:
+            return
+        print(f"[Orbyte] Narrative {narrative_id} failed: {error}")
+        self._counters["failed"] += 1
+        self.store.fail(narrative_id, error)
+
+    @staticmethod
+    def _pending(narrative_id: str) -> Dict:
+        return {"narrative_id": narrative_id, "status": PENDING, "narrative": None}
+
+    def _lookup(self, narrative_id: str) -> Optional[Dict]:
+        narrative = ai_reasoning.narrative_cache.get(narrative_id)
+        if narrative is not None:
+            return {"narrative_id": narrative_id, "status": READY, "narrative": narrative}
+        state = self.store.get(narrative_id)
+        if state is None and narrative_id in self._tasks:
+            return self._pending(narrative_id)
+        return state
+
+    async def get(self, narrative_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._lookup, narrative_id)
+
+    async def wait(self, narrative_id: str, timeout: float) -> Optional[Dict]:
+        """Waits up to `timeout` seconds for a pending narrative; returns its current state."""
+        deadline = time.monotonic() + timeout
+        while True:
+            task = self._tasks.get(narrative_id)
+            if task is not None:
+                # Generated here: wait on the task itself
+                await asyncio.wait([task], timeout=max(0.0, deadline - time.monotonic()))
+            state = await self.get(narrative_id)
+            remaining = deadline - time.monotonic()
+            if state is None or state["status"] != PENDING or remaining <= 0:
+                return state
+            if narrative_id not in self._tasks:
+                # Generated by another worker process: poll the store
+                await asyncio.sleep(min(NARRATIVE_POLL_SECONDS, remaining))
+
+    def stats(self) -> Dict:
+        return {**self._counters, "pending": len(self._tasks), "states": self.store.count()}
+
+scenario_narratives = NarrativeTasks(NarrativeStore(ai_cache.AI_CACHE_PATH, NARRATIVE_TTL_SECONDS))
@@ -0,0 +1,420 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from models.schemas import Resource, SimulationRequest
+from services import emission_factors
+from services.columnar_metrics import ResourceColumns, resource_columns, row_power_kw, row_kg_per_hour
+
+# Vectorized parameter sweeps over the simulation scenarios.
+#
+# Every grid point shares one pass over the fleet: per sample we take running
+# sums over the affected resources in a fixed order (list order for idle
+# shutdown, emissions saved per dollar for migration), so "the first k% of
+# the candidates" is a lookup into the running sum rather than a loop. Each
+# shutdown-hours value weights emissions by the region's intensity over the
+# shutdown window and scales cost by hours / 24. Monte Carlo samples perturb
+# each resource's CPU and hours with multiplicative normal noise; with
+# samples=0 the sweep is deterministic and matches /api/simulations/run.
+
+SIM_MAX_SAMPLES = int(os.getenv("ORBYTE_SIM_MAX_SAMPLES", "10000"))
+SIM_MAX_GRID_POINTS = int(os.getenv("ORBYTE_SIM_MAX_GRID_POINTS", "10000"))
+SIM_BLOCK_ELEMENTS = int(os.getenv("ORBYTE_SIM_BLOCK_ELEMENTS", "1000000"))  # samples x resources per block
+
+# Idle shutdown switches resources off for the hours ending at this local hour
+# (e.g. 10 hours -> 21:00-07:00), weighted by each region's hourly intensity curve
+IDLE_SHUTDOWN_END_HOUR = int(os.getenv("ORBYTE_IDLE_SHUTDOWN_END_HOUR", "7"))
+
+IDLE_CPU_THRESHOLD = 0.05
+IDLE_DAYS_THRESHOLD = 3
+
+class InvalidSimulation(ValueError):
+    pass
+
+class InvalidSweep(InvalidSimulation):
+    pass
+
+def check_target_region(region: str, factors: emission_factors.FactorTable):
+    # Unknown regions would silently use the default intensity and price
+    if region not in factors.grid_intensity:
+        raise InvalidSimulation(f"Unknown target region: {region}")
+
+def default_region_pairs(regions: Sequence[str]) -> List[Tuple[str, str]]:
+    """Each fleet region paired with the cleanest region we have a grid intensity for."""
+    cleanest = emission_factors.current().cleanest_region()
+    return [(region, cleanest) for region in regions if region != cleanest]
+
+def _noise(rng: Optional[np.random.Generator], shape: Tuple[int, int], sigma: float) -> Optional[np.ndarray]:
+    if rng is None or sigma <= 0:
+        return None
+    factor = rng.standard_normal(shape, dtype=np.float32)
+    factor *= sigma
+    factor += 1.0
+    return np.maximum(factor, 0.0, out=factor)
+
+def shutdown_shares(cols: ResourceColumns, hours: Sequence[float],
+                    factors: Optional[emission_factors.FactorTable] = None) -> np.ndarray:
+    """
+    Per-row share of daily emissions avoided by switching off for each of
+    `hours` a day, shape (len(hours), rows): the region's intensity-weighted
+    share of the shutdown window.
+    """
+    factors = factors or emission_factors.current()
+    by_region = np.array(
+        [[factors.window_share(region, IDLE_SHUTDOWN_END_HOUR, h) for region in cols.regions] for h in hours],
+        dtype=np.float64,
+    ).reshape(len(hours), len(cols.regions))
+    return by_region[:, cols.region_codes]
+
+def _prefix_at(running: np.ndarray, ranks: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """
+    running[s, j] and ranks[s, j] are row-wise running sums of a value and of
+    a 0/1 mask. Returns, per row, the running value at the k-th masked
+    element (0 where k is 0), using one searchsorted over the flattened rows.
+    """
+    rows, width = ranks.shape
+    if width == 0:
+        return np.zeros(k.shape)
+    offsets = np.arange(rows, dtype=np.int64)[:, None] * (width + 1)
+    flat = (ranks + offsets).ravel()
+    positions = np.searchsorted(flat, (k + offsets).ravel(), side="left").reshape(k.shape)
+    values = running.ravel()[np.minimum(positions, flat.size - 1)]
+    return np.where(k > 0, values, 0.0)
+
+def _summarize(values: np.ndarray, percentiles: Sequence[float], include_samples: bool) -> Dict:
+    summary = {"mean": float(values.mean()), "std": float(values.std())}
+    for q, v in zip(percentiles, np.percentile(values, percentiles)):
+        summary[f"p{q:g}"] = float(v)
+    if include_samples:
+        summary["samples"] = values.tolist()
+    return summary
+
+def _sweep_idle_shutdown(cols: ResourceColumns, daily_emissions: np.ndarray, shares: np.ndarray, fractions: np.ndarray,
+                         samples: int, rng, hours_sigma: float, cpu_sigma: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Monthly emissions avoided by the first k idle resources, shape (samples,
+    shutdown hours, percents), with `shares` from shutdown_shares; and their
+    monthly cost at full-day shutdown, shape (samples, percents), which
+    callers scale by hours / 24.
+    """
+    # Only resources that have been inactive long enough can ever be idle
+    eligible = np.flatnonzero(cols.last_active_days_ago > IDLE_DAYS_THRESHOLD)
+    cpu = cols.avg_cpu_7d[eligible]
+    emissions = daily_emissions[eligible]
+    shares = shares[:, eligible]
+    cost = cols.daily_cost_usd[eligible]
+    m = len(eligible)
+
+    draws = max(samples, 1)
+    out_emissions = np.zeros((draws, len(shares), len(fractions)))
+    out_cost = np.zeros((draws, len(fractions)))
+    block = max(1, SIM_BLOCK_ELEMENTS // max(m, 1))
+    for start in range(0, draws, block):
+        b = min(block, draws - start)
+        cpu_factor = _noise(rng, (b, m), cpu_sigma)
+        hours_factor = _noise(rng, (b, m), hours_sigma)
+        idle = (cpu * cpu_factor if cpu_factor is not None else np.broadcast_to(cpu, (b, m))) < IDLE_CPU_THRESHOLD
+        # Hours above 24/day are clipped, so perturbed emissions are capped at 24/hours of the baseline
+        sample_emissions = np.broadcast_to(emissions, (b, m))
+        if hours_factor is not None:
+            hours = cols.avg_hours_per_day[eligible]
+            cap = np.divide(24.0, hours, out=np.ones_like(hours), where=hours > 0)
+            sample_emissions = emissions * np.minimum(hours_factor, cap)
+
+        ranks = np.cumsum(idle, axis=1, dtype=np.int64)
+        k = np.floor(ranks[:, -1:] * fractions if m else np.zeros((b, len(fractions)))).astype(np.int64)
+        idle_emissions = sample_emissions * idle
+        for h, share in enumerate(shares):
+            out_emissions[start:start + b, h] = _prefix_at(np.cumsum(idle_emissions * share, axis=1), ranks, k) * 30
+        out_cost[start:start + b] = _prefix_at(np.cumsum(cost * idle, axis=1), ranks, k) * 30
+    return out_emissions, out_cost
+
+class RegionIndex:
+    """
+    Resources grouped by region for migration what-ifs. Within a region every
+    candidate sees the same intensity delta and price ratio for a given
+    target, so ranking by emissions saved per dollar of post-migration cost
+    reduces to ranking by kWh per dollar today. Each region is stored in that
+    order (most kWh per dollar first) with prefix sums, which makes any
+    source -> target -> percent query a constant-time lookup.
+    """
+
+    def __init__(self, cols: ResourceColumns, factors: emission_factors.FactorTable):
+        self.columns = cols
+        self.factors = factors
+        kwh = cols.avg_hours_per_day * row_power_kw(cols, factors) * factors.pue
+        efficiency = np.divide(kwh, cols.daily_cost_usd, out=np.full(len(cols), np.inf), where=cols.daily_cost_usd > 0)
+        efficiency[(kwh == 0) & (cols.daily_cost_usd <= 0)] = 0.0
+        self.rows: Dict[str, np.ndarray] = {}
+        self.hours: Dict[str, np.ndarray] = {}
+        self.kwh: Dict[str, np.ndarray] = {}
+        self.kwh_prefix: Dict[str, np.ndarray] = {}
+        self.cost_prefix: Dict[str, np.ndarray] = {}
+        order = np.argsort(cols.region_codes, kind="stable")
+        bounds = np.searchsorted(cols.region_codes[order], np.arange(len(cols.regions) + 1))
+        for code, region in enumerate(cols.regions):
+            members = order[bounds[code]:bounds[code + 1]]
+            members = members[np.argsort(-efficiency[members], kind="stable")]
+            self.rows[region] = members
+            self.hours[region] = cols.avg_hours_per_day[members]
+            self.kwh[region] = kwh[members]
+            self.kwh_prefix[region] = np.concatenate([[0.0], np.cumsum(kwh[members])])
+            self.cost_prefix[region] = np.concatenate([[0.0], np.cumsum(cols.daily_cost_usd[members])])
+
+    def count(self, region: str) -> int:
+        return len(self.rows.get(region, ()))
+
+    def candidates(self, region: str, fractions: np.ndarray) -> np.ndarray:
+        """How many of `region`'s resources each fraction moves, clamped to [0, count]."""
+        n = self.count(region)
+        return np.clip(np.floor(n * fractions), 0, n).astype(np.int64)
+
+    def selection(self, source: str, target: str, k: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Start and stop positions of the k best candidates in `source`'s ranked
+        order. Moving to a dirtier region saves negative emissions, so the
+        best candidates are then the ones with the least kWh per dollar.
+        """
+        n = self.count(source)
+        if intensity_delta(source, target, self.factors) >= 0:
+            return np.zeros_like(k), k
+        return n - k, np.full_like(k, n)
+
+    def migrate(self, source: str, target: str, fractions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Monthly (emissions reduction kg, cost savings usd) per fraction of `source` migrated."""
+        if source not in self.rows or source == target:
+            return np.zeros(len(fractions)), np.zeros(len(fractions))
+        k = self.candidates(source, fractions)
+        lo, hi = self.selection(source, target, k)
+        kwh = self.kwh_prefix[source][hi] - self.kwh_prefix[source][lo]
+        cost = self.cost_prefix[source][hi] - self.cost_prefix[source][lo]
+        delta = intensity_delta(source, target, self.factors)
+        return kwh * delta * 30, cost * (1 - price_ratio(source, target, self.factors)) * 30
+
+def intensity_delta(source: str, target: str, factors: Optional[emission_factors.FactorTable] = None) -> float:
+    factors = factors or emission_factors.current()
+    return factors.intensity(source) - factors.intensity(target)
+
+def price_ratio(source: str, target: str, factors: Optional[emission_factors.FactorTable] = None) -> float:
+    factors = factors or emission_factors.current()
+    return factors.price(target) / factors.price(source)
+
+# Index of the last resource snapshot, rebuilt only when the snapshot or the emission factors change
+_index_lock = threading.Lock()
+_index: Optional[RegionIndex] = None
+
+def region_index_for(resources: Union[List[Resource], ResourceColumns]) -> RegionIndex:
+    global _index
+    cols = resource_columns(resources)
+    factors = emission_factors.current()
+    with _index_lock:
+        if _index is None or _index.columns is not cols or _index.factors is not factors:
+            _index = RegionIndex(cols, factors)
+        return _index
+
+def simulate_region_migration(resources: Union[List[Resource], ResourceColumns], source_region: Optional[str],
+                              target_region: Optional[str], workload_percent: float) -> Tuple[float, float]:
+    """
+    Returns (monthly emissions reduction kg, monthly cost savings usd) for
+    moving `workload_percent` of the source region's resources to the target,
+    best emissions-per-dollar first. Without a target the cleanest known
+    region is used; without a source every other region migrates the same
+    share of its own resources. An unknown target raises InvalidSimulation.
+    """
+    index = region_index_for(resources)
+    target = target_region or index.factors.cleanest_region()
+    check_target_region(target, index.factors)
+    sources = [source_region] if source_region else [r for r in index.rows if r != target]
+    fractions = np.array([workload_percent / 100.0])
+    emissions = cost = 0.0
+    for source in sources:
+        e, c = index.migrate(source, target, fractions)
+        emissions += float(e[0])
+        cost += float(c[0])
+    return emissions, cost
+
+def simulate_idle_shutdown(resources: Union[List[Resource], ResourceColumns], workload_percent: float,
+                           shutdown_hours: float) -> Tuple[float, float]:
+    """
+    Returns (monthly emissions reduction kg, monthly cost savings usd) for
+    switching off the first `workload_percent` of idle resources (in fleet
+    order) for `shutdown_hours` a day.
+    """
+    cols = resource_columns(resources)
+    idle = np.flatnonzero((cols.avg_cpu_7d < IDLE_CPU_THRESHOLD) & (cols.last_active_days_ago > IDLE_DAYS_THRESHOLD))
+    affected = idle[:int(len(idle) * (workload_percent / 100.0))]
+    daily_emissions = cols.avg_hours_per_day[affected] * row_kg_per_hour(cols)[affected]
+    emissions_share = shutdown_shares(cols, [shutdown_hours])[0, affected]
+    cost_share = shutdown_hours / 24
+    return float((daily_emissions * emissions_share).sum()) * 30, float(cols.daily_cost_usd[affected].sum()) * cost_share * 30
+
+def validate_simulation(request: SimulationRequest):
+    """Raises InvalidSimulation for a scenario simulate() cannot evaluate."""
+    if not 0 <= request.workload_percent <= 100:
+        raise InvalidSimulation("workload_percent must be between 0 and 100")
+    if not 0 <= request.shutdown_hours <= 24:
+        raise InvalidSimulation("shutdown_hours must be between 0 and 24")
+    if request.simulation_type == "region_migration" and request.target_region:
+        check_target_region(request.target_region, emission_factors.current())
+
+def simulate(resources: Union[List[Resource], ResourceColumns], request: SimulationRequest) -> Tuple[float, float]:
+    """Point estimate for one /api/simulations/run scenario; other simulation types save nothing."""
+    if request.simulation_type == "idle_shutdown":
+        return simulate_idle_shutdown(resources, request.workload_percent, request.shutdown_hours)
+    if request.simulation_type == "region_migration":
+        return simulate_region_migration(
+            resources, request.source_region, request.target_region, request.workload_percent
+        )
+    return 0.0, 0.0
+
+def _sweep_region_migration(index: RegionIndex, source: str, target: str, fractions: np.ndarray,
+                            samples: int, rng, hours_sigma: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Monthly emissions and cost savings of migrating each fraction of `source`
+    to `target`, shape (samples, percents). Candidates are ranked on observed
+    usage; samples perturb the hours they actually run after the move.
+    """
+    draws = max(samples, 1)
+    emissions, cost = index.migrate(source, target, fractions)
+    if samples == 0 or hours_sigma <= 0 or source not in index.rows or source == target:
+        return np.broadcast_to(emissions, (draws, len(fractions))), np.broadcast_to(cost, (draws, len(fractions)))
+
+    k = index.candidates(source, fractions)
+    lo, hi = index.selection(source, target, k)
+    hours, kwh = index.hours[source], index.kwh[source]
+    cap = np.divide(24.0, hours, out=np.ones_like(hours), where=hours > 0)
+    m = len(hours)
+    out = np.zeros((draws, len(fractions)))
+    block = max(1, SIM_BLOCK_ELEMENTS // max(m, 1))
+    for start in range(0, draws, block):
+        b = min(block, draws - start)
+        sample_kwh = kwh * np.minimum(_noise(rng, (b, m), hours_sigma), cap)
+        running = np.concatenate([np.zeros((b, 1)), np.cumsum(sample_kwh, axis=1)], axis=1)
+        out[start:start + b] = (running[:, hi] - running[:, lo]) * intensity_delta(source, target, index.factors) * 30
+    return out, np.broadcast_to(cost, (draws, len(fractions)))
+
+def _grid_points(simulation_types: Sequence[str], workload_percents: Sequence[float], shutdown_hours: Sequence[float],
+                 pairs: Sequence[Tuple[str, str]]) -> int:
+    return (
+        ("idle_shutdown" in simulation_types) * len(workload_percents) * len(shutdown_hours)
+        + ("region_migration" in simulation_types) * len(workload_percents) * len(pairs)
+    )
+
+def validate_sweep(
+    resources: Union[List[Resource], ResourceColumns],
+    simulation_types: Sequence[str] = ("idle_shutdown", "region_migration"),
+    workload_percents: Sequence[float] = (25, 50, 75, 100),
+    shutdown_hours: Sequence[float] = (10,),
+    region_pairs: Optional[Sequence[Tuple[str, str]]] = None,
+    samples: int = 0,
+    hours_uncertainty: float = 0.1,
+    cpu_uncertainty: float = 0.2,
+    percentiles: Sequence[float] = (5, 50, 95),
+) -> List[Tuple[str, str]]:
+    """
+    Checks run_sweep's parameters and grid size, raising InvalidSweep, and
+    returns the region pairs the sweep would evaluate.
+    """
+    unknown = set(simulation_types).difference({"idle_shutdown", "region_migration"})
+    if unknown:
+        raise InvalidSweep(f"Unsupported simulation types: {', '.join(sorted(unknown))}")
+    if not 0 <= samples <= SIM_MAX_SAMPLES:
+        raise InvalidSweep(f"samples must be between 0 and {SIM_MAX_SAMPLES}")
+    if any(not 0 <= p <= 100 for p in workload_percents):
+        raise InvalidSweep("workload_percents must be between 0 and 100")
+    if any(not 0 <= h <= 24 for h in shutdown_hours):
+        raise InvalidSweep("shutdown_hours must be between 0 and 24")
+    if any(not 0 <= q <= 100 for q in percentiles):
+        raise InvalidSweep("percentiles must be between 0 and 100")
+    if hours_uncertainty < 0 or cpu_uncertainty < 0:
+        raise InvalidSweep("uncertainties must be non-negative")
+
+    pairs = list(region_pairs) if region_pairs is not None else default_region_pairs(resource_columns(resources).regions)
+    if "region_migration" in simulation_types:
+        factors = emission_factors.current()
+        for target in {target for _, target in pairs}:
+            try:
+                check_target_region(target, factors)
+            except InvalidSimulation as e:
+                raise InvalidSweep(str(e))
+    grid_points = _grid_points(simulation_types, workload_percents, shutdown_hours, pairs)
+    if grid_points > SIM_MAX_GRID_POINTS:
+        raise InvalidSweep(f"Sweep has {grid_points} grid points; the limit is {SIM_MAX_GRID_POINTS}")
+    return pairs
+
+def run_sweep(
+    resources: Union[List[Resource], ResourceColumns],
+    simulation_types: Sequence[str] = ("idle_shutdown", "region_migration"),
+    workload_percents: Sequence[float] = (25, 50, 75, 100),
+    shutdown_hours: Sequence[float] = (10,),
+    region_pairs: Optional[Sequence[Tuple[str, str]]] = None,
+    samples: int = 0,
+    hours_uncertainty: float = 0.1,
+    cpu_uncertainty: float = 0.2,
+    seed: Optional[int] = None,
+    percentiles: Sequence[float] = (5, 50, 95),
+    include_samples: bool = False,
+) -> Dict:
+    """
+    Evaluates every combination of workload percent, shutdown hours (for
+    idle_shutdown) and source -> target region (for region_migration) and
+    returns per-scenario distributions of monthly emissions reduction and
+    cost savings. Invalid parameters raise InvalidSweep (see validate_sweep).
+    """
+    started = time.perf_counter()
+    cols = resource_columns(resources)
+    pairs = validate_sweep(
+        cols, simulation_types, workload_percents, shutdown_hours, region_pairs, samples,
+        hours_uncertainty, cpu_uncertainty, percentiles,
+    )
+    grid_points = _grid_points(simulation_types, workload_percents, shutdown_hours, pairs)
+
+    rng = np.random.default_rng(seed) if samples else None
+    fractions = np.asarray(workload_percents, dtype=np.float64) / 100.0
+    scenarios: List[Dict] = []
+
+    if "idle_shutdown" in simulation_types:
+        factors = emission_factors.current()
+        daily_emissions = cols.avg_hours_per_day * row_kg_per_hour(cols, factors)
+        emissions, cost = _sweep_idle_shutdown(
+            cols, daily_emissions, shutdown_shares(cols, shutdown_hours, factors), fractions, samples, rng,
+            hours_uncertainty, cpu_uncertainty
+        )
+        for j, percent in enumerate(workload_percents):
+            for h, hours in enumerate(shutdown_hours):
+                scenarios.append({
+                    "simulation_type": "idle_shutdown",
+                    "workload_percent": percent,
+                    "shutdown_hours": hours,
+                    "emissions_reduction_kg": _summarize(emissions[:, h, j], percentiles, include_samples),
+                    "cost_savings_usd": _summarize(cost[:, j] * (hours / 24), percentiles, include_samples),
+                })
+
+    if "region_migration" in simulation_types:
+        index = region_index_for(cols)
+        for source, target in pairs:
+            emissions, cost = _sweep_region_migration(
+                index, source, target, fractions, samples, rng, hours_uncertainty
+            )
+            for j, percent in enumerate(workload_percents):
+                scenarios.append({
+                    "simulation_type": "region_migration",
+                    "workload_percent": percent,
+                    "source_region": source,
+                    "target_region": target,
+                    "emissions_reduction_kg": _summarize(emissions[:, j], percentiles, include_samples),
+                    "cost_savings_usd": _summarize(cost[:, j], percentiles, include_samples),
+                })
+
+    elapsed = time.perf_counter() - started
+    evaluated = grid_points * max(samples, 1)
+    return {
+        "resource_count": len(cols),
+        "samples": samples,
+        "grid_points": grid_points,
+        "scenario_count": evaluated,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "scenarios_per_second": round(evaluated / elapsed, 1) if elapsed > 0 else None,
+        "scenarios": scenarios,
+    }
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from services.ai_cache import make_key
+
+# Configuration
+DEFAULT_JOBS_PATH = Path(__file__).resolve().parents[1] / "data" / "simulation_jobs.sqlite3"
+SIM_JOBS_PATH = os.getenv("ORBYTE_SIM_JOBS_PATH", str(DEFAULT_JOBS_PATH))  # empty string keeps jobs in memory
+SIM_JOB_WORKERS = int(os.getenv("ORBYTE_SIM_JOB_WORKERS", "2"))  # 0 computes on a thread instead of processes
+SIM_JOB_TTL_SECONDS = float(os.getenv("ORBYTE_SIM_JOB_TTL_SECONDS", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class JobStore:
+    """
+    SQLite table of simulation jobs and their results. Jobs are keyed by a
+    hash of their request so identical submissions can share one job, and
+    expire `ttl` seconds after they were created.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                request TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                owner_pid INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs(key, created_at)")
+
+    def create(self, kind: str, key: str, request: Dict) -> Dict:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, key, kind, request, status, owner_pid, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, kind, json.dumps(request, default=str), QUEUED, os.getpid(), time.time()),
+            )
+        return self.get(job_id)
+
+    def find(self, key: str) -> Optional[Dict]:
+        """Newest unexpired job for `key` that is pending or has a result."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?, ?) AND created_at > ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key, QUEUED, RUNNING, SUCCEEDED, time.time() - self.ttl),
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, request, status, result, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, request, status, result, error, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "request": json.loads(request),
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def transition(self, job_id: str, from_status: Tuple[str, ...], to_status: str,
+                   result: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Moves a job to `to_status` only if it is currently in one of
+        `from_status`, so a job cancelled elsewhere is never overwritten by a
+        late result. Returns whether the job moved.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" for _ in from_status)
+        with self._lock:
+            cursor = self._db.execute(
+                f"""
+                UPDATE jobs SET
+                    status = ?,
+                    result = COALESCE(?, result),
+                    error = COALESCE(?, error),
+                    started_at = CASE WHEN ? = '{RUNNING}' THEN ? ELSE started_at END,
+                    finished_at = CASE WHEN ? = '{RUNNING}' THEN finished_at ELSE ? END
+                WHERE id = ? AND status IN ({placeholders})
+                """,
+                (
+                    to_status,
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    to_status, now,
+                    to_status, now,
+                    job_id, *from_status,
+                ),
+            )
+            return cursor.rowcount > 0
+
+    def fail_orphans(self) -> int:
+        """Fails pending jobs whose owning process has exited (e.g. a restart)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        orphans = [job_id for job_id, pid in rows if not _pid_alive(pid)]
+        for job_id in orphans:
+            self.transition(job_id, (QUEUED, RUNNING), FAILED, error="Interrupted by a server restart")
+        return len(orphans)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE created_at <= ? AND status NOT IN (?, ?)",
+                (time.time() - self.ttl, QUEUED, RUNNING),
+            ).rowcount
+
+class JobQueue:
+    """
+    Runs simulation jobs as background tasks on the API's event loop, at
+    most `workers` at a time. Numeric work goes through `compute`, which uses
+    a process pool so long sweeps never hold the GIL of an API worker; with
+    0 workers it falls back to a thread. Cancelling a job that is still
+    queued drops it; a computation already running in a worker process
+    finishes but its result is discarded.
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._counters = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "cancelled": 0}
+        self.store.fail_orphans()
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: the API process has client threads running
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    async def compute(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs a picklable module-level function in the worker pool."""
+        pool = self._get_pool()
+        if pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    def submit(self, kind: str, request: Dict, run: Callable[[], Awaitable[Any]],
+               data_version: Optional[str] = None) -> Tuple[Dict, bool]:
+        """
+        Returns (job, deduplicated). An unexpired job for the same kind,
+        request and `data_version` (identifying the inputs `run` computes on)
+        that is pending or succeeded is returned instead of starting a new one.
+        """
+        key = make_key("simulation_job", kind, request, data_version)
+        existing = self.store.find(key)
+        if existing is not None:
+            self._counters["deduplicated"] += 1
+            return existing, True
+
+        self.store.purge_expired()
+        job = self.store.create(kind, key, request)
+        self._counters["submitted"] += 1
+        task = asyncio.create_task(self._execute(job["job_id"], run))
+        self._tasks[job["job_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+        return job, False
+
+    async def _execute(self, job_id: str, run: Callable[[], Awaitable[Any]]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.workers))
+        async with self._semaphore:
+            if not self.store.transition(job_id, (QUEUED,), RUNNING):
+                return  # cancelled while queued
+            try:
+                result = await run()
+            except asyncio.CancelledError:
+                self.store.transition(job_id, (QUEUED, RUNNING), CANCELLED)
+                raise
+            except Exception as e:
+                print(f"[Orbyte] Simulation job {job_id} failed: {e}")
+                if self.store.transition(job_id, (RUNNING,), FAILED, error=str(e) or type(e).__name__):
+                    self._counters["failed"] += 1
+                return
+            if self.store.transition(job_id, (RUNNING,), SUCCEEDED, result=result):
+                self._counters["succeeded"] += 1
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancels a pending job. Returns the job (unchanged if already finished) or None if unknown."""
+        if self.store.transition(job_id, (QUEUED, RUNNING), CANCELLED):
+            self._counters["cancelled"] += 1
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        return self.store.get(job_id)
+
+    def stats(self) -> Dict:
+        return {**self._counters, "active": len(self._tasks), "workers": self.workers}
+
+    def shutdown(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+queue = JobQueue(JobStore(SIM_JOBS_PATH, SIM_JOB_TTL_SECONDS), SIM_JOB_WORKERS)
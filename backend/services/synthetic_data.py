@@ -0,0 +1,121 @@
+import functools
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+import numpy as np
+
+from models.schemas import ControlSeverity, ControlStatus
+from models.records import ControlRecord, ResourceRecord
+from services import emission_factors
+
+# Seeded synthetic fleets for benchmarks and load tests. The same (count, seed)
+# always produces the same rows for a given emission factors version. Regions
+# and machine types are sampled from the emission factor registry, so every
+# generated row has known factors. Distributions are loosely modelled on a
+# mid-size GCP estate: a few regions hold most of the fleet, most VMs are
+# small and always on, a tail of large machines dominates cost, and around a
+# tenth of the fleet is idle.
+
+REGION_SKEW = 1.0  # region weights fall off as 1 / rank**REGION_SKEW in registry order
+MACHINE_SIZE_SKEW = 1.0  # machine type weights fall off as 1 / power_kw**MACHINE_SIZE_SKEW
+USD_PER_KW_DAY = 24.0  # on-demand daily cost in us-central1 per kW of machine power
+
+RESOURCE_TYPE_WEIGHTS = {"vm": 0.80, "db": 0.15, "bucket": 0.05}
+ENVIRONMENTS = ["prod", "staging", "dev", "test"]
+ENVIRONMENT_WEIGHTS = [0.45, 0.20, 0.25, 0.10]
+ROLES = ["web", "api", "worker", "batch", "db", "cache"]
+
+IDLE_SHARE = 0.12  # resources with near-zero CPU that have not been active for days
+ALWAYS_ON_SHARE = 0.70
+
+# framework -> (weight, control id prefixes)
+FRAMEWORKS = {
+    "NIST 800-53": (0.40, ["AC", "AU", "CM", "IA", "SC", "SI"]),
+    "SOC 2": (0.30, ["CC"]),
+    "ISO 27001": (0.20, ["A.5", "A.8", "A.12"]),
+    "CIS": (0.10, ["CIS"]),
+}
+SEVERITY_WEIGHTS = {
+    ControlSeverity.CRITICAL: 0.10,
+    ControlSeverity.HIGH: 0.30,
+    ControlSeverity.MEDIUM: 0.40,
+    ControlSeverity.LOW: 0.20,
+}
+STATUS_WEIGHTS = {ControlStatus.PASS: 0.70, ControlStatus.FAIL: 0.12, ControlStatus.AT_RISK: 0.18}
+
+def _choice(rng: np.random.Generator, weights: dict, count: int) -> Tuple[list, np.ndarray]:
+    keys = list(weights)
+    p = np.array([w[0] if isinstance(w, tuple) else w for w in weights.values()], dtype=float)
+    return keys, rng.choice(len(keys), size=count, p=p / p.sum())
+
+def generate_resources(count: int, seed: int = 0) -> List[ResourceRecord]:
+    rng = np.random.default_rng(seed)
+    factors = emission_factors.current()
+    regions, region_idx = _choice(rng, {
+        region: 1.0 / (rank + 1) ** REGION_SKEW for rank, region in enumerate(factors.grid_intensity)
+    }, count)
+    instances, instance_idx = _choice(rng, {
+        name: power ** -MACHINE_SIZE_SKEW for name, power in factors.instance_power_kw.items() if power > 0
+    }, count)
+    types, type_idx = _choice(rng, RESOURCE_TYPE_WEIGHTS, count)
+    env_idx = rng.choice(len(ENVIRONMENTS), size=count, p=ENVIRONMENT_WEIGHTS)
+    role_idx = rng.integers(0, len(ROLES), size=count)
+
+    idle = rng.random(count) < IDLE_SHARE
+    cpu = np.where(idle, rng.uniform(0.0, 0.05, count), rng.beta(2.0, 5.0, count))
+    hours = np.where(rng.random(count) < ALWAYS_ON_SHARE, 24.0, np.round(rng.uniform(4.0, 16.0, count), 1))
+    last_active = np.where(idle, rng.integers(4, 60, count), rng.geometric(0.7, count) - 1)
+
+    base_cost = np.array([factors.instance_power_kw[name] * USD_PER_KW_DAY for name in instances])[instance_idx]
+    price = np.array([factors.price(name) for name in regions])[region_idx]
+    cost = np.round(base_cost * price * (hours / 24.0) * rng.lognormal(0.0, 0.15, count), 2)
+
+    now = datetime.now()
+    return [
+        ResourceRecord(
+            id=f"res-{i:07d}",
+            name=f"{ENVIRONMENTS[env_idx[i]]}-{ROLES[role_idx[i]]}-{i:07d}",
+            type=types[type_idx[i]],
+            region=regions[region_idx[i]],
+            instance_type=instances[instance_idx[i]],
+            avg_cpu_7d=round(float(cpu[i]), 4),
+            avg_hours_per_day=float(hours[i]),
+            last_active_days_ago=int(last_active[i]),
+            last_active_at=now - timedelta(days=int(last_active[i])),
+            daily_cost_usd=float(cost[i]),
+        )
+        for i in range(count)
+    ]
+
+def generate_controls(count: int, seed: int = 0) -> List[ControlRecord]:
+    rng = np.random.default_rng(seed)
+    frameworks, framework_idx = _choice(rng, FRAMEWORKS, count)
+    severities, severity_idx = _choice(rng, SEVERITY_WEIGHTS, count)
+    statuses, status_idx = _choice(rng, STATUS_WEIGHTS, count)
+    evidence = rng.poisson(4.0, count)
+    family_pick = rng.integers(0, 1 << 30, count)
+
+    controls = []
+    for i in range(count):
+        framework = frameworks[framework_idx[i]]
+        families = FRAMEWORKS[framework][1]
+        family = families[family_pick[i] % len(families)]
+        controls.append(ControlRecord(
+            id=f"{family}-{i + 1}",
+            name=f"{framework} control {i + 1}",
+            framework=framework,
+            severity=severities[severity_idx[i]],
+            status=statuses[status_idx[i]],
+            evidence_count=int(evidence[i]),
+            description=f"Synthetic {severities[severity_idx[i]].value} severity control in the {family} family.",
+        ))
+    return controls
+
+@functools.lru_cache(maxsize=4)
+def cached_resources(count: int, seed: int = 0) -> List[ResourceRecord]:
+    """generate_resources, kept so repeated calls return the same snapshot like the BigQuery cache does."""
+    return generate_resources(count, seed)
+
+@functools.lru_cache(maxsize=4)
+def cached_controls(count: int, seed: int = 0) -> List[ControlRecord]:
+    return generate_controls(count, seed)
@@ -0,0 +1,110 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+
+# Requests at least this slow are logged as one JSON line with their per-stage
+# timings; 0 logs every request, a negative value disables request logs
+SLOW_REQUEST_MS = float(os.getenv("ORBYTE_SLOW_REQUEST_MS", "1000"))
+
+# Sub-millisecond buckets for in-process stages, up to a minute for model calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "orbyte_stage_duration_seconds",
+    "Time spent in one stage of serving a request (query, row mapping, aggregation, model call, serialization)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "orbyte_http_request_duration_seconds",
+    "Time until the response starts, per route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Stage totals of the request being served: {stage: [count, seconds]}
+_request_stages: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar("request_stages", default=None)
+
+def observe(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        totals = stages.setdefault(stage, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Times the block as `stage`, whether it returns or raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator form of span, for plain and async functions."""
+    def decorate(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class InstrumentedModule:
+    """
+    Proxy for a module whose public functions are timed as
+    "<prefix>.<function name>"; everything else is passed through unchanged.
+    """
+
+    def __init__(self, module: Any, prefix: str):
+        self._module = module
+        self._prefix = prefix
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._module, name)
+        if name.startswith("_") or isinstance(value, type) or not callable(value):
+            return value
+        wrapped = timed(f"{self._prefix}.{name}")(value)
+        setattr(self, name, wrapped)
+        return wrapped
+
+def start_request() -> contextvars.Token:
+    return _request_stages.set({})
+
+def finish_request(token: contextvars.Token, method: str, route: str, path: str, status: int, seconds: float):
+    """Records the request latency and logs it with its stage breakdown when slow."""
+    stages = _request_stages.get() or {}
+    _request_stages.reset(token)
+    REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+    if SLOW_REQUEST_MS < 0 or seconds * 1000 < SLOW_REQUEST_MS:
+        return
+    print(json.dumps({
+        "event": "request",
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": status,
+        "duration_ms": round(seconds * 1000, 2),
+        "stages": {
+            stage: {"count": count, "ms": round(total * 1000, 2)}
+            for stage, (count, total) in sorted(stages.items(), key=lambda item: -item[1][1])
+        },
+    }))
@@ -0,0 +1,44 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the backend the way main.py does (`from services import ...`)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Keep imports offline and side-effect free: no credentials, no files under data/
+os.environ.setdefault("ORBYTE_USE_MOCK_DATA", "true")
+os.environ.setdefault("ORBYTE_USE_MOCK_AI", "true")
+os.environ.setdefault("ORBYTE_WARMUP", "false")
+os.environ.setdefault("ORBYTE_HISTORY_PATH", "")
+os.environ.setdefault("ORBYTE_HISTORY_INTERVAL_SECONDS", "0")
+os.environ.setdefault("ORBYTE_SIM_JOBS_PATH", "")
+os.environ.setdefault("ORBYTE_AI_CACHE_PATH", "")
+
+class FakeClock:
+    """Stands in for a module's `time`: the clock only moves when advanced."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Installs one FakeClock as `time` in the given modules and returns it."""
+    clock = FakeClock()
+
+    def install(*modules) -> FakeClock:
+        for module in modules:
+            monkeypatch.setattr(module, "time", clock)
+        return clock
+
+    return install
@@ -0,0 +1,54 @@
+import asyncio
+import sqlite3
+
+from services import ai_cache
+from services.ai_cache import TieredCache
+
+def disk_rows(path: str) -> int:
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+def test_disk_tier_is_trimmed_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TieredCache(path, 60, memory_entries=10, disk_entries=100)
+    counts = []
+    real_evict = cache._evict_disk
+    monkeypatch.setattr(cache, "_evict_disk", lambda: (counts.append(1), real_evict()))
+
+    for i in range(1000):
+        cache.put(f"k{i}", {"i": i})
+        assert disk_rows(path) <= 100
+    # A COUNT(*) per 10% of the limit, not per put
+    assert len(counts) <= 1000 // (100 * (1 - ai_cache.DISK_EVICT_LOW_WATER)) + 1
+    # Least recently used entries went first; the newest are still on disk
+    assert TieredCache(path, 60, 10, 100).get("k999") == {"i": 999}
+    assert TieredCache(path, 60, 10, 100).get("k0") is None
+
+def test_replacing_keys_does_not_evict(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TieredCache(path, 60, memory_entries=10, disk_entries=50)
+    for i in range(50):
+        cache.put(f"k{i}", i)
+    for _ in range(10):
+        for i in range(50):
+            cache.put(f"k{i}", i + 1)
+    # The running count overshoots on replacements; the recount finds nothing to evict
+    assert disk_rows(path) == 50
+    assert all(cache.get(f"k{i}") == i + 1 for i in range(50))
+
+def test_async_access_matches_sync(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TieredCache(path, 60, memory_entries=1, disk_entries=100)
+
+    async def scenario():
+        await cache.put_async("a", {"v": 1}, tag="t")
+        await cache.put_async("b", {"v": 2})  # pushes "a" out of memory
+        assert await cache.get_async("a") == {"v": 1}  # from disk
+        assert await cache.get_async("a") == {"v": 1}  # from memory again
+        assert await cache.get_async("missing") is None
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"], stats["disk_size"]) == (1, 1, 1, 2)
+    assert cache.invalidate(tag="t") == 1
+    assert cache.get("a") is None
@@ -0,0 +1,24 @@
+import asyncio
+
+from services import ai_reasoning
+
+ARGS = ("region_migration", {"workload_percent": 40, "target_region": "europe-north1"}, 123.0, 45.0)
+
+def test_interrupted_stream_reports_error_and_is_not_cached(monkeypatch):
+    def broken_model_text(prompt):
+        yield "The first half of a narrative"
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(ai_reasoning, "_use_mock", lambda: False)
+    monkeypatch.setattr(ai_reasoning, "_iter_model_text", broken_model_text)
+
+    async def scenario():
+        items = [item async for item in ai_reasoning.stream_scenario_narrative(*ARGS)]
+        assert items[0] == "The first half of a narrative"
+        assert isinstance(items[-1], ai_reasoning.StreamError)
+        assert "connection reset" in items[-1].detail
+        assert not any(isinstance(item, dict) for item in items)
+        key = ai_reasoning.scenario_narrative_key(*ARGS)
+        assert await ai_reasoning.narrative_cache.get_async(key) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from google.api_core.exceptions import ResourceExhausted
+
+from services import ai_reasoning, batch_analysis, control_query, executors, mock_data, synthetic_data
+from services.fake_model import FakeGenerativeModel
+
+class ThrottledModel(FakeGenerativeModel):
+    """Fake model that rejects every third call with a 429 and records peak concurrency."""
+
+    def __init__(self):
+        super().__init__(latency=0.05, jitter=0, rate_limit_probability=0, seed=0)
+        self.requests = self.throttled = self.in_flight = self.peak = 0
+        self._count_lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        with self._count_lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            throttle = self.requests % 3 == 0
+            self.throttled += throttle
+        try:
+            if throttle:
+                raise ResourceExhausted("Quota exceeded (fake model)")
+            return super().generate_content(prompt, stream)
+        finally:
+            with self._count_lock:
+                self.in_flight -= 1
+
+def test_batch_respects_concurrency_and_retries_429s(monkeypatch):
+    model = ThrottledModel()
+    monkeypatch.setattr(ai_reasoning, "_use_mock", lambda: False)
+    monkeypatch.setattr(ai_reasoning, "get_model", lambda: model)
+    monkeypatch.setattr(ai_reasoning, "VERTEX_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(executors, "vertex_rate_limiter", executors.RateLimiter(0))
+    controls = synthetic_data.generate_controls(12, seed=9)
+
+    async def scenario():
+        return [item async for item in batch_analysis.run_batch(controls, lambda c: [], concurrency=3)]
+
+    items = asyncio.run(scenario())
+    summary = items[-1]
+    assert summary["done"] and summary["concurrency"] == 3
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (12, 12, 0)
+    assert {item["control_id"] for item in items[:-1]} == {c.id for c in controls}
+    assert model.throttled > 0 and model.calls == len(controls)
+    assert model.peak == 3
+
+def test_select_batch_reports_ids_outside_the_framework():
+    index = control_query.ControlIndex(mock_data.get_mock_controls())
+    selected, errors = control_query.select_batch(index, "SOC 2", ["CC-6", "AC-2", "XX-1"])
+    assert [c.id for c in selected] == ["CC-6"]
+    assert list(errors) == ["AC-2", "XX-1"]
+    assert "NIST 800-53" in errors["AC-2"] and errors["XX-1"] == "Control not found"
+
+    selected, errors = control_query.select_batch(index, None, ["AC-2", "CC-7"])
+    assert sorted(c.id for c in selected) == ["AC-2", "CC-7"] and errors == {}
@@ -0,0 +1,31 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from models.schemas import ControlSeverity, ControlStatus
+from services import bigquery_service, metrics_engine
+
+def test_resource_rows_are_coerced():
+    rows = [
+        SimpleNamespace(resource_id="vm-1", name="web", type="compute", region="us-central1", instance_type="e2-standard-4",
+                        avg_cpu_7d=Decimal("0.01"), avg_hours_per_day=Decimal("24"), last_active_days_ago=Decimal("5"),
+                        daily_cost_usd=Decimal("4.10")),
+        SimpleNamespace(resource_id="vm-2", name=None, type=None, region=None, instance_type=None,
+                        avg_cpu_7d=None, avg_hours_per_day=None, last_active_days_ago=None, daily_cost_usd=None),
+    ]
+    first, second = bigquery_service._map_resources(rows)
+    assert (first.avg_cpu_7d, first.avg_hours_per_day, first.last_active_days_ago, first.daily_cost_usd) == (0.01, 24.0, 5, 4.1)
+    assert type(first.avg_cpu_7d) is float and type(first.last_active_days_ago) is int
+    assert (second.region, second.avg_hours_per_day, second.last_active_days_ago, second.daily_cost_usd) == ("", 0.0, 0, 0.0)
+    metrics = metrics_engine.compute_sustainability_metrics([first, second])
+    assert isinstance(metrics["total_monthly_emissions_kg"], float)
+    assert metrics["idle_resources"] == [first]
+
+def test_control_rows_are_coerced():
+    rows = [SimpleNamespace(control_id="c-1", name=None, framework=None, severity=None, status="PASS",
+                            evidence_count=Decimal("3"), description=None),
+            SimpleNamespace(control_id="c-2", name="x", framework="SOC2", severity="high", status=None,
+                            evidence_count=None, description="d")]
+    first, second = bigquery_service._map_controls(rows)
+    assert (first.name, first.framework, first.severity, first.status, first.evidence_count) == (
+        "", "", ControlSeverity.LOW, ControlStatus.PASS, 3)
+    assert (second.severity, second.status, second.evidence_count) == (ControlSeverity.HIGH, ControlStatus.AT_RISK, 0)
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from services import bigquery_service, metrics_engine
+from services.fake_bigquery import FakeBigQueryClient
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeBigQueryClient(resources=2000, controls=10, latency=0, seed=11)
+    monkeypatch.setattr(bigquery_service, "get_client", lambda: client)
+    return client
+
+def test_region_totals_sql_matches_metrics_engine(client):
+    resources = bigquery_service.get_resources_from_bq()
+    expected = metrics_engine.compute_sustainability_metrics(resources)
+    totals = bigquery_service.get_region_totals_from_bq()
+    actual = metrics_engine.compute_sustainability_metrics_from_region_totals(
+        totals, bigquery_service.get_idle_resources_from_bq()
+    )
+
+    for key in ("total_monthly_emissions_kg", "potential_monthly_emissions_savings_kg",
+                "potential_monthly_cost_savings_usd", "sustainability_score"):
+        assert actual[key] == pytest.approx(expected[key])
+    assert sorted(r.id for r in actual["idle_resources"]) == sorted(r.id for r in expected["idle_resources"])
+    assert sum(row["resource_count"] for row in totals) == len(resources)
+
+    # Same per-region values, but ordered by region name rather than first appearance
+    by_region = {row["region"]: row["emissions_kg"] for row in expected["emissions_by_region"]}
+    regions = [row["region"] for row in actual["emissions_by_region"]]
+    assert regions == sorted(by_region)
+    for row in actual["emissions_by_region"]:
+        assert row["emissions_kg"] == pytest.approx(by_region[row["region"]])
+
+def resources_replica(full_every: float = 3600) -> bigquery_service.TableReplica:
+    template = bigquery_service.resources_replicas[bigquery_service.SOURCES[0].name]
+    return bigquery_service.TableReplica(
+        "resources", template.view, template.tombstones, template.key, template.columns,
+        bigquery_service._map_resources, 300, full_every, template.source,
+    )
+
+def view_rows() -> dict:
+    return {record.id: record for record in bigquery_service.get_resources_from_bq()}
+
+def test_replica_follows_churn_with_delta_syncs(client):
+    replica = resources_replica()
+    rows = replica.sync()
+    assert {record.id: record for record in rows} == view_rows()
+    full_billed = replica.stats()["last_bytes_billed"]
+
+    now = time.time()
+    for step in range(1, 4):
+        changes = client.churn(0.05, at=now + step * 600)
+        assert changes["updated"] and changes["deleted"] and changes["added"]
+        rows = replica.sync()
+        assert {record.id: record for record in rows} == view_rows()
+        assert 0 < replica.stats()["last_bytes_billed"] < full_billed
+
+    stats = replica.stats()
+    assert (stats["full_syncs"], stats["delta_syncs"]) == (1, 3)
+    assert stats["rows_deleted"] > 0 and stats["rows_upserted"] > 0
+
+def test_replica_applies_tombstones_and_keeps_snapshot_identity(client):
+    replica = resources_replica()
+    rows = replica.sync()
+    assert replica.sync() is rows  # nothing changed: same list object
+
+    gone = rows[0].id
+    client.delete_resources([gone], at=time.time() + 600)
+    rows = replica.sync()
+    assert gone not in {record.id for record in rows}
+    assert {record.id: record for record in rows} == view_rows()
+    assert replica.stats()["rows_deleted"] == 1
+
+class Loader:
+    """SnapshotCache loader returning numbered snapshots, optionally gated or failing."""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.error = None
+
+    def __call__(self) -> list:
+        self.calls += 1
+        self.gate.wait(5)
+        if self.error:
+            raise self.error
+        return [f"snapshot-{self.calls}"]
+
+def snapshot_cache(loader, **kwargs) -> bigquery_service.SnapshotCache:
+    return bigquery_service.SnapshotCache("test", loader, ttl=60, max_stale=600, negative_ttl=5, **kwargs)
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+def test_snapshot_served_until_ttl_then_reloaded(fake_clock):
+    clock = fake_clock(bigquery_service)
+    loader = Loader()
+    cache = snapshot_cache(loader)
+    assert cache.get() == ["snapshot-1"]
+    clock.advance(59)
+    assert cache.get() == ["snapshot-1"] and loader.calls == 1
+
+    # Past ttl + max_stale the snapshot is unusable and callers block on a reload
+    clock.advance(700)
+    assert cache.get() == ["snapshot-2"] and loader.calls == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_stale_snapshot_is_served_while_revalidating(fake_clock):
+    clock = fake_clock(bigquery_service)
+    loader = Loader()
+    cache = snapshot_cache(loader)
+    cache.get()
+    clock.advance(120)
+    loader.gate.clear()
+    assert cache.get() == ["snapshot-1"]  # returned without waiting for the refresh
+    assert cache.get() == ["snapshot-1"] and cache.stats()["refresh_in_flight"]
+    loader.gate.set()
+    wait_for(lambda: not cache.stats()["refresh_in_flight"])
+    assert cache.get() == ["snapshot-2"]
+    assert loader.calls == 2 and cache.stats()["stale_hits"] == 2
+
+def test_concurrent_misses_share_one_load():
+    loader = Loader()
+    loader.gate.clear()
+    cache = snapshot_cache(loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: cache.stats()["coalesced"] == 4)
+    loader.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [["snapshot-1"]] * 5 and loader.calls == 1
+
+def test_failed_load_is_negatively_cached(fake_clock):
+    clock = fake_clock(bigquery_service)
+    loader = Loader()
+    loader.error = RuntimeError("backend down")
+    cache = snapshot_cache(loader)
+    assert cache.get() == [] and cache.get() == [] and cache.get(block=False) == []
+    assert loader.calls == 1 and cache.stats()["negative_hits"] == 2
+
+    clock.advance(5)
+    loader.error = None
+    assert cache.get() == ["snapshot-2"] and loader.calls == 2
+    assert not cache.stats()["negative_cached"]
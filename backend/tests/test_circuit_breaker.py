@@ -0,0 +1,61 @@
+import pytest
+
+from services import bigquery_service, circuit_breaker
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(circuit_breaker)
+
+def fail():
+    raise RuntimeError("backend down")
+
+def test_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=5, max_reset_timeout=15)
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.state == circuit_breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+
+    # After the reset timeout one trial call goes through; its failure doubles the timeout
+    clock.advance(5)
+    assert breaker.allow() and breaker.state == circuit_breaker.HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == circuit_breaker.OPEN
+    clock.advance(5)
+    assert not breaker.allow()
+    clock.advance(5)
+    assert breaker.call(lambda: "up") == "up"
+    assert breaker.state == circuit_breaker.CLOSED
+
+    stats = breaker.stats()
+    assert (stats["opened"], stats["failures"], stats["consecutive_failures"]) == (2, 4, 0)
+    assert stats["rejected"] == 3
+
+def test_open_breaker_falls_back_without_querying(clock, monkeypatch):
+    queries = []
+
+    class DownClient:
+        def query(self, query, job_config=None):
+            queries.append(query)
+            raise RuntimeError("backend down")
+
+    monkeypatch.setattr(bigquery_service, "get_client", DownClient)
+    breaker = CircuitBreaker("bigquery:test", failure_threshold=2, reset_timeout=5, max_reset_timeout=15)
+    source = bigquery_service.Source("test", "fake", "orbyte", 1, breaker)
+
+    # Failures and open-circuit rejections both fall back to an empty result
+    assert [bigquery_service.get_controls_from_bq(source) for _ in range(4)] == [[]] * 4
+    assert len(queries) == 2 and breaker.stats()["rejected"] == 2
+    clock.advance(5)
+    assert bigquery_service.get_controls_from_bq(source) == []
+    assert len(queries) == 3 and breaker.state == circuit_breaker.OPEN
+
+def test_cache_stats_report_every_source_breaker():
+    breakers = bigquery_service.get_cache_stats()["circuit_breakers"]
+    assert list(breakers) == [source.breaker.name for source in bigquery_service.SOURCES]
+    assert all(stats["state"] in (circuit_breaker.CLOSED, circuit_breaker.OPEN, circuit_breaker.HALF_OPEN)
+               for stats in breakers.values())
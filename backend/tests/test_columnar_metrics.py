@@ -0,0 +1,99 @@
+import dataclasses
+import math
+from decimal import Decimal
+
+import pyarrow
+import pytest
+
+from services import columnar_metrics, metrics_engine, synthetic_data
+from services.columnar_metrics import ControlColumns, ResourceColumns, sum_tolerance
+
+FLOAT_FIELDS = (
+    "total_monthly_emissions_kg",
+    "potential_monthly_emissions_savings_kg",
+    "potential_monthly_cost_savings_usd",
+    "sustainability_score",
+)
+RESOURCE_FIELDS = ("id", "name", "type", "region", "instance_type", "avg_cpu_7d", "avg_hours_per_day",
+                   "last_active_days_ago", "daily_cost_usd")
+
+# Same columns and types as resources_view / controls_view
+RESOURCES_SCHEMA = pyarrow.schema([
+    ("resource_id", pyarrow.string()), ("name", pyarrow.string()), ("type", pyarrow.string()),
+    ("region", pyarrow.string()), ("instance_type", pyarrow.string()), ("avg_cpu_7d", pyarrow.float64()),
+    ("avg_hours_per_day", pyarrow.float64()), ("last_active_days_ago", pyarrow.int64()),
+    ("daily_cost_usd", pyarrow.float64()),
+])
+CONTROLS_SCHEMA = pyarrow.schema([
+    ("control_id", pyarrow.string()), ("framework", pyarrow.string()), ("severity", pyarrow.string()),
+    ("status", pyarrow.string()),
+])
+
+def resources_table(resources) -> "pyarrow.Table":
+    return pyarrow.Table.from_pylist([
+        {"resource_id" if field == "id" else field: getattr(r, field) for field in RESOURCE_FIELDS}
+        for r in resources
+    ], schema=RESOURCES_SCHEMA)
+
+def controls_table(controls) -> "pyarrow.Table":
+    return pyarrow.Table.from_pylist([
+        {"control_id": c.id, "framework": c.framework, "severity": c.severity.value, "status": c.status.value}
+        for c in controls
+    ], schema=CONTROLS_SCHEMA)
+
+def fleet(size: int) -> list:
+    resources = list(synthetic_data.generate_resources(size, seed=5))
+    # An unknown region and machine type exercise the default factors
+    resources[1] = dataclasses.replace(resources[1], region="mars-north1", instance_type="x9-custom-7")
+    return resources
+
+@pytest.fixture(params=["from_resources", "from_arrow"])
+def build(request):
+    if request.param == "from_resources":
+        return ResourceColumns.from_resources
+    return lambda resources: ResourceColumns.from_arrow(resources_table(resources))
+
+@pytest.mark.parametrize("size", [0, 1, 1000, 50000])
+def test_sustainability_matches_batch(build, size):
+    resources = fleet(size) if size > 1 else list(synthetic_data.generate_resources(size))
+    expected = metrics_engine.compute_sustainability_metrics(resources)
+    actual = columnar_metrics.compute_sustainability_metrics(build(resources))
+    tolerance = sum_tolerance(len(resources))
+
+    for field in FLOAT_FIELDS:
+        assert math.isclose(actual[field], expected[field], rel_tol=tolerance, abs_tol=1e-9), field
+    assert [e["region"] for e in actual["emissions_by_region"]] == [e["region"] for e in expected["emissions_by_region"]]
+    for got, want in zip(actual["emissions_by_region"], expected["emissions_by_region"]):
+        assert math.isclose(got["emissions_kg"], want["emissions_kg"], rel_tol=tolerance, abs_tol=1e-9)
+    assert [[getattr(r, f) for f in RESOURCE_FIELDS] for r in actual["idle_resources"]] == [
+        [getattr(r, f) for f in RESOURCE_FIELDS] for r in expected["idle_resources"]
+    ]
+
+def test_per_row_emissions_are_identical(build):
+    resources = fleet(2000)
+    monthly = columnar_metrics.compute_monthly_emissions(build(resources))
+    assert monthly.tolist() == [metrics_engine.estimate_daily_emissions_kg(r) * 30 for r in resources]
+
+@pytest.mark.parametrize("columns", ["from_controls", "from_arrow"])
+@pytest.mark.parametrize("size", [0, 1, 5000])
+def test_compliance_matches_batch(columns, size):
+    controls = list(synthetic_data.generate_controls(size, seed=9))
+    cols = ControlColumns.from_controls(controls) if columns == "from_controls" else ControlColumns.from_arrow(controls_table(controls))
+    assert list(columnar_metrics.compute_framework_compliance(cols).items()) == list(
+        metrics_engine.compute_framework_compliance(controls).items()
+    )
+    assert columnar_metrics.compute_overall_compliance_score(cols) == metrics_engine.compute_overall_compliance_score(controls)
+    assert columnar_metrics.get_open_risks(cols) == metrics_engine.get_open_risks(controls)
+
+def test_arrow_nulls_and_decimals_are_coerced():
+    table = pyarrow.Table.from_pylist([
+        {"resource_id": "a", "name": "a", "type": "vm", "region": "us-central1", "instance_type": "e2-standard-4",
+         "avg_cpu_7d": None, "avg_hours_per_day": Decimal("12.5"), "last_active_days_ago": None,
+         "daily_cost_usd": Decimal("3.25")},
+    ], schema=RESOURCES_SCHEMA.set(8, pyarrow.field("daily_cost_usd", pyarrow.decimal128(12, 2)))
+              .set(6, pyarrow.field("avg_hours_per_day", pyarrow.decimal128(12, 2))))
+    cols = ResourceColumns.from_arrow(table)
+    assert cols.avg_cpu_7d.tolist() == [0.0]
+    assert cols.avg_hours_per_day.tolist() == [12.5]
+    assert cols.last_active_days_ago.tolist() == [0]
+    assert cols.daily_cost_usd.tolist() == [3.25]
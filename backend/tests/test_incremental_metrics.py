@@ -0,0 +1,139 @@
+import dataclasses
+import math
+import random
+import sys
+
+from models.records import ResourceRecord
+from services import incremental_metrics, metrics_engine, synthetic_data
+from services.metrics_engine import estimate_daily_emissions_kg
+
+FLOAT_FIELDS = ("total_monthly_emissions_kg", "potential_monthly_emissions_savings_kg", "potential_monthly_cost_savings_usd")
+
+def assert_matches_batch(actual: dict, rows: list):
+    expected = metrics_engine.compute_sustainability_metrics(rows)
+    # The batch loops sum left to right, whose error is bounded by n * eps of the
+    # total; the aggregator returns the correctly rounded sum
+    tolerance = max(len(rows), 1) * sys.float_info.epsilon
+    for field in FLOAT_FIELDS + ("sustainability_score",):
+        assert math.isclose(actual[field], expected[field], rel_tol=tolerance, abs_tol=1e-9), field
+    assert [e["region"] for e in actual["emissions_by_region"]] == [e["region"] for e in expected["emissions_by_region"]]
+    for got, want in zip(actual["emissions_by_region"], expected["emissions_by_region"]):
+        assert math.isclose(got["emissions_kg"], want["emissions_kg"], rel_tol=tolerance, abs_tol=1e-9)
+    assert [id(r) for r in actual["idle_resources"]] == [id(r) for r in expected["idle_resources"]]
+
+def assert_exact_sums(actual: dict, rows: list):
+    # No drift: totals equal the correctly rounded sum of the current rows
+    monthly = [estimate_daily_emissions_kg(r) * 30 for r in rows]
+    assert actual["total_monthly_emissions_kg"] == math.fsum(monthly)
+    assert actual["potential_monthly_emissions_savings_kg"] == math.fsum(
+        m for m, r in zip(monthly, rows) if incremental_metrics._is_idle(r)
+    )
+
+def mutate(rng: random.Random, r: ResourceRecord) -> ResourceRecord:
+    return dataclasses.replace(
+        r,
+        avg_cpu_7d=rng.choice([0.01, round(rng.random(), 4)]),
+        avg_hours_per_day=round(rng.uniform(1.0, 24.0), 1),
+        last_active_days_ago=rng.randint(0, 10),
+        daily_cost_usd=round(r.daily_cost_usd * rng.uniform(0.5, 2.0), 2),
+        region=rng.choice([r.region, "us-central1", "europe-north1", "asia-south1"]),
+    )
+
+def upserted(rows: list, new) -> list:
+    # upsert() semantics: the id's first row is replaced in place and its duplicates dropped
+    result, placed = [], False
+    for x in rows:
+        if x.id != new.id:
+            result.append(x)
+        elif not placed:
+            result.append(new)
+            placed = True
+    return result
+
+def test_random_deltas_match_batch():
+    rng = random.Random(7)
+    rows = list(synthetic_data.generate_resources(3000, seed=3))
+    aggregator = incremental_metrics.SustainabilityAggregator()
+    aggregator.sync(rows)
+    serial = 0
+
+    for step in range(200):
+        kind = rng.random()
+        if kind < 0.5:
+            # Point updates through upsert/delete, mirrored on the reference list
+            for _ in range(rng.randint(1, 20)):
+                op = rng.random()
+                if op < 0.6 and rows:
+                    i = rng.randrange(len(rows))
+                    new = mutate(rng, rows[i])
+                    rows = upserted(rows, new)
+                    aggregator.upsert(new)
+                elif op < 0.8 and rows:
+                    victim = rng.choice(rows).id
+                    rows = [x for x in rows if x.id != victim]
+                    aggregator.delete(victim)
+                else:
+                    serial += 1
+                    new = mutate(rng, dataclasses.replace(rng.choice(rows), id=f"new-{serial}"))
+                    rows.append(new)
+                    aggregator.upsert(new)
+        else:
+            # A new snapshot: updates, deletes, inserts, reordering and duplicate ids
+            rows = list(rows)
+            for _ in range(rng.randint(1, 50)):
+                i = rng.randrange(len(rows))
+                rows[i] = mutate(rng, rows[i])
+            for _ in range(rng.randint(0, 10)):
+                rows.pop(rng.randrange(len(rows)))
+            for _ in range(rng.randint(0, 10)):
+                serial += 1
+                rows.insert(rng.randrange(len(rows) + 1), mutate(rng, dataclasses.replace(rng.choice(rows), id=f"new-{serial}")))
+            if rng.random() < 0.3:
+                rows.append(mutate(rng, rng.choice(rows)))
+            if rng.random() < 0.2:
+                i, j = rng.randrange(len(rows)), rng.randrange(len(rows))
+                rows[i], rows[j] = rows[j], rows[i]
+            aggregator.sync(rows)
+
+        if step % 20 == 0 or step == 199:
+            actual = aggregator.metrics()
+            assert_matches_batch(actual, rows)
+            assert_exact_sums(actual, rows)
+
+    fresh = incremental_metrics.SustainabilityAggregator()
+    fresh.sync(list(rows))
+    assert fresh.metrics() == aggregator.metrics()
+
+def test_duplicate_ids_count_per_row():
+    rows = list(synthetic_data.generate_resources(50, seed=1))
+    duplicate = dataclasses.replace(rows[3], avg_hours_per_day=rows[3].avg_hours_per_day / 2, avg_cpu_7d=0.0, last_active_days_ago=9)
+    rows.insert(10, duplicate)
+    aggregator = incremental_metrics.SustainabilityAggregator()
+    aggregator.sync(rows)
+    actual = aggregator.metrics()
+    assert_matches_batch(actual, rows)
+    assert duplicate in actual["idle_resources"]
+
+    # Dropping the duplicate again removes exactly its contribution
+    rows = rows[:10] + rows[11:]
+    aggregator.sync(rows)
+    assert_matches_batch(aggregator.metrics(), rows)
+
+def test_compliance_matches_batch():
+    rng = random.Random(11)
+    controls = list(synthetic_data.generate_controls(500, seed=2))
+    aggregator = incremental_metrics.ComplianceAggregator()
+    for step in range(100):
+        controls = list(controls)
+        for _ in range(rng.randint(1, 20)):
+            i = rng.randrange(len(controls))
+            other = rng.choice(controls)
+            controls[i] = dataclasses.replace(controls[i], status=other.status, severity=other.severity, framework=other.framework)
+        if rng.random() < 0.5:
+            controls.pop(rng.randrange(len(controls)))
+        if rng.random() < 0.3:
+            controls.insert(rng.randrange(len(controls)), rng.choice(controls))
+        aggregator.sync(controls)
+        assert list(aggregator.framework_scores().items()) == list(metrics_engine.compute_framework_compliance(controls).items())
+        assert aggregator.overall_score() == metrics_engine.compute_overall_compliance_score(controls)
+        assert aggregator.open_risks() == metrics_engine.get_open_risks(controls)
@@ -0,0 +1,55 @@
+import asyncio
+
+from services import ai_reasoning, narratives
+from services.narratives import NarrativeStore, NarrativeTasks
+
+ARGS = ("region_migration", {"workload_percent": 40}, 123.0, 45.0)
+
+def test_workers_share_narrative_state(tmp_path, monkeypatch):
+    path = str(tmp_path / "narratives.sqlite3")
+    # Two API workers: separate registries and connections on one database
+    first, second = NarrativeTasks(NarrativeStore(path, 60)), NarrativeTasks(NarrativeStore(path, 60))
+    release = asyncio.Event()
+    calls = []
+
+    async def generate(*args):
+        calls.append(args)
+        await release.wait()
+        return {"detail_summary": "fallback", "risk_summary": "not cached"}
+
+    monkeypatch.setattr(ai_reasoning, "generate_scenario_narrative_async", generate)
+
+    async def scenario():
+        state = await first.start(*ARGS)
+        assert state["status"] == narratives.PENDING
+        assert (await second.start(*ARGS))["status"] == narratives.PENDING
+        assert (await second.get(state["narrative_id"]))["status"] == narratives.PENDING
+        release.set()
+        ready = await second.wait(state["narrative_id"], 5)
+        assert ready["status"] == narratives.READY
+        assert ready["narrative"]["detail_summary"] == "fallback"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+def test_failed_generation_is_recorded_and_retried(monkeypatch):
+    tasks = NarrativeTasks(NarrativeStore("", 60))
+    attempts = []
+
+    async def generate(*args):
+        attempts.append(args)
+        if len(attempts) == 1:
+            raise RuntimeError("model exploded")
+        return {"detail_summary": "ok", "risk_summary": "ok"}
+
+    monkeypatch.setattr(ai_reasoning, "generate_scenario_narrative_async", generate)
+
+    async def scenario():
+        narrative_id = (await tasks.start(*ARGS))["narrative_id"]
+        state = await tasks.wait(narrative_id, 5)
+        assert state["status"] == narratives.FAILED
+        assert state["error"] == "model exploded"
+        assert (await tasks.start(*ARGS))["status"] == narratives.PENDING
+        assert (await tasks.wait(narrative_id, 5))["status"] == narratives.READY
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import copy
+
+import numpy as np
+import pytest
+
+from models.schemas import SimulationRequest
+from services import emission_factors, simulation_engine, synthetic_data
+from services.columnar_metrics import ResourceColumns
+
+def test_region_index_uses_its_own_factors(monkeypatch):
+    cols = ResourceColumns.from_resources(list(synthetic_data.generate_resources(2000, seed=6)))
+    factors = emission_factors.current()
+    index = simulation_engine.RegionIndex(cols, factors)
+    source, target = next(iter(index.rows)), factors.cleanest_region()
+    fractions = np.array([0.25, 0.5, 1.0])
+    before = index.migrate(source, target, fractions)
+
+    # A reload after the index was built must not mix new factors into its kWh ranking
+    reloaded = copy.copy(factors)
+    reloaded.grid_intensity = {region: value * 3 for region, value in factors.grid_intensity.items()}
+    reloaded.price_multiplier = {region: value * 2 for region, value in factors.price_multiplier.items()}
+    monkeypatch.setattr(emission_factors, "current", lambda: reloaded)
+    after = index.migrate(source, target, fractions)
+    assert all(np.array_equal(a, b) for a, b in zip(before, after))
+
+def test_unknown_target_region_is_rejected():
+    resources = list(synthetic_data.generate_resources(100, seed=1))
+    request = SimulationRequest(simulation_type="region_migration", target_region="mars-north1", workload_percent=50)
+    with pytest.raises(simulation_engine.InvalidSimulation):
+        simulation_engine.validate_simulation(request)
+    with pytest.raises(simulation_engine.InvalidSimulation):
+        simulation_engine.simulate(resources, request)
+    with pytest.raises(simulation_engine.InvalidSweep):
+        simulation_engine.validate_sweep(resources, region_pairs=[(resources[0].region, "mars-north1")])
+
+def test_migration_fractions_are_clamped():
+    cols = ResourceColumns.from_resources(list(synthetic_data.generate_resources(500, seed=8)))
+    index = simulation_engine.RegionIndex(cols, emission_factors.current())
+    target = emission_factors.current().cleanest_region()
+    source = next(region for region in index.rows if region != target)
+    emissions, cost = index.migrate(source, target, np.array([-0.5, 0.0, 1.0, 1.5]))
+    assert emissions[0] == emissions[1] == 0 and cost[0] == cost[1] == 0
+    assert emissions[3] == emissions[2] and cost[3] == cost[2]
+
+@pytest.mark.parametrize("percent", [-50, 150])
+def test_workload_percent_out_of_range_is_rejected(percent):
+    request = SimulationRequest(simulation_type="region_migration", source_region="us-central1", workload_percent=percent)
+    with pytest.raises(simulation_engine.InvalidSimulation):
+        simulation_engine.validate_simulation(request)
+
+@pytest.mark.parametrize("hours", [-1, 25])
+def test_shutdown_hours_out_of_range_is_rejected(hours):
+    request = SimulationRequest(simulation_type="idle_shutdown", workload_percent=50, shutdown_hours=hours)
+    with pytest.raises(simulation_engine.InvalidSimulation):
+        simulation_engine.validate_simulation(request)
+
+def test_shutdown_window_follows_hourly_intensity():
+    factors = emission_factors.current()
+    region = next(r for r, profile in factors.hourly_profiles.items() if len(set(profile)) > 1)
+    profile = factors.hourly_profiles[region]
+    assert factors.window_share(region, 7, 24) == pytest.approx(1.0)
+    assert factors.window_share(region, 7, 0) == 0
+    night = sum(profile[h % 24] for h in range(-3, 7)) / sum(profile)
+    assert factors.window_share(region, 7, 10) == pytest.approx(night)
+    assert factors.window_share(region, 7, 10.5) == pytest.approx(night + 0.5 * profile[20] / sum(profile))
+    assert factors.window_share("unprofiled-region", 7, 6) == 6 / 24
+
+def test_idle_shutdown_sweep_matches_run_with_hourly_weights():
+    cols = ResourceColumns.from_resources(list(synthetic_data.generate_resources(3000, seed=12)))
+    sweep = simulation_engine.run_sweep(
+        cols, ["idle_shutdown"], workload_percents=[40, 100], shutdown_hours=[6, 12.5], samples=0
+    )
+    for scenario in sweep["scenarios"]:
+        emissions, cost = simulation_engine.simulate_idle_shutdown(
+            cols, scenario["workload_percent"], scenario["shutdown_hours"]
+        )
+        assert scenario["emissions_reduction_kg"]["mean"] == pytest.approx(emissions)
+        assert scenario["cost_savings_usd"]["mean"] == pytest.approx(cost)
+
+    # Emissions no longer scale linearly with hours: the window's intensity matters
+    flat_emissions, _ = simulation_engine.simulate_idle_shutdown(cols, 100, 24)
+    night_emissions, _ = simulation_engine.simulate_idle_shutdown(cols, 100, 12)
+    assert night_emissions != pytest.approx(flat_emissions / 2)
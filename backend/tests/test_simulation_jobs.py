@@ -0,0 +1,48 @@
+import asyncio
+import dataclasses
+
+import pytest
+
+from services import simulation_engine, simulation_jobs, synthetic_data
+from services.columnar_metrics import ResourceColumns
+
+def test_jobs_deduplicate_per_data_version():
+    async def scenario():
+        queue = simulation_jobs.JobQueue(simulation_jobs.JobStore("", 60), 0)
+        runs = []
+
+        async def run():
+            runs.append(1)
+            return {"ok": True}
+
+        first, _ = queue.submit("run", {"workload_percent": 50}, run, "v1")
+        again, deduplicated = queue.submit("run", {"workload_percent": 50}, run, "v1")
+        assert deduplicated and again["job_id"] == first["job_id"]
+        changed, deduplicated = queue.submit("run", {"workload_percent": 50}, run, "v2")
+        assert not deduplicated and changed["job_id"] != first["job_id"]
+        await asyncio.gather(*queue._tasks.values())
+        assert len(runs) == 2
+
+    asyncio.run(scenario())
+
+def test_fingerprint_follows_content():
+    resources = list(synthetic_data.generate_resources(500, seed=4))
+    fingerprint = ResourceColumns.from_resources(resources).fingerprint()
+    assert ResourceColumns.from_resources(list(resources)).fingerprint() == fingerprint
+    assert ResourceColumns.from_resources(resources).detached().fingerprint() == fingerprint
+    resources[7] = dataclasses.replace(resources[7], daily_cost_usd=resources[7].daily_cost_usd + 1)
+    assert ResourceColumns.from_resources(resources).fingerprint() != fingerprint
+
+@pytest.mark.parametrize("params", [
+    {"simulation_types": ["defrag"]},
+    {"workload_percents": [120]},
+    {"shutdown_hours": [-1]},
+    {"samples": simulation_engine.SIM_MAX_SAMPLES + 1},
+    {"percentiles": [101]},
+    {"cpu_uncertainty": -0.1},
+    {"workload_percents": list(range(101)), "shutdown_hours": [h / 4 for h in range(97)]},
+])
+def test_validate_sweep_rejects(params):
+    resources = list(synthetic_data.generate_resources(100, seed=1))
+    with pytest.raises(simulation_engine.InvalidSweep):
+        simulation_engine.validate_sweep(resources, **params)
@@ -0,0 +1,16 @@
+from services import emission_factors, synthetic_data
+
+def test_fleet_uses_registered_factors():
+    factors = emission_factors.current()
+    resources = synthetic_data.generate_resources(5000, seed=2)
+    assert {r.region for r in resources} <= factors.grid_intensity.keys()
+    assert {r.instance_type for r in resources} <= factors.instance_power_kw.keys()
+    # Sampled across the registry, not a fixed handful
+    assert len({r.region for r in resources}) > 10
+    assert len({r.instance_type for r in resources}) > 50
+
+def test_same_seed_same_fleet():
+    # last_active_at is relative to now
+    fields = set(synthetic_data.ResourceRecord.__slots__) - {"last_active_at"}
+    first, second = (synthetic_data.generate_resources(200, seed=3) for _ in range(2))
+    assert [r.dict(fields) for r in first] == [r.dict(fields) for r in second]
@@ -1,9 +1,13 @@
 "use client";
 
 import { useState } from "react";
-import { runSimulation, SimulationResult } from "@/lib/api";
+import { runSimulation, fetchSimulationNarrative, SimulationNarrative, SimulationResult } from "@/lib/api";
 import { Play, RotateCcw, ArrowRight, CheckCircle2, AlertTriangle } from "lucide-react";
 
+function narrativePlaceholder(result: SimulationResult): string {
+    return result.narrative_status === "failed" ? "AI summary unavailable for this scenario." : "Generating summary...";
+}
+
 export default function ScenarioSimulationPage() {
     const [simulationType, setSimulationType] = useState("idle_shutdown");
     const [workloadPercent, setWorkloadPercent] = useState(50);
@@ -21,6 +25,30 @@ export default function ScenarioSimulationPage() {
                 target_region: "us-west1",   // Mock default
             });
             setResult(res);
+            setLoading(false);
+            if (res.narrative_status === "pending" && res.narrative_id) {
+                // Numbers are shown right away; the AI summary fills in when ready
+                const narrativeId = res.narrative_id;
+                let status: SimulationResult["narrative_status"] = "failed";
+                let narrative: SimulationNarrative["narrative"] = null;
+                try {
+                    let state = await fetchSimulationNarrative(narrativeId);
+                    while (state.status === "pending") {
+                        state = await fetchSimulationNarrative(narrativeId);
+                    }
+                    if (state.status === "ready" && state.narrative) {
+                        status = "ready";
+                        narrative = state.narrative;
+                    }
+                } catch (error) {
+                    console.error(error);
+                }
+                setResult((current) =>
+                    current && current.narrative_id === narrativeId
+                        ? { ...current, ...narrative, narrative_status: status }
+                        : current
+                );
+            }
         } catch (error) {
             console.error(error);
         } finally {
@@ -125,7 +153,7 @@ export default function ScenarioSimulationPage() {
                                     Executive Summary
                                 </h3>
                                 <p className="text-sm text-gray-400 leading-relaxed">
-                                    {result.detail_summary}
+                                    {result.detail_summary ?? narrativePlaceholder(result)}
                                 </p>
                             </div>
 
@@ -136,7 +164,7 @@ export default function ScenarioSimulationPage() {
                                     Risk Assessment
                                 </h3>
                                 <p className="text-sm text-gray-400 leading-relaxed">
-                                    {result.risk_summary}
+                                    {result.risk_summary ?? narrativePlaceholder(result)}
                                 </p>
                             </div>
                         </div>
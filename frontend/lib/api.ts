@@ -51,8 +51,17 @@ export interface AnalysisResult {
 export interface SimulationResult {
     estimated_emissions_reduction_kg: number;
     estimated_cost_savings_usd: number;
-    risk_summary: string;
-    detail_summary: string;
+    risk_summary: string | null;
+    detail_summary: string | null;
+    narrative_id: string | null;
+    narrative_status: "ready" | "pending" | "failed" | null;
+}
+
+export interface SimulationNarrative {
+    narrative_id: string;
+    status: "ready" | "pending" | "failed";
+    narrative: { detail_summary: string; risk_summary: string } | null;
+    error?: string | null;
 }
 
 const API_BASE = "http://localhost:8000/api";
@@ -97,3 +106,10 @@ export async function runSimulation(payload: {
     if (!res.ok) throw new Error("Failed to run simulation");
     return res.json();
 }
+
+export async function fetchSimulationNarrative(narrativeId: string): Promise<SimulationNarrative> {
+    // Long-polls until the narrative is ready or the server's wait interval ends
+    const res = await fetch(`${API_BASE}/simulations/narratives/${narrativeId}?wait=true`);
+    if (!res.ok) throw new Error("Failed to fetch simulation narrative");
+    return res.json();
+}